@@ -0,0 +1,10 @@
+'''
+Benchmarks for epyjson.
+
+generate: deterministic synthetic e-JSON networks of various shapes and sizes.
+run: times the main operations of epyjson over synthetic networks, reporting time and peak memory as JSON.
+import_time: times "import epyjson" in fresh interpreters.
+
+Run from the repository root, e.g.:
+    python -m benchmarks.run --kinds radial meshed --sizes 1000 100000 --out results.json
+'''
@@ -0,0 +1,289 @@
+'''
+Deterministic synthetic e-JSON networks.
+
+Each kind of network is grown in blocks (feeders, city blocks, strings) hanging off a single Infeeder until it has
+at least the requested number of components, so the same (kind, n_components, seed) always gives the same network:
+    radial: MV feeders with distribution transformers, each supplying a branching LV feeder with mostly single phase
+        loads.
+    meshed: CBD-style LV grids, with every street segment a line and several transformers feeding each grid.
+    rural: long MV strings with occasional small transformers and a few loads.
+    parallel: LV feeders in which every span is duplicated, and some triplicated, by parallel lines.
+    circular: feeders with strings that loop back to the node they start from.
+
+Components are produced one at a time, so that networks too large to hold in memory as dicts can be written with
+write_network(...).
+'''
+
+import json
+import math
+import random
+from typing import Iterator, List, Optional
+
+KINDS = ('radial', 'meshed', 'rural', 'parallel', 'circular')
+
+_PHS = ['A', 'B', 'C']
+
+
+class _Builder:
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.n = 0
+        self.comps = []  # Components not yet yielded.
+
+    def _add(self, comp: dict) -> str:
+        self.comps.append(comp)
+        self.n += 1
+        return comp['id']
+
+    def node(self, v_base: float, xy: List[float], phs: Optional[List[str]] = None) -> str:
+        return self._add({
+            'id': f'nd{self.n}', 'type': 'Node', 'phs': phs or _PHS, 'v_base': v_base,
+            'xy': [round(xy[0], 2), round(xy[1], 2)]
+        })
+
+    def infeeder(self, node: str, v_setpoint: float) -> str:
+        return self._add({
+            'id': f'in{self.n}', 'type': 'Infeeder', 'cons': [{'node': node, 'phs': _PHS}], 'v_setpoint': v_setpoint
+        })
+
+    def line(self, node_0: str, node_1: str, length: float, z: List[float], phs: Optional[List[str]] = None) -> str:
+        phs = phs or _PHS
+        return self._add({
+            'id': f'ln{self.n}', 'type': 'Line', 'cons': [{'node': node_0, 'phs': phs}, {'node': node_1, 'phs': phs}],
+            'length': round(length, 1), 'z': z, 'z0': [3 * z[0], 3 * z[1]], 'in_service': True
+        })
+
+    def transformer(self, node_p: str, node_s: str, v_p: float, v_s: float) -> str:
+        return self._add({
+            'id': f'tx{self.n}', 'type': 'Transformer',
+            'cons': [{'node': node_p, 'phs': _PHS}, {'node': node_s, 'phs': _PHS}],
+            'n_winding_pairs': 3, 'in_service': True, 'vector_group': 'dyn11', 'v_winding_base': [v_p, v_s / 3 ** 0.5],
+            'nom_turns_ratio': [v_p * 3 ** 0.5 / v_s, 0], 'is_grounded_p': False, 'is_grounded_s': True,
+            'z_p': [0.01 * v_p ** 2 / 1e6, 0.04 * v_p ** 2 / 1e6], 'z_s': [0, 0]
+        })
+
+    def load(self, node: str, phs: List[str]) -> str:
+        rng = self.rng
+        return self._add({
+            'id': f'ld{self.n}', 'type': 'Load', 'cons': [{'node': node, 'phs': phs}], 'in_service': True,
+            'wiring': 'wye', 's_nom': [[round(rng.uniform(500, 3000)), round(rng.uniform(0, 800))] for _ in phs]
+        })
+
+    def lv_feeder(self, root: str, xy: List[float], n_nodes: int, parallel: bool = False):
+        '''
+        A branching LV feeder from root, with loads on most nodes.
+        '''
+
+        rng = self.rng
+        nodes = [(root, xy)]
+        for _ in range(n_nodes):
+            # Mostly extend the end of the feeder, sometimes branch from an earlier node.
+            prev, (x, y) = nodes[-1] if rng.random() < 0.7 else rng.choice(nodes)
+            angle = rng.uniform(0, 2 * math.pi)
+            length = rng.uniform(20, 60)
+            nd_xy = [x + length * math.cos(angle), y + length * math.sin(angle)]
+            nd = self.node(415, nd_xy)
+            self.line(prev, nd, length, [0.3e-3, 0.25e-3])
+            if parallel:
+                for _ in range(1 if rng.random() < 0.8 else 2):
+                    self.line(prev, nd, length, [0.3e-3, 0.25e-3])
+            nodes.append((nd, nd_xy))
+
+            if rng.random() < 0.8:
+                self.load(nd, [rng.choice(_PHS)] if rng.random() < 0.85 else _PHS)
+
+    def pop(self) -> List[dict]:
+        retval = self.comps
+        self.comps = []
+        return retval
+
+
+def _radial(b: _Builder, n_components: int, parallel: bool = False) -> Iterator[List[dict]]:
+    rng = b.rng
+    src = b.node(11000, [0, 0])
+    b.infeeder(src, 11000)
+    while b.n < n_components:
+        angle = 2 * math.pi * rng.random()
+        mv = [(src, [0, 0])]
+        for _ in range(rng.randint(5, 15)):
+            prev, (x, y) = mv[-1] if rng.random() < 0.8 else rng.choice(mv)
+            length = rng.uniform(200, 600)
+            a = angle + rng.uniform(-0.5, 0.5)
+            nd_xy = [x + length * math.cos(a), y + length * math.sin(a)]
+            nd = b.node(11000, nd_xy)
+            b.line(prev, nd, length, [0.2e-3, 0.35e-3])
+            mv.append((nd, nd_xy))
+
+            lv = b.node(415, nd_xy)
+            b.transformer(nd, lv, 11000, 415)
+            b.lv_feeder(lv, nd_xy, rng.randint(10, 30), parallel)
+            yield b.pop()
+            if b.n >= n_components:
+                return
+
+
+def _meshed(b: _Builder, n_components: int) -> Iterator[List[dict]]:
+    rng = b.rng
+    src = b.node(11000, [0, 0])
+    b.infeeder(src, 11000)
+    block = 0
+    while b.n < n_components:
+        side = rng.randint(6, 12)
+        spacing = 80.0
+        x_0 = 1000.0 * (block % 32)
+        y_0 = 1000.0 * (block // 32)
+        mv = b.node(11000, [x_0, y_0])
+        b.line(src, mv, math.hypot(x_0, y_0) + 1.0, [0.1e-3, 0.2e-3])
+
+        grid = [[None] * side for _ in range(side)]
+        for i in range(side):
+            for j in range(side):
+                grid[i][j] = b.node(415, [x_0 + spacing * i, y_0 + spacing * j])
+                if i > 0:
+                    b.line(grid[i - 1][j], grid[i][j], spacing, [0.1e-3, 0.08e-3])
+                if j > 0:
+                    b.line(grid[i][j - 1], grid[i][j], spacing, [0.1e-3, 0.08e-3])
+                b.load(grid[i][j], _PHS)
+
+        # Several transformers in parallel into each grid.
+        for _ in range(max(2, side // 3)):
+            b.transformer(mv, grid[rng.randrange(side)][rng.randrange(side)], 11000, 415)
+
+        yield b.pop()
+        block += 1
+
+
+def _rural(b: _Builder, n_components: int) -> Iterator[List[dict]]:
+    rng = b.rng
+    src = b.node(22000, [0, 0])
+    b.infeeder(src, 22000)
+    while b.n < n_components:
+        angle = 2 * math.pi * rng.random()
+        prev, x, y = src, 0.0, 0.0
+        for i in range(rng.randint(200, 1000)):
+            length = rng.uniform(200, 1000)
+            angle += rng.uniform(-0.2, 0.2)
+            x, y = x + length * math.cos(angle), y + length * math.sin(angle)
+            nd = b.node(22000, [x, y])
+            b.line(prev, nd, length, [0.6e-3, 0.4e-3])
+            prev = nd
+
+            if i % 20 == 19:
+                lv = b.node(415, [x, y])
+                b.transformer(nd, lv, 22000, 415)
+                for _ in range(rng.randint(1, 3)):
+                    b.load(lv, [rng.choice(_PHS)])
+
+            if len(b.comps) >= 1024:
+                yield b.pop()
+            if b.n >= n_components:
+                break
+
+        yield b.pop()
+
+
+def _circular(b: _Builder, n_components: int) -> Iterator[List[dict]]:
+    rng = b.rng
+    src = b.node(11000, [0, 0])
+    b.infeeder(src, 11000)
+    while b.n < n_components:
+        lv_xy = [rng.uniform(-1e4, 1e4), rng.uniform(-1e4, 1e4)]
+        mv = b.node(11000, lv_xy)
+        b.line(src, mv, math.hypot(*lv_xy) + 1.0, [0.2e-3, 0.35e-3])
+        lv = b.node(415, lv_xy)
+        b.transformer(mv, lv, 11000, 415)
+
+        for _ in range(rng.randint(2, 5)):
+            # A string around a loop, starting and ending at lv.
+            k = rng.randint(3, 20)
+            r = rng.uniform(50, 200)
+            prev = lv
+            for i in range(1, k):
+                a = 2 * math.pi * i / k
+                nd = b.node(415, [lv_xy[0] + r * (1 - math.cos(a)), lv_xy[1] + r * math.sin(a)])
+                b.line(prev, nd, 2 * math.pi * r / k, [0.3e-3, 0.25e-3])
+                if rng.random() < 0.5:
+                    b.load(nd, [rng.choice(_PHS)])
+                prev = nd
+            b.line(prev, lv, 2 * math.pi * r / k, [0.3e-3, 0.25e-3])
+
+        yield b.pop()
+
+
+def iter_components(kind: str, n_components: int, seed: int = 0) -> Iterator[dict]:
+    '''
+    Generate the components of a synthetic network one at a time.
+
+    Args:
+        kind: one of KINDS.
+        n_components: minimum number of components. Networks are grown in blocks, so may overshoot slightly.
+        seed: random seed.
+
+    Returns:
+        Generator over component dicts. Infeeder 'in1' is always present.
+    '''
+
+    b = _Builder(seed)
+    if kind == 'radial':
+        blocks = _radial(b, n_components)
+    elif kind == 'parallel':
+        blocks = _radial(b, n_components, parallel=True)
+    elif kind == 'meshed':
+        blocks = _meshed(b, n_components)
+    elif kind == 'rural':
+        blocks = _rural(b, n_components)
+    elif kind == 'circular':
+        blocks = _circular(b, n_components)
+    else:
+        raise ValueError(f'Unknown network kind {kind}')
+
+    for block in blocks:
+        yield from block
+
+
+def generate(kind: str, n_components: int, seed: int = 0) -> dict:
+    '''
+    Generate a synthetic network.
+
+    Args:
+        kind: one of KINDS.
+        n_components: minimum number of components.
+        seed: random seed.
+
+    Returns:
+        e-JSON dict
+    '''
+
+    return {
+        'id': f'{kind}-{n_components}-{seed}',
+        'voltage_type': 'll',
+        'components': list(iter_components(kind, n_components, seed))
+    }
+
+
+def write_network(path: str, kind: str, n_components: int, seed: int = 0) -> int:
+    '''
+    Write a synthetic network to a file, without holding it all in memory.
+
+    Args:
+        path: file path.
+        kind: one of KINDS.
+        n_components: minimum number of components.
+        seed: random seed.
+
+    Returns:
+        The number of components written.
+    '''
+
+    n = 0
+    with open(path, 'w') as f:
+        f.write(json.dumps({'id': f'{kind}-{n_components}-{seed}', 'voltage_type': 'll'})[:-1])
+        f.write(', "components": [\n')
+        for comp in iter_components(kind, n_components, seed):
+            if n > 0:
+                f.write(',\n')
+            f.write(json.dumps(comp))
+            n += 1
+        f.write('\n]}\n')
+
+    return n
@@ -0,0 +1,65 @@
+'''
+Import-time benchmark.
+
+Times "import epyjson" in fresh interpreters, and records which heavy dependencies were actually loaded by it, as
+JSON. Dependencies imported lazily (see epyjson.lazy) count as not loaded until used.
+
+Example:
+    python -m benchmarks.import_time --repeat 10
+'''
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from typing import List, Optional
+
+HEAVY = ('networkx', 'numpy', 'jsonschema', 'ordered_set')
+
+_SCRIPT = '''
+import json, sys, time
+t = time.perf_counter()
+import epyjson
+seconds = time.perf_counter() - t
+loaded = [
+    x for x in %r if x in sys.modules and type(sys.modules[x]).__name__ != '_LazyModule'
+]
+print(json.dumps({'seconds': seconds, 'loaded': loaded}))
+''' % (HEAVY,)
+
+
+def measure(repeat: int = 5) -> dict:
+    '''
+    Args:
+        repeat: number of fresh interpreters to time; the fastest is reported.
+
+    Returns:
+        {'benchmark': 'import', 'seconds': ..., 'loaded': {module: bool}, 'python_version': ...}
+    '''
+
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', _SCRIPT], capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(out))
+
+    best = min(runs, key=lambda x: x['seconds'])
+    return {
+        'benchmark': 'import',
+        'seconds': best['seconds'],
+        'loaded': {x: x in best['loaded'] for x in HEAVY},
+        'python_version': platform.python_version()
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Time "import epyjson" in fresh interpreters.')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Number of interpreters to time (5).')
+    args = parser.parse_args(argv)
+
+    json.dump(measure(args.repeat), sys.stdout, indent=4)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
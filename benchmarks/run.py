@@ -0,0 +1,268 @@
+'''
+Benchmark runner.
+
+Each benchmark is timed over synthetic networks from benchmarks.generate, with any setup (generating, loading or
+copying the network) done outside the timed region. Time is the best of --repeat runs. Peak memory is measured with
+tracemalloc in a separate run, since tracing slows Python down considerably, and is the peak traced allocation during
+the call, above what was allocated before it.
+
+Results are written as JSON:
+    {
+        "meta": {"epyjson_version": ..., "python_version": ..., "platform": ..., "seed": ...},
+        "results": [
+            {"benchmark": ..., "kind": ..., "n_components": ..., "seconds": ..., "peak_bytes": ..., "error": ...},
+            ...
+        ]
+    }
+where error is null unless the benchmark raised an exception, e.g. RecursionError for a deep dfs.
+
+Example:
+    python -m benchmarks.run --kinds radial rural --sizes 1000 10000 100000 --out results.json
+'''
+
+import argparse
+import copy
+import gc
+import importlib.metadata
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+import epyjson as epj
+
+from .generate import KINDS, generate, write_network
+
+INFEEDER_ID = 'in1'
+
+
+class _Context:
+    '''
+    Inputs shared by the benchmarks for one (kind, n_components), created on demand.
+    '''
+
+    def __init__(self, kind: str, n_components: int, seed: int, tmp_dir: str):
+        self.kind = kind
+        self.n_components = n_components
+        self.seed = seed
+        self.tmp_dir = tmp_dir
+        self._dict = None
+        self._netw = None
+        self._path = None
+
+    @property
+    def ejson_dict(self) -> dict:
+        if self._dict is None:
+            self._dict = generate(self.kind, self.n_components, self.seed)
+        return self._dict
+
+    @property
+    def path(self) -> str:
+        if self._path is None:
+            self._path = os.path.join(self.tmp_dir, f'{self.kind}-{self.n_components}-{self.seed}.json')
+            write_network(self._path, self.kind, self.n_components, self.seed)
+        return self._path
+
+    def netw(self) -> epj.EJson:
+        '''
+        A fresh copy of the network, which the benchmark may modify.
+        '''
+
+        if self._netw is None:
+            self._netw = epj.EJson(self.ejson_dict)
+        return self._netw.clone()
+
+
+# {name: setup(ctx) -> func}, where func() is the timed call.
+BENCHMARKS: Dict[str, Callable[[_Context], Callable[[], object]]] = {}
+
+
+def benchmark(name: str) -> Callable:
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return decorator
+
+
+@benchmark('read_from_file')
+def _read_from_file(ctx: _Context):
+    path = ctx.path
+    return lambda: epj.EJson.read_from_file(path)
+
+
+@benchmark('make_graph')
+def _make_graph(ctx: _Context):
+    d = copy.deepcopy(ctx.ejson_dict)
+    return lambda: epj.EJson(d)
+
+
+@benchmark('raw_ejson')
+def _raw_ejson(ctx: _Context):
+    netw = ctx.netw()
+    return lambda: netw.raw_ejson
+
+
+@benchmark('write_to_file')
+def _write_to_file(ctx: _Context):
+    netw = ctx.netw()
+    path = os.path.join(ctx.tmp_dir, 'out.json')
+    return lambda: netw.write_to_file(path)
+
+
+@benchmark('dfs')
+def _dfs(ctx: _Context):
+    netw = ctx.netw()
+    return lambda: netw.dfs(INFEEDER_ID)
+
+
+@benchmark('reduce_network')
+def _reduce_network(ctx: _Context):
+    netw = ctx.netw()
+    return lambda: epj.reduce_network(netw)
+
+
+@benchmark('make_radial')
+def _make_radial(ctx: _Context):
+    netw = ctx.netw()
+    return lambda: epj.make_radial(netw, INFEEDER_ID)
+
+
+@benchmark('make_single_phased')
+def _make_single_phased(ctx: _Context):
+    netw = ctx.netw()
+    return lambda: epj.make_single_phased(netw)
+
+
+@benchmark('remove_unsupplied')
+def _remove_unsupplied(ctx: _Context):
+    netw = ctx.netw()
+    return lambda: epj.remove_unsupplied(netw)
+
+
+@benchmark('audit')
+def _audit(ctx: _Context):
+    netw = ctx.netw()
+    return lambda: epj.audit(netw)
+
+
+def _measure(setup: Callable, ctx: _Context, repeat: int, memory: bool) -> Tuple[float, Optional[int]]:
+    best = float('inf')
+    for _ in range(repeat):
+        func = setup(ctx)
+        gc.collect()
+        t = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t)
+        del func
+
+    peak = None
+    if memory:
+        func = setup(ctx)
+        gc.collect()
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+        del func
+
+    return best, peak
+
+
+def run(
+    benchmarks: Optional[List[str]] = None, kinds: Optional[List[str]] = None, sizes: Optional[List[int]] = None,
+    seed: int = 0, repeat: int = 1, memory: bool = True, log: Optional[Callable[[str], None]] = None
+) -> dict:
+    '''
+    Run benchmarks.
+
+    Args:
+        benchmarks: names of the benchmarks to run, or None for all of BENCHMARKS.
+        kinds: kinds of network, or None for all of generate.KINDS.
+        sizes: minimum numbers of components in each network.
+        seed: random seed for the network generator.
+        repeat: number of timed runs of each benchmark; the fastest is reported.
+        memory: If True, measure peak memory, in an extra run.
+        log: optional callback for progress messages.
+
+    Returns:
+        Results dict, as described in the module docstring.
+    '''
+
+    benchmarks = list(BENCHMARKS) if benchmarks is None else benchmarks
+    for name in benchmarks:
+        if name not in BENCHMARKS:
+            raise ValueError(f'Unknown benchmark {name}')
+    kinds = list(KINDS) if kinds is None else kinds
+    sizes = [1000] if sizes is None else sizes
+
+    try:
+        version = importlib.metadata.version('epyjson')
+    except importlib.metadata.PackageNotFoundError:
+        version = None
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for kind in kinds:
+            for size in sizes:
+                ctx = _Context(kind, size, seed, tmp_dir)
+                for name in benchmarks:
+                    res = {
+                        'benchmark': name, 'kind': kind, 'n_components': size, 'seconds': None, 'peak_bytes': None,
+                        'error': None
+                    }
+                    try:
+                        res['seconds'], res['peak_bytes'] = _measure(BENCHMARKS[name], ctx, repeat, memory)
+                    except Exception as e:
+                        tracemalloc.stop()
+                        res['error'] = repr(e)
+                    results.append(res)
+                    if log is not None:
+                        log(json.dumps(res))
+
+    return {
+        'meta': {
+            'epyjson_version': version,
+            'python_version': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'repeat': repeat
+        },
+        'results': results
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Run epyjson benchmarks over synthetic networks.')
+    parser.add_argument('-b', '--benchmarks', nargs='+', choices=list(BENCHMARKS), help='Benchmarks to run (all).')
+    parser.add_argument('-k', '--kinds', nargs='+', choices=list(KINDS), help='Kinds of network (all).')
+    parser.add_argument(
+        '-s', '--sizes', nargs='+', type=int, default=[1000], help='Numbers of components (1000).'
+    )
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (0).')
+    parser.add_argument('-r', '--repeat', type=int, default=1, help='Timed runs of each benchmark (1).')
+    parser.add_argument('--no-memory', action='store_true', help="Don't measure peak memory.")
+    parser.add_argument('-o', '--out', help='Output JSON file (stdout).')
+    parser.add_argument('-q', '--quiet', action='store_true', help="Don't log progress to stderr.")
+    args = parser.parse_args(argv)
+
+    results = run(
+        args.benchmarks, args.kinds, args.sizes, args.seed, args.repeat, not args.no_memory,
+        log=None if args.quiet else lambda x: print(x, file=sys.stderr)
+    )
+
+    if args.out is None:
+        json.dump(results, sys.stdout, indent=4)
+        sys.stdout.write('\n')
+    else:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
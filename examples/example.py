@@ -6,8 +6,9 @@ netw = epyjson.EJson.read_from_file(
 )
 
 # Directly obtain and manipulate the underlying networkx graph. Normally, we
-# would only do this under special circumstances.
-nx_nodes = list(netw.graph.subgraph(['nd1', 'nd2']))
+# would only do this under special circumstances. Graph nodes are integer
+# handles rather than component IDs, so translate using handle_of / cid_of.
+nx_nodes = [netw.cid_of(x) for x in netw.graph.subgraph([netw.handle_of('nd1'), netw.handle_of('nd2')])]
 
 # Obtain a list of components of type Line. Note that components(...) returns a generator
 # so it is often convenient to wrap it in list(...).
@@ -1,3 +1,61 @@
-from .ejson import *
-from .utils import *
+import importlib
+
+from .ejson import Connection, EJson, elem_node, get_schema, node_elem, order_component_keys
 from .dumper import dump_pretty, dumps_pretty
+from .diff import apply_patch, diff, is_empty_patch
+from .journal import Journal
+
+# Everything else is imported from its module on first access (see __getattr__), so that importing epyjson doesn't
+# pull in numpy, networkx or jsonschema until they are needed. {name: module}
+_LAZY = {
+    **{
+        x: 'utils' for x in (
+            'a2c', 'c2a', 'user_data', 'is_in_service', 'switch_state', 'is_closed', 'is_live', 'remove_hanging_nodes',
+            'remove_not_live', 'collapse_elem', 'coalesce_connectors', 'merge_short_circuits', 'is_zero_impedance',
+            'is_short_circuit', 'merge_dups', 'merge_strings', 'reduce_network', 'remove_unsupplied',
+            'annotate_upstream_transformers', 'add_map', 'add_missing_locations', 'make_radial', 'make_single_phased',
+            'scale_loads', 'set_balanced_loads'
+        )
+    },
+    **{x: 'instrument' for x in ('StageEvent', 'StageProfiler', 'add_observer', 'observing', 'remove_observer')},
+    **{
+        x: 'audits' for x in (
+            'AuditCheck', 'audit', 'audit_checks', 'iter_audit', 'register_audit_check', 'write_audit_jsonl'
+        )
+    },
+    **{x: 'arrays' for x in ('ConnectionsView', 'NetworkArrays')},
+    'LoadScaler': 'loads',
+    **{x: 'sparse' for x in ('CsrMatrix', 'SparseLU')},
+    **{x: 'ybus' for x in ('Ybus', 'build_ybus')},
+    **{x: 'powerflow' for x in ('PowerFlow', 'PowerFlowResult', 'PowerFlowSeriesResult', 'run_power_flow')},
+    'ResultCache': 'cache',
+    'SpatialIndex': 'spatial',
+    **{x: 'paths' for x in ('PathFinder', 'ShortestPathTree')},
+    'RadialTree': 'tree',
+    **{x: 'switching' for x in ('SwitchingModel', 'SwitchingResult')},
+    'SupplyTracker': 'supply',
+    **{x: 'contingency' for x in ('Contingency', 'ContingencyAnalysis')},
+    **{
+        x: 'legacy' for x in ('LegacyConversion', 'LegacyReader', 'convert_files_from_ejson_0', 'convert_from_ejson_0')
+    },
+    **{x: 'streaming' for x in ('StreamingReader', 'open_file', 'read_ejson', 'write_ejson')},
+}
+
+__all__ = [
+    'Connection', 'EJson', 'elem_node', 'get_schema', 'node_elem', 'order_component_keys', 'dump_pretty',
+    'dumps_pretty', 'apply_patch', 'diff', 'is_empty_patch', 'Journal', *_LAZY
+]
+
+
+def __getattr__(name: str):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
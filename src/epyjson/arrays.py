@@ -0,0 +1,155 @@
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from .ejson import Connection, EJson
+
+
+class ConnectionsView:
+    '''
+    Lightweight view over the connections from one component in a NetworkArrays snapshot.
+
+    No Connection tuples are created unless the view is iterated over.
+    '''
+
+    __slots__ = ('_arrays', '_row', '_start', '_stop')
+
+    def __init__(self, arrays: 'NetworkArrays', row: int):
+        self._arrays = arrays
+        self._row = row
+        self._start = int(arrays.indptr[row])
+        self._stop = int(arrays.indptr[row + 1])
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __iter__(self):
+        a = self._arrays
+        cid = a.cids[self._row]
+        for i in range(self._start, self._stop):
+            con_idx = a.adj_con[i]
+            yield Connection(cid, a.cids[a.adj[i]], int(a.con_term[con_idx]), a.con_data[con_idx])
+
+    @property
+    def rows(self) -> np.ndarray:
+        '''
+        Rows of the connected components (a view, not a copy).
+        '''
+
+        return self._arrays.adj[self._start:self._stop]
+
+    @property
+    def con_idxs(self) -> np.ndarray:
+        '''
+        Indices into the connection arrays (a view, not a copy).
+        '''
+
+        return self._arrays.adj_con[self._start:self._stop]
+
+    @property
+    def cids(self) -> List[str]:
+        cids = self._arrays.cids
+        return [cids[x] for x in self.rows]
+
+    @property
+    def term_idxs(self) -> np.ndarray:
+        return self._arrays.con_term[self.con_idxs]
+
+
+class NetworkArrays:
+    '''
+    Read-only, array-backed snapshot of the structure of a network.
+
+    Components are numbered by row, in the order of netw.components(). Each connection appears once in the con_* arrays,
+    ordered by element and then terminal. The adjacency is held in CSR form: the neighbours of row r are
+    adj[indptr[r]:indptr[r + 1]], with adj_con giving the corresponding connection indices. Elements list their
+    neighbours in terminal order, and nodes list theirs in component order.
+
+    Obtain a snapshot using EJson.adjacency(), which caches it until the network topology next changes.
+    '''
+
+    def __init__(self, netw: EJson):
+        comps = list(netw.components())
+        self.comps = comps
+        self.cids = [x['id'] for x in comps]
+        self.rows = {cid: i for i, cid in enumerate(self.cids)}
+        self.ctype = np.array([x['type'] for x in comps], dtype=str)
+        self.is_node = self.ctype == 'Node'
+
+        row_of = {netw.handle_of(cid): i for i, cid in enumerate(self.cids)}
+        graph = netw.graph
+        con_elem = []
+        con_node = []
+        con_term = []
+        self.con_data = []
+        for i, cid in enumerate(self.cids):
+            if self.is_node[i]:
+                continue
+
+            for _, h_1, term_idx, con in graph.edges(netw.handle_of(cid), keys=True, data='con'):
+                con_elem.append(i)
+                con_node.append(row_of[h_1])
+                con_term.append(term_idx)
+                self.con_data.append(con)
+
+        n = len(self.cids)
+        n_cons = len(self.con_data)
+        self.con_elem = np.array(con_elem, dtype=np.int64)
+        self.con_node = np.array(con_node, dtype=np.int64)
+        self.con_term = np.array(con_term, dtype=np.int64)
+
+        src = np.concatenate((self.con_elem, self.con_node))
+        ord = np.argsort(src, kind='stable')
+        self.adj = np.concatenate((self.con_node, self.con_elem))[ord]
+        self.adj_con = np.tile(np.arange(n_cons, dtype=np.int64), 2)[ord]
+        self.degree = np.bincount(src, minlength=n).astype(np.int64)
+        self.indptr = np.concatenate(([0], np.cumsum(self.degree))).astype(np.int64)
+
+    def __len__(self):
+        return len(self.cids)
+
+    def neighbors(self, row: int) -> np.ndarray:
+        '''
+        Rows of the components connected to row (a view, not a copy).
+        '''
+
+        return self.adj[self.indptr[row]:self.indptr[row + 1]]
+
+    def connections_from(self, row: int) -> ConnectionsView:
+        return ConnectionsView(self, row)
+
+    def connections_from_many(self, rows: Iterable[int]) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Batch lookup of the connections from many components.
+
+        Args:
+            rows: rows of the components
+
+        Returns:
+            (owner, idx): owner[i] is the position in rows that adjacency entry idx[i] belongs to. Index adj or adj_con
+            with idx to obtain the connected rows or the connection indices.
+        '''
+
+        rows = np.asarray(rows, dtype=np.int64)
+        counts = self.degree[rows]
+        owner = np.repeat(np.arange(len(rows)), counts)
+        starts = np.repeat(self.indptr[rows] - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+        idx = starts + np.arange(len(owner))
+        return owner, idx
+
+    def type_mask(self, *ctypes: str) -> np.ndarray:
+        return np.isin(self.ctype, ctypes)
+
+    def terminal_cons(self) -> List[List[int]]:
+        '''
+        Returns:
+            For each row, the connection indices of each of its terminals, in terminal order. Empty for nodes. Index
+            con_node with these to obtain the connected node rows.
+        '''
+
+        retval = [[] for _ in self.cids]
+        con_elem = self.con_elem.tolist()
+        for i in np.lexsort((self.con_term, self.con_elem)).tolist():
+            retval[con_elem[i]].append(i)
+
+        return retval
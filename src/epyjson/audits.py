@@ -0,0 +1,371 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import os
+import time
+from typing import Callable, Iterable, IO, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .ejson import EJson, get_schema
+from .instrument import StageEvent, is_observed, notify
+from .lazy import lazy_import
+from .streaming import iter_raw_components
+
+jsonschema = lazy_import('jsonschema')
+
+
+AuditCheck = namedtuple('AuditCheck', ['name', 'description', 'func'])
+AuditCheck.__doc__ = '''
+A registered audit check.
+
+Attributes:
+    name: name of the check, and of its section in the audit dict.
+    description: description of the check.
+    func: func(netw, max_workers) -> iterable of problem dicts.
+'''
+
+_checks = {}  # {name: AuditCheck}, in registration order.
+
+
+def register_audit_check(name: str, description: str) -> Callable:
+    '''
+    Decorator to register an audit check, which is then run by audit(...), iter_audit(...) and write_audit_jsonl(...).
+
+    The decorated function is called as func(netw, max_workers), and should yield problem dicts of the form
+    {'type': 'error' | 'warning', 'fixed': bool, 'details': {...}}. Registering a check under an existing name replaces
+    it.
+
+    Args:
+        name: name of the check, and of its section in the audit dict.
+        description: description of the check.
+    '''
+
+    def decorator(func):
+        _checks[name] = AuditCheck(name, description, func)
+        return func
+
+    return decorator
+
+
+def audit_checks() -> List[AuditCheck]:
+    '''
+    Returns:
+        The registered audit checks, in the order they are run.
+    '''
+
+    return list(_checks.values())
+
+
+def _select(checks: Optional[Iterable[str]]) -> List[AuditCheck]:
+    if checks is None:
+        return audit_checks()
+
+    retval = []
+    for name in checks:
+        if name not in _checks:
+            raise ValueError(f'Unknown audit check {name}')
+        retval.append(_checks[name])
+
+    return retval
+
+
+def iter_audit(
+    netw: EJson, checks: Optional[Iterable[str]] = None, max_workers: Optional[int] = None
+) -> Iterator[Tuple[str, dict]]:
+    '''
+    Audit e-JSON, yielding problems as they are found, so that they never need to be held in memory together.
+
+    Args:
+        netw: e-JSON network
+        checks: names of the checks to run, or None for all registered checks.
+        max_workers: maximum number of worker processes for checks that run in parallel, such as schema validation.
+            1 runs everything in this process.
+
+    Returns:
+        Generator over (check name, problem dict)
+    '''
+
+    for check in _select(checks):
+        if not is_observed():
+            for prob in check.func(netw, max_workers):
+                yield check.name, prob
+            continue
+
+        # Only time spent inside the check counts, not time spent by the consumer between problems.
+        seconds = 0.0
+        n_probs = 0
+        n_comps = len(netw.graph)
+        probs = iter(check.func(netw, max_workers))
+        while True:
+            t_0 = time.perf_counter()
+            prob = next(probs, None)
+            seconds += time.perf_counter() - t_0
+            if prob is None:
+                break
+            n_probs += 1
+            yield check.name, prob
+
+        notify(StageEvent(f'audit.{check.name}', seconds, n_comps, len(netw.graph), {'n_problems': n_probs}))
+
+
+def audit(netw: EJson, checks: Optional[Iterable[str]] = None, max_workers: Optional[int] = None) -> dict:
+    '''
+    Audit e-JSON.
+
+    Args:
+        netw: e-JSON network
+        checks: names of the checks to run, or None for all registered checks.
+        max_workers: as for iter_audit(...).
+
+    Returns:
+        dict containing the results of the audit.
+    '''
+
+    checks = _select(checks)
+    aud = {x.name: {'description': x.description, 'problems': []} for x in checks}
+    for name, prob in iter_audit(netw, [x.name for x in checks], max_workers):
+        aud[name]['problems'].append(prob)
+
+    return aud
+
+
+def write_audit_jsonl(
+    netw: EJson, f: Union[str, os.PathLike, IO[str]], checks: Optional[Iterable[str]] = None,
+    max_workers: Optional[int] = None
+) -> int:
+    '''
+    Audit e-JSON, streaming the problems to JSON Lines, one {'check': name, **problem} object per line.
+
+    Args:
+        netw: e-JSON network
+        f: path or text file object to write to.
+        checks: names of the checks to run, or None for all registered checks.
+        max_workers: as for iter_audit(...).
+
+    Returns:
+        Number of problems written.
+    '''
+
+    if isinstance(f, (str, os.PathLike)):
+        with open(f, 'w') as f_:
+            return write_audit_jsonl(netw, f_, checks, max_workers)
+
+    n = 0
+    for name, prob in iter_audit(netw, checks, max_workers):
+        f.write(json.dumps({'check': name} | prob, default=str))
+        f.write('\n')
+        n += 1
+
+    return n
+
+
+_SCHEMA_CHUNK_SIZE = 2048
+
+_network_validator = None
+_component_validators = None
+
+
+def _get_network_validator() -> 'jsonschema.protocols.Validator':
+    '''
+    Returns:
+        validator for a whole network
+    '''
+
+    global _network_validator
+    if _network_validator is None:
+        _network_validator = jsonschema.validators.Draft202012Validator(get_schema())
+
+    return _network_validator
+
+
+def _get_component_validators() -> Tuple['jsonschema.protocols.Validator', dict]:
+    '''
+    Returns:
+        (validator for any component, {component type: validator for that type})
+    '''
+
+    global _component_validators
+    if _component_validators is None:
+        defs = get_schema()['$defs']
+        by_type = {}
+        for x in defs['component']['oneOf']:
+            name = x['$ref'].split('/')[-1]
+            by_type[defs[name]['properties']['type']['const']] = jsonschema.validators.Draft202012Validator(
+                {'$ref': f'#/$defs/{name}', '$defs': defs}
+            )
+        val = jsonschema.validators.Draft202012Validator({'$ref': '#/$defs/component', '$defs': defs})
+        _component_validators = (val, by_type)
+
+    return _component_validators
+
+
+def _schema_problem(e: 'jsonschema.ValidationError') -> dict:
+    e_str = ' | '.join((x.strip() for x in str(e).split('\n') if len(x) > 0))
+    return {
+        'type': 'error',
+        'fixed': False,
+        'details': {
+            'path': e.json_path,
+            'description': e_str
+        }
+    }
+
+
+def _validate_properties(props: dict) -> List[dict]:
+    '''
+    Validate the top level properties of a network, i.e. everything except its components.
+    '''
+
+    val = _get_network_validator()
+    return [_schema_problem(e) for e in sorted(val.iter_errors(props | {'components': []}), key=lambda e: e.path)]
+
+
+def _validate_components(offset: int, comps: List[dict]) -> List[dict]:
+    '''
+    Validate a chunk of raw components, starting at index offset of the components list.
+
+    Errors are reported exactly as if the whole network had been validated.
+    '''
+
+    val, by_type = _get_component_validators()
+    retval = []
+    for i, comp in enumerate(comps):
+        # The component schema is a oneOf over the component types, each with a const type, so a component is valid iff
+        # it is valid for its own type, which is much quicker to check. Only invalid components go through oneOf, so
+        # that errors are reported in full.
+        type_val = by_type.get(comp.get('type')) if isinstance(comp.get('type'), str) else None
+        if type_val is not None and type_val.is_valid(comp):
+            continue
+
+        for e in sorted(val.iter_errors(comp), key=lambda e: e.path):
+            e.path.extendleft((offset + i, 'components'))
+            e.schema_path.extendleft(('items', 'components', 'properties'))
+            retval.append(_schema_problem(e))
+
+    return retval
+
+
+@register_audit_check('schema_errors', 'List of JSON schema errors')
+def _audit_schema(netw: EJson, max_workers: Optional[int]) -> Iterator[dict]:
+    '''
+    The network properties are validated here, and the components are validated in chunks, in parallel over a process
+    pool for large networks. At most a few chunks per worker are in flight at once.
+    '''
+
+    yield from _validate_properties(netw.properties)
+
+    comps = iter_raw_components(netw)
+    chunks = ((i, list(itertools.islice(comps, _SCHEMA_CHUNK_SIZE))) for i in itertools.count(0, _SCHEMA_CHUNK_SIZE))
+    chunks = itertools.takewhile(lambda x: len(x[1]) > 0, chunks)
+
+    if max_workers == 1 or len(netw.graph) <= _SCHEMA_CHUNK_SIZE:
+        for offset, chunk in chunks:
+            yield from _validate_components(offset, chunk)
+        return
+
+    window = 2 * (max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = []
+        for offset, chunk in chunks:
+            futures.append(pool.submit(_validate_components, offset, chunk))
+            if len(futures) >= window:
+                yield from futures.pop(0).result()
+        for fut in futures:
+            yield from fut.result()
+
+
+# Required number of connections for each element type. Other types may have any number.
+_N_CONS = {'Line': 2, 'Transformer': 2, 'Infeeder': 1, 'Load': 1}
+
+
+@register_audit_check('connections', 'Check for wrongly connected components')
+def _audit_connections(netw: EJson, max_workers: Optional[int]) -> Iterator[dict]:
+    arrays = netw.adjacency()
+    n_cons = np.bincount(arrays.con_elem, minlength=len(arrays))
+    required = np.full(len(arrays), -1, dtype=np.int64)
+    for ctype, n in _N_CONS.items():
+        required[arrays.ctype == ctype] = n
+
+    for r in np.flatnonzero((required != -1) & (n_cons != required)).tolist():
+        yield {
+            'type': 'error',
+            'fixed': False,
+            'details': {
+                'elem_id': arrays.cids[r],
+                'n_cons': int(n_cons[r])
+            }
+        }
+
+
+@register_audit_check('circular_connections', 'Check for circular connections')
+def _audit_circular_cons(netw: EJson, max_workers: Optional[int]) -> Iterator[dict]:
+    '''
+    Find elements with more than one terminal connected to the same node.
+    '''
+
+    arrays = netw.adjacency()
+    order = np.lexsort((arrays.con_node, arrays.con_elem))
+    elem = arrays.con_elem[order]
+    node = arrays.con_node[order]
+    dup = (elem[1:] == elem[:-1]) & (node[1:] == node[:-1])
+
+    for r in np.unique(elem[1:][dup]).tolist():
+        yield {
+            'type': 'error',
+            'fixed': False,
+            'details': {
+                'elem_id': arrays.cids[r]
+            }
+        }
+
+
+def _phase_masks(phs_lists: List[Optional[List[str]]], labels: np.ndarray) -> np.ndarray:
+    '''
+    Bitmasks of the phases in each list, with one bit for each entry in the sorted array of all labels, in words of 64
+    bits. Lists that are None have no bits set.
+    '''
+
+    n_words = max(1, (len(labels) + 63) // 64)
+    masks = np.zeros((len(phs_lists), n_words), dtype=np.uint64)
+    owner = np.array([i for i, x in enumerate(phs_lists) if x is not None for _ in x], dtype=np.int64)
+    phs = [p for x in phs_lists if x is not None for p in x]
+    if len(phs) > 0:
+        codes = np.searchsorted(labels, np.array(phs, dtype=str))
+        np.bitwise_or.at(masks, (owner, codes // 64), np.left_shift(np.uint64(1), (codes % 64).astype(np.uint64)))
+
+    return masks
+
+
+@register_audit_check('phase_consistency', 'Check that phases of connection exist in the node')
+def _audit_conn_phase_consistency(netw: EJson, max_workers: Optional[int]) -> Iterator[dict]:
+    arrays = netw.adjacency()
+
+    # Malformed phases would have been picked up by the schema audit. Don't let them cause trouble here.
+    def phs_of(d):
+        phs = d.get('phs')
+        return phs if isinstance(phs, list) and all(isinstance(x, str) for x in phs) else None
+
+    node_phs = [phs_of(x) for x in arrays.comps]
+    con_phs = [phs_of(x) for x in arrays.con_data]
+    labels = np.unique(np.array([p for x in node_phs + con_phs if x is not None for p in x], dtype=str))
+    node_masks = _phase_masks(node_phs, labels)
+    con_masks = _phase_masks(con_phs, labels)
+
+    checked = np.array([x is not None for x in con_phs], dtype=bool) & arrays.is_node[arrays.con_node]
+    checked &= np.array([node_phs[x] is not None for x in arrays.con_node.tolist()], dtype=bool)
+    bad = checked & np.any(con_masks & ~node_masks[arrays.con_node], axis=1)
+
+    for k in np.flatnonzero(bad).tolist():
+        yield {
+            'type': 'error',
+            'fixed': False,
+            'details': {
+                'elem_id': arrays.cids[arrays.con_elem[k]],
+                'node_id': arrays.cids[arrays.con_node[k]],
+                'con_idx': int(arrays.con_term[k]),
+                'con_phs': con_phs[k],
+                'node_phs': node_phs[arrays.con_node[k]]
+            }
+        }
@@ -0,0 +1,198 @@
+import functools
+import gzip
+import hashlib
+import importlib.metadata
+import json
+import os
+import pathlib
+import tempfile
+from typing import Any, Callable, Optional, Union
+
+from .ejson import EJson, logger
+from . import utils
+
+
+_SUFFIX = '.json.gz'
+
+
+def _version() -> str:
+    try:
+        return importlib.metadata.version('epyjson')
+    except importlib.metadata.PackageNotFoundError:
+        return 'unknown'
+
+
+def _order_digest(netw: EJson) -> str:
+    '''
+    Hash of the sequence of component IDs of netw, in order, which fingerprints don't depend on.
+    '''
+
+    h = hashlib.blake2b(digest_size=20)
+    for c in netw.components():
+        h.update(c['id'].encode())
+        h.update(b'\n')
+    return h.hexdigest()
+
+
+class ResultCache:
+    '''
+    Opt-in on-disk cache for deterministic functions of a network, such as the transforms in utils.
+
+    Results are keyed by the content fingerprint of the input network (see EJson.fingerprint(...)) together with the
+    order of its components, which the results of many functions depend on, the function name, its other arguments and
+    the epyjson version, and are stored as gzipped JSON files, one per entry, in a directory. As for fingerprint(...),
+    direct writes into component dicts must be followed by netw.touch(...), otherwise stale results will be returned.
+    The total size of the directory is bounded by evicting the least recently used entries, and entries larger than
+    max_entry_bytes are never stored.
+
+    Cached calls never mutate their input network: on a miss, the function is run on a clone, and on a hit the
+    network is rebuilt from the stored e-JSON. Always use the returned value, e.g.
+
+        cache = ResultCache('~/.cache/epyjson')
+        netw = cache.reduce_network(netw)
+
+    Network results are returned as EJson objects. Other results must be JSON serialisable, and are only cached if
+    they survive a round trip through JSON unchanged.
+    '''
+
+    def __init__(
+        self, path: Union[str, pathlib.Path], max_bytes: int = 1 << 30, max_entry_bytes: Optional[int] = 64 << 20
+    ):
+        '''
+        Constructor.
+
+        Args:
+            path: cache directory, created if it doesn't exist.
+            max_bytes: maximum total size of the cache, in bytes.
+            max_entry_bytes: maximum size of a single (compressed) entry, in bytes, or None for no limit.
+        '''
+
+        self.path = pathlib.Path(path).expanduser()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.hits = 0
+        self.misses = 0
+
+        # {key: size}, in least to most recently used order.
+        entries = []
+        for p in self.path.glob('*' + _SUFFIX):
+            st = p.stat()
+            entries.append((st.st_mtime_ns, p.name[:-len(_SUFFIX)], st.st_size))
+        self._sizes = {k: size for _, k, size in sorted(entries)}
+        self._total = sum(self._sizes.values())
+
+        self.reduce_network = self.wrap(utils.reduce_network)
+        self.make_single_phased = self.wrap(utils.make_single_phased)
+        self.coalesce_connectors = self.wrap(utils.coalesce_connectors)
+        self.audit = self.wrap(utils.audit)
+
+    def __len__(self):
+        return len(self._sizes)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def key(self, func: Callable, netw: EJson, *args, **kwargs) -> str:
+        '''
+        Return the cache key for calling func(netw, *args, **kwargs).
+        '''
+
+        desc = json.dumps(
+            [_version(), func.__module__, func.__qualname__, netw.fingerprint(), _order_digest(netw), args, kwargs],
+            sort_keys=True, default=repr
+        )
+        return hashlib.blake2b(desc.encode(), digest_size=20).hexdigest()
+
+    def wrap(self, func: Callable) -> Callable:
+        '''
+        Return a cached version of func(netw, *args, **kwargs).
+        '''
+
+        @functools.wraps(func)
+        def wrapper(netw: EJson, *args, **kwargs):
+            return self.call(func, netw, *args, **kwargs)
+
+        return wrapper
+
+    def call(self, func: Callable, netw: EJson, *args, **kwargs) -> Any:
+        '''
+        Return func(netw, *args, **kwargs), from the cache if possible. netw is not mutated.
+        '''
+
+        key = self.key(func, netw, *args, **kwargs)
+        entry = self._load(key)
+        if entry is not None:
+            self.hits += 1
+            return EJson(entry['value']) if entry['kind'] == 'EJson' else entry['value']
+
+        self.misses += 1
+        result = func(netw.clone(), *args, **kwargs)
+        if isinstance(result, EJson):
+            self._store(key, {'kind': 'EJson', 'value': result.raw_ejson})
+        else:
+            try:
+                cacheable = json.loads(json.dumps(result)) == result
+            except (TypeError, ValueError):
+                cacheable = False
+
+            if cacheable:
+                self._store(key, {'kind': 'json', 'value': result})
+            else:
+                logger.debug(f'Not caching result of {func.__qualname__}: it is not JSON serialisable')
+
+        return result
+
+    def clear(self):
+        for key in list(self._sizes):
+            self._remove(key)
+
+    def _file(self, key: str) -> pathlib.Path:
+        return self.path / (key + _SUFFIX)
+
+    def _load(self, key: str) -> Optional[dict]:
+        if key not in self._sizes:
+            return None
+
+        try:
+            with gzip.open(self._file(key), 'rt') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            # Removed by another process, or corrupt.
+            self._remove(key)
+            return None
+
+        # Mark as most recently used.
+        self._sizes[key] = self._sizes.pop(key)
+        os.utime(self._file(key))
+
+        return entry
+
+    def _store(self, key: str, entry: dict):
+        data = gzip.compress(json.dumps(entry, separators=(',', ':')).encode(), compresslevel=6)
+        if (self.max_entry_bytes is not None and len(data) > self.max_entry_bytes) or len(data) > self.max_bytes:
+            logger.debug(f'Not caching entry {key}: size {len(data)} exceeds the limit')
+            return
+
+        if key in self._sizes:
+            self._remove(key)
+
+        while self._total + len(data) > self.max_bytes:
+            self._remove(next(iter(self._sizes)))
+
+        # Write atomically, so that concurrent readers never see a partial entry.
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self._file(key))
+
+        self._sizes[key] = len(data)
+        self._total += len(data)
+
+    def _remove(self, key: str):
+        self._total -= self._sizes.pop(key)
+        try:
+            self._file(key).unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,255 @@
+'''
+Command line tool for bulk e-JSON operations.
+
+Usage:
+    epyjson [-j N] [--stream] COMMAND [options] INPUT [INPUT ...]
+
+Inputs may be files or glob patterns, and may be compressed (.gz, .bz2 or .xz). Files are processed in parallel over a
+pool of N processes, and a timing summary for each file is printed to stderr.
+'''
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import json
+import os
+import sys
+import time
+from typing import List, Optional
+
+from .streaming import open_file, read_ejson, write_ejson
+
+
+def _expand(patterns: List[str]) -> List[str]:
+    retval = []
+    for p in patterns:
+        if glob.has_magic(p):
+            matches = sorted(glob.glob(p, recursive=True))
+            if len(matches) == 0:
+                raise FileNotFoundError(f'No files match {p}')
+            retval.extend(matches)
+        else:
+            retval.append(p)
+
+    return retval
+
+
+def _output_path(in_path: str, args: argparse.Namespace, suffix: str = '') -> str:
+    '''
+    Output path for in_path: in_path itself if --in-place, otherwise -o if it names a file, or in_path's path relative
+    to the common directory of the inputs, args.root, under the directory -o. --ext replaces the extension(s) of the
+    file name, e.g. '.json.gz'.
+    '''
+
+    if getattr(args, 'in_place', False):
+        return in_path
+
+    out = args.output
+    if out is not None and not os.path.isdir(out) and not out.endswith(os.sep) and len(args.inputs) == 1:
+        return out
+
+    name = os.path.basename(in_path)
+    if args.ext is not None:
+        for ext in ('.gz', '.bz2', '.xz', '.json'):
+            if name.endswith(ext):
+                name = name[:-len(ext)]
+        name += args.ext
+    name += suffix
+
+    if out is None:
+        return os.path.join(os.path.dirname(in_path), name)
+
+    rel = os.path.relpath(os.path.dirname(os.path.abspath(in_path)), args.root)
+    return os.path.normpath(os.path.join(out, rel, name))
+
+
+def _apply(netw, args: argparse.Namespace):
+    from . import utils
+
+    if args.command == 'reduce':
+        utils.reduce_network(netw)
+    elif args.command == 'single-phase':
+        utils.make_single_phased(netw)
+    elif args.command == 'remove-unsupplied':
+        utils.remove_unsupplied(netw)
+    elif args.command == 'radialise':
+        start = args.start
+        if start is None:
+            start = next((x['id'] for x in netw.components('Infeeder')), None)
+            if start is None:
+                raise ValueError('No Infeeder to radialise from; use --start')
+        utils.make_radial(netw, start)
+
+
+def _process(in_path: str, args: argparse.Namespace) -> dict:
+    '''
+    Process one input file. Runs in a worker process.
+
+    Returns:
+        Summary dict for the file.
+    '''
+
+    res = {'file': in_path, 'output': None, 'n_before': None, 'n_after': None, 'error': None}
+    t_0 = time.perf_counter()
+    try:
+        if args.command == 'convert' and args.from_ejson_0:
+            # Converted in a single streaming pass.
+            from .legacy import convert_from_ejson_0
+
+            res['output'] = _output_path(in_path, args)
+            conv = convert_from_ejson_0(in_path, res['output'], max_workers=args.jobs if len(args.inputs) == 1 else 1)
+            res.update(read_s=0.0, op_s=conv.seconds, write_s=0.0, n_before=conv.n_components, n_after=conv.n_components)
+            if len(conv.problems) > 0:
+                res['error'] = f'{len(conv.problems)} schema errors in output'
+            res['total_s'] = time.perf_counter() - t_0
+            return res
+
+        netw = read_ejson(in_path, stream=args.stream)
+        t_1 = time.perf_counter()
+        res['read_s'] = t_1 - t_0
+        res['n_before'] = len(netw.graph)
+
+        if args.command == 'audit':
+            from .audits import audit, write_audit_jsonl
+
+            max_workers = args.jobs if len(args.inputs) == 1 else 1
+            if args.output is not None:
+                res['output'] = _output_path(in_path, args, '.audit.jsonl')
+                with open_file(res['output'], 'w') as f:
+                    res['n_problems'] = write_audit_jsonl(netw, f, max_workers=max_workers)
+            else:
+                res['n_problems'] = sum(len(x['problems']) for x in audit(netw, max_workers=max_workers).values())
+        else:
+            _apply(netw, args)
+
+        t_2 = time.perf_counter()
+        res['op_s'] = t_2 - t_1
+        res['n_after'] = len(netw.graph)
+
+        if args.command != 'audit':
+            res['output'] = _output_path(in_path, args)
+            write_ejson(netw, res['output'], stream=args.stream)
+        res['write_s'] = time.perf_counter() - t_2
+    except Exception as e:
+        res['error'] = f'{type(e).__name__}: {e}'
+
+    res['total_s'] = time.perf_counter() - t_0
+    return res
+
+
+def _print_summary(results: List[dict], command: str):
+    f = sys.stderr
+    width = max([len('file')] + [len(x['file']) for x in results])
+    extra = 'problems' if command == 'audit' else 'after'
+    f.write(f'{"file":<{width}}  {"comps":>9}  {extra:>9}  {"read s":>8}  {"op s":>8}  {"write s":>8}  {"total s":>8}\n')
+    for r in results:
+        if r['error'] is not None:
+            f.write(f'{r["file"]:<{width}}  ERROR {r["error"]}\n')
+            continue
+        n = r['n_problems'] if command == 'audit' else r['n_after']
+        f.write(
+            f'{r["file"]:<{width}}  {r["n_before"]:>9}  {n:>9}  {r["read_s"]:>8.3f}  {r["op_s"]:>8.3f}  '
+            f'{r["write_s"]:>8.3f}  {r["total_s"]:>8.3f}\n'
+        )
+
+
+def _diff(args: argparse.Namespace) -> int:
+    from .diff import diff, is_empty_patch
+
+    a = read_ejson(args.a, stream=args.stream)
+    b = read_ejson(args.b, stream=args.stream)
+    patch = diff(a, b)
+    f = open_file(args.output or '-', 'w')
+    try:
+        json.dump(patch, f, indent=4)
+        f.write('\n')
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+    return 0 if is_empty_patch(patch) else 1
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='epyjson', description='Bulk e-JSON operations.')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of worker processes (1).')
+    parser.add_argument(
+        '--stream', action='store_true',
+        help='Parse inputs incrementally, and write outputs one component per line, to reduce memory use.'
+    )
+    parser.add_argument('-q', '--quiet', action='store_true', help="Don't print the timing summary.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def add_bulk(name, help_, writes=True):
+        p = sub.add_parser(name, help=help_)
+        p.add_argument('inputs', nargs='+', help='Input files or glob patterns.')
+        p.add_argument(
+            '-o', '--output',
+            help='Output directory, in which the inputs keep their paths relative to their common directory, or '
+            'output file if there is a single input. Defaults to beside each input.'
+        )
+        p.add_argument('--ext', help="Replace the output file extension, e.g. '.json.xz' to compress.")
+        if writes:
+            p.add_argument('--in-place', action='store_true', help='Overwrite the inputs.')
+        return p
+
+    add_bulk('reduce', 'Reduce networks (see reduce_network).')
+    add_bulk('audit', 'Audit networks, optionally writing problems as JSON Lines to -o.', writes=False)
+    add_bulk('single-phase', 'Make networks single phased (see make_single_phased).')
+    add_bulk('remove-unsupplied', 'Remove unsupplied components (see remove_unsupplied).')
+    p = add_bulk('radialise', 'Make networks radial (see make_radial).')
+    p.add_argument('--start', help='ID of the component to radialise from. Defaults to the first Infeeder.')
+    p = add_bulk('convert', 'Rewrite networks, e.g. to change compression with --ext, or to normalise formatting.')
+    p.add_argument(
+        '--from-ejson-0', action='store_true',
+        help='Convert from legacy e-JSON 0, streaming, and validate the output (see convert_from_ejson_0).'
+    )
+
+    p = sub.add_parser('diff', help='Diff two networks, writing the patch as JSON. Exits with 1 if they differ.')
+    p.add_argument('a')
+    p.add_argument('b')
+    p.add_argument('-o', '--output', help='Patch file (stdout).')
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parser().parse_args(argv)
+
+    if args.command == 'diff':
+        return _diff(args)
+
+    if args.command != 'audit' and args.output is None and args.ext is None and not args.in_place:
+        raise SystemExit(f'epyjson {args.command}: one of -o/--output, --ext or --in-place is required')
+
+    args.inputs = _expand(args.inputs)
+    args.root = os.path.commonpath([os.path.dirname(os.path.abspath(x)) for x in args.inputs])
+
+    # Check that no two inputs would be written to the same output, e.g. a.json and a.json.gz with --ext.
+    if args.command != 'audit' or args.output is not None:
+        suffix = '.audit.jsonl' if args.command == 'audit' else ''
+        outputs = {}
+        for x in args.inputs:
+            out = os.path.abspath(_output_path(x, args, suffix))
+            if out in outputs:
+                raise SystemExit(f'epyjson {args.command}: {outputs[out]} and {x} would both be written to {out}')
+            outputs[out] = x
+
+        if args.output is not None and len(args.inputs) > 1:
+            for d in {os.path.dirname(x) for x in outputs}:
+                os.makedirs(d, exist_ok=True)
+
+    if args.jobs > 1 and len(args.inputs) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(_process, args.inputs, [args] * len(args.inputs)))
+    else:
+        results = [_process(x, args) for x in args.inputs]
+
+    if not args.quiet:
+        _print_summary(results, args.command)
+
+    return 1 if any(x['error'] is not None for x in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
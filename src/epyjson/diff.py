@@ -0,0 +1,135 @@
+import copy
+from typing import Dict, List, Tuple
+
+from .ejson import EJson
+
+
+def _fields_delta(old: dict, new: dict) -> Tuple[dict, List[str]]:
+    return {k: v for k, v in new.items() if k not in old or old[k] != v}, [k for k in old if k not in new]
+
+
+def _element_cons(netw: EJson, cid: str) -> Dict[Tuple[int, str], dict]:
+    return {(x.term_idx, x.cid_1): x.con for x in netw.connections_from(cid)}
+
+
+def diff(a: EJson, b: EJson) -> dict:
+    '''
+    Find the changes that turn network a into network b.
+
+    Components are matched by ID, and only those whose content hashes differ (see EJson.component_hash(...)) are
+    compared in detail, so the cost is dominated by hashing, which is incremental and cached within each EJson. Each
+    network is refreshed once first (see EJson.refresh(...)), so direct writes into component dicts are seen.
+
+    Args:
+        a: original network
+        b: new network
+
+    Returns:
+        Patch dict, which is JSON serialisable, with keys:
+            'properties': {'set': {key: value}, 'unset': [key, ...]} for the network properties.
+            'components': {
+                'added': [component dict (without cons), ...],
+                'removed': [cid, ...],
+                'modified': [{'id': cid, 'set': {key: value}, 'unset': [key, ...]}, ...]
+            }
+            'connections': {
+                'added': [[elem_id, node_id, terminal_idx, connection_data], ...],
+                'removed': [[elem_id, node_id, terminal_idx], ...]
+            }
+        Connections of removed components are not listed separately.
+    '''
+
+    added = []
+    removed = []
+    modified = []
+    cons_added = []
+    cons_removed = []
+
+    a.refresh()
+    b.refresh()
+
+    cids_b = set(x['id'] for x in b.components())
+    for comp in a.components():
+        if comp['id'] not in cids_b:
+            removed.append(comp['id'])
+
+    for comp in b.components():
+        cid = comp['id']
+        if not a.has_component(cid):
+            added.append(comp)
+            if comp['type'] != 'Node':
+                cons_added.extend([cid, x.cid_1, x.term_idx, x.con] for x in b.connections_from(cid))
+            continue
+
+        topo_a, param_a = a.component_hash(cid)
+        topo_b, param_b = b.component_hash(cid)
+        if param_a != param_b:
+            fields_set, fields_unset = _fields_delta(a.component(cid), comp)
+            modified.append({'id': cid, 'set': fields_set, 'unset': fields_unset})
+
+        if topo_a != topo_b and comp['type'] != 'Node':
+            cons_a = _element_cons(a, cid)
+            cons_b = _element_cons(b, cid)
+            for (term_idx, node_id), con in cons_a.items():
+                if cons_b.get((term_idx, node_id)) != con:
+                    cons_removed.append([cid, node_id, term_idx])
+            for (term_idx, node_id), con in cons_b.items():
+                if cons_a.get((term_idx, node_id)) != con:
+                    cons_added.append([cid, node_id, term_idx, con])
+
+    props_set, props_unset = _fields_delta(a.properties, b.properties)
+
+    return {
+        'properties': {'set': props_set, 'unset': props_unset},
+        'components': {'added': added, 'removed': removed, 'modified': modified},
+        'connections': {'added': cons_added, 'removed': cons_removed}
+    }
+
+
+def is_empty_patch(patch: dict) -> bool:
+    '''
+    Return True iff patch, the result of diff(...), contains no changes.
+    '''
+
+    return not any(len(x) > 0 for section in patch.values() for x in section.values())
+
+
+def apply_patch(netw: EJson, patch: dict) -> EJson:
+    '''
+    Apply a patch from diff(a, b) to a network.
+
+    Args:
+        netw: e-JSON network, normally with the same content as a.
+        patch: the patch.
+
+    Returns:
+        in-place mutated network
+    '''
+
+    patch = copy.deepcopy(patch)  # So that netw never shares data with the patch or the network it came from.
+
+    netw.properties.update(patch['properties']['set'])
+    for k in patch['properties']['unset']:
+        netw.properties.pop(k, None)
+
+    for elem_id, node_id, term_idx in patch['connections']['removed']:
+        netw.disconnect(elem_id, node_id, term_idx)
+
+    comps = patch['components']
+    netw.remove_components(comps['removed'])
+
+    for comp in comps['added']:
+        netw.add_comp(comp)
+
+    for mod in comps['modified']:
+        netw.update_comp(mod['id'], mod['set'])
+        if len(mod['unset']) > 0:
+            comp = netw.component(mod['id'])
+            for k in mod['unset']:
+                comp.pop(k, None)
+            netw.touch(mod['id'])
+
+    for elem_id, node_id, term_idx, con in patch['connections']['added']:
+        netw.connect(elem_id, node_id, term_idx, con)
+
+    return netw
@@ -1,27 +1,35 @@
 #! /usr/bin/env python3
 # vim:tw=120:et
 
+import contextlib
 import copy
 from collections import namedtuple
+import functools
+import hashlib
 import importlib.resources
 import json
 import logging
-import sys
+import operator
 from typing import Any, Callable, Generator, List, Optional, Tuple, Union
 
-import networkx as nx
 from ordered_set import OrderedSet
 
 from .dumper import dump_pretty, dumps_pretty
+from .journal import Journal, apply_op
+from .lazy import lazy_import
 
-
-logger = logging.getLogger(__name__)
+nx = lazy_import('networkx')
 
 
-sys.setrecursionlimit(100000)
+logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=None)
 def get_schema() -> dict:
+    '''
+    The e-JSON schema, parsed once and cached. The returned dict is shared, so must not be modified.
+    '''
+
     path = importlib.resources.files('epyjson') / 'e-json-schema.json'
     with path.open() as f:
         schema = json.load(f)
@@ -49,18 +57,42 @@ def order_component_keys(c):
 Connection = namedtuple('Connection', ('cid_0', 'cid_1', 'term_idx', 'con'))
 
 
-def elem_node(con: Connection):
+def _swap(con: Connection) -> Connection:
+    return Connection(con.cid_1, con.cid_0, con.term_idx, con.con)
+
+
+def elem_node(con: Connection, netw: 'EJson' = None):
     '''
-    Order con with the element listed first and then the node.
+    Order con with the element listed first and then the node. Connection data doesn't record the node, so netw is
+    needed to decide unless the connection data has a 'node' key. Returns con itself if no swap is needed.
     '''
-    return Connection(con.cid_1, con.cid_0, con.term_idx, con.con) if con.cid_0 == con.con['node'] else con
+    node_first = netw.component(con.cid_0)['type'] == 'Node' if netw is not None else con.cid_0 == con.con['node']
+    return _swap(con) if node_first else con
 
 
-def node_elem(con: Connection):
+def node_elem(con: Connection, netw: 'EJson' = None):
+    '''
+    Order con with the node listed first and then the element. Connection data doesn't record the node, so netw is
+    needed to decide unless the connection data has a 'node' key. Returns con itself if no swap is needed.
     '''
-    Order con with the node listed first and then the element.
+    node_second = netw.component(con.cid_1)['type'] == 'Node' if netw is not None else con.cid_1 == con.con['node']
+    return _swap(con) if node_second else con
+
+
+def _journaled(method):
     '''
-    return Connection(con.cid_1, con.cid_0, con.term_idx, con.con) if con.cid_1 == con.con['node'] else con
+    Decorator for mutating EJson methods: while journalling, all mutations made by one call form a single edit.
+    '''
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._journal is None:
+            return method(self, *args, **kwargs)
+
+        with self.edit():
+            return method(self, *args, **kwargs)
+
+    return wrapper
 
 
 class EJson:
@@ -68,15 +100,34 @@ class EJson:
         '''
         Constructor for EJson object using an e-JSON dict.
 
+        Component IDs are interned: the nodes of self.graph are stable integer handles, and the component IDs are held
+        in a lookup table. Use handle_of(...) and cid_of(...) to translate when working directly with self.graph.
+
         Args:
             ejson_dict: dict the input e-JSON dict dict
         '''
 
         self.properties = {k: v for k, v in ejson_dict.items() if k != 'components'}
+        self._rank = None  # {handle: rank} once reorder(...) has been called, otherwise None.
+        self._next_rank = 0
+        self._topo_version = 0  # Incremented whenever the topology changes, to invalidate self._arrays.
+        self._param_version = 0  # Incremented whenever component fields are written through update_comp or touch.
+        self._arrays = None
+        self._hashes = {}  # {handle: (topology hash, parameter hash)}, for components not in self._dirty.
+        self._hash_sums = (0, 0)  # Sums of self._hashes, modulo 2^128.
+        self._dirty = set()  # Handles whose hashes need recomputing.
+        self._checks = {}  # {handle: [(dict, keys, values), ...]} for its dicts as last hashed, see refresh().
+        self._journal = None
+        self._unordered = False  # True if undo() has restored components out of order, see _add_comp.
+        self._edit_depth = 0
+        self._listeners = []
         self._make_graph(ejson_dict)
 
     def _make_graph(self, ejson_dict):
-        self.graph = nx.MultiGraph()
+        self._graph = nx.MultiGraph()
+        self._handles = {}  # {cid: handle}
+        self._cids = {}  # {handle: cid}
+        self._next_handle = 0
 
         cons = {}
         for c in _netw_components(ejson_dict):
@@ -88,26 +139,450 @@ class EJson:
         for k, v in cons.items():
             for i, con in enumerate(v):
                 try:
-                    node_id = con['node']
-                    self.connect(k, node_id, i, {k: v for k, v in con.items() if k != 'node'})
+                    self.connect(k, con['node'], i, {ck: cv for ck, cv in con.items() if ck != 'node'})
                 except KeyError as e:
-                    logger.error(f'Connection to non-existent node {node_id} for component {c["id"]} '
-                                 f'with cons {c["cons"]}')
+                    logger.error(f'Connection to non-existent node {con.get("node")} for component {k} '
+                                 f'with cons {v}')
                     raise e
 
     def __str__(self):
         return dumps_pretty(self.raw_ejson)
 
+    def __getstate__(self):
+        # Listeners belong to this object only: they aren't copied by clone(...), or pickled.
+        return {k: v for k, v in self.__dict__.items() if k != '_listeners'}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._listeners = []
+
+    def add_listener(self, listener: Callable):
+        '''
+        Register a listener, called as listener(netw, event, cids) when components change. event is one of:
+            'add': cids were added (or replaced) by add_comp(...).
+            'remove': cids are about to be removed.
+            'update': fields of cids were written, through update_comp(...) or touch(...).
+            'rename': cids are the new IDs of renamed components.
+        Connection changes don't generate events.
+        '''
+
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable):
+        self._listeners.remove(listener)
+
+    def _notify(self, event: str, cids: list):
+        for listener in self._listeners:
+            listener(self, event, cids)
+
+    @_journaled
     def add_comp(self, comp: dict):
-        _graph_add_node(self.graph, {k: v for k, v in comp.items() if k != 'cons'})
+        return self._add_comp(comp)
+
+    def _add_comp(self, comp: dict, handle: Optional[int] = None, rank: Optional[int] = None):
+        # handle and rank are given when undoing the removal of a component, to put it back in its original place in
+        # the component order. Moving it there costs O(n), so is deferred until the order is next needed, see graph.
+        h = self._handles.get(comp['id'])
+        if h is None:
+            if handle is None or handle in self._cids:
+                h = self._next_handle
+                self._next_handle += 1
+            else:
+                h = handle
+                self._unordered = True
+            self._handles[comp['id']] = h
+            self._cids[h] = comp['id']
+            prev = None
+        else:
+            prev = self._graph.nodes[h]['comp']
+
+        _graph_add_node(self._graph, h, {k: v for k, v in comp.items() if k != 'cons'})
+        if self._journal is not None:
+            self._journal.record(['add_comp', self._graph.nodes[h]['comp'], prev])
+        if len(self._listeners) > 0:
+            self._notify('add', [comp['id']])
+        self._topo_version += 1
+        self._dirty.add(h)
+        if self._rank is not None and h not in self._rank:
+            if rank is None:
+                rank = self._next_rank
+                self._next_rank += 1
+            self._rank[h] = rank
 
         return self
 
+    @_journaled
     def connect(self, elem_id: str, node_id: str, con_idx: int, con: dict):
-        _graph_add_edge(self.graph, elem_id, node_id, con_idx, con)
+        if self._journal is not None:
+            prev = self._graph.get_edge_data(self._handles[elem_id], self._handles[node_id], con_idx)
+            self._journal.record(['connect', elem_id, node_id, con_idx, con, None if prev is None else prev['con']])
+
+        _graph_add_edge(self._graph, self._handles[elem_id], self._handles[node_id], con_idx, con)
+        self._topo_version += 1
+        self._dirty.add(self._handles[elem_id])
+
+        return self
+
+    @_journaled
+    def disconnect(self, elem_id: str, node_id: str, con_idx: int):
+        '''
+        Remove the connection from terminal con_idx of elem_id to node_id.
+        '''
+
+        if self._journal is not None:
+            h, h_1 = self._handles[elem_id], self._handles[node_id]
+            con = self._graph.edges[h, h_1, con_idx]['con']
+            orders = {elem_id: self._con_order(h), node_id: self._con_order(h_1)}
+            self._journal.record(['disconnect', elem_id, node_id, con_idx, con, orders])
+
+        self._graph.remove_edge(self._handles[elem_id], self._handles[node_id], con_idx)
+        self._topo_version += 1
+        self._dirty.add(self._handles[elem_id])
+
+        return self
+
+    @_journaled
+    def update_comp(self, cid: str, fields: dict):
+        '''
+        Update fields of component cid.
+
+        Writing fields through this method, rather than directly into the component dict, keeps fingerprint(...) up
+        to date. After writing directly into component dicts, call touch(...) instead.
+
+        Args:
+            cid: ID of the component. Use rename_to(...) to change IDs.
+            fields: {key: value} to set.
+
+        Returns:
+            The updated network.
+        '''
+
+        if 'id' in fields and fields['id'] != cid:
+            raise ValueError(f'Can\'t change the ID of {cid} using update_comp(...): use rename_to(...)')
+
+        h = self._handles[cid]
+        comp = self._graph.nodes[h]['comp']
+        if self._journal is not None:
+            self._journal.record(
+                ['update_comp', cid, fields, {k: comp[k] for k in fields if k in comp}, [k for k in fields if k not in comp]]
+            )
+
+        comp.update(fields)
+        self._dirty.add(h)
+        self._param_version += 1
+        if len(self._listeners) > 0:
+            self._notify('update', [cid])
+
+        return self
+
+    def touch(self, *cids: str):
+        '''
+        Mark components as modified, after their dicts or connection data have been written to directly, so that
+        fingerprint(...) picks up the changes, version changes and listeners are notified. See also refresh(...).
+
+        Args:
+            cids: IDs of the modified components.
+
+        Returns:
+            The network.
+        '''
+
+        self._dirty.update(self._handles[x] for x in cids)
+        self._param_version += 1
+        if len(self._listeners) > 0:
+            self._notify('update', list(cids))
+
+        return self
+
+    def refresh(self) -> List[str]:
+        '''
+        Find components whose dicts or connection data have been written to directly since they were last hashed, and
+        touch(...) them, for when it isn't known which components were written to.
+
+        Each dict is compared by identity with the keys and values it had when it was last hashed, so this costs a
+        cheap check per component, unlike fingerprint(...), which only costs as much as the changes since it was last
+        called. In-place modification of nested values, e.g. appending to a list, isn't found, and needs touch(...).
+
+        Returns:
+            IDs of the components found to have changed.
+        '''
+
+        is_ = operator.is_
+        changed = []
+        for h, checks in self._checks.items():
+            if h in self._dirty:
+                continue
+            for d, keys, values in checks:
+                if len(d) != len(keys) or tuple(d) != keys or not all(map(is_, d.values(), values)):
+                    changed.append(self._cids[h])
+                    break
+
+        if len(changed) > 0:
+            self.touch(*changed)
+
+        return changed
+
+    def fingerprint(self, part: str = 'all') -> str:
+        '''
+        Content fingerprint of the network.
+
+        Each component has a topology hash (its ID, type and, for elements, its connections) and a parameter hash
+        (its full dict). The network fingerprints combine these as sums, so components are only rehashed when they
+        change: calling this on an unchanged network is O(1), and after changes it is O(number of changed
+        components). Changes made through the EJson API, and through the functions in this package, are tracked
+        automatically. Direct writes into component dicts must be followed by touch(...), or by refresh(...).
+
+        Fingerprints don't depend on component order, or on the order in which components were added.
+
+        Args:
+            part: 'topology' for the network structure only, 'parameters' for the component dicts and network
+                properties, or 'all' for both.
+
+        Returns:
+            Hex digest string.
+        '''
+
+        self._update_hashes()
+        topo, param = self._hash_sums
+        if part == 'topology':
+            return f'{topo:032x}'
+
+        param = (param + _digest(self.properties)) % _HASH_MOD
+        if part == 'parameters':
+            return f'{param:032x}'
+        elif part == 'all':
+            return hashlib.blake2b(f'{topo:032x}{param:032x}'.encode(), digest_size=16).hexdigest()
+        else:
+            raise ValueError(f'Unknown fingerprint part {part}')
+
+    def component_hash(self, cid: str) -> Tuple[int, int]:
+        '''
+        Return the (topology hash, parameter hash) of component cid. See fingerprint(...).
+        '''
+
+        self._update_hashes()
+        return self._hashes[self._handles[cid]]
+
+    def _update_hashes(self):
+        if len(self._dirty) == 0:
+            return
+
+        topo, param = self._hash_sums
+        nodes = self._graph.nodes
+        for h in self._dirty:
+            old = self._hashes.pop(h, None)
+            if old is not None:
+                topo -= old[0]
+                param -= old[1]
+
+            if h not in nodes:
+                self._checks.pop(h, None)
+                continue
+
+            comp = nodes[h]['comp']
+            checks = [(comp, tuple(comp), tuple(comp.values()))]
+            if comp['type'] == 'Node':
+                t = _digest([self._cids[h], comp['type']])
+            else:
+                edges = list(self._graph.edges(h, keys=True, data='con'))
+                cons = sorted((k, self._cids[h_1], con) for _, h_1, k, con in edges)
+                t = _digest([self._cids[h], comp['type'], cons])
+                checks.extend((x[3], tuple(x[3]), tuple(x[3].values())) for x in edges)
+
+            new = (t, _digest(comp))
+            self._hashes[h] = new
+            self._checks[h] = checks
+            topo += new[0]
+            param += new[1]
+
+        self._hash_sums = (topo % _HASH_MOD, param % _HASH_MOD)
+        self._dirty.clear()
+
+    @property
+    def journal(self) -> Optional[Journal]:
+        return self._journal
+
+    def start_journal(self) -> Journal:
+        '''
+        Start recording mutations, so that they can be undone, redone, or replayed on another copy of the network.
+
+        Mutations made through the EJson API, including update_comp(...), are recorded. Direct writes into component
+        dicts (followed by touch(...)) are not, and can't be undone.
+
+        Returns:
+            The journal.
+        '''
+
+        if self._journal is None:
+            self._journal = Journal()
+
+        return self._journal
+
+    def stop_journal(self) -> Optional[Journal]:
+        '''
+        Stop recording mutations.
+
+        Returns:
+            The journal that was being recorded, if any.
+        '''
+
+        journal = self._journal
+        self._journal = None
+        return journal
+
+    @contextlib.contextmanager
+    def edit(self):
+        '''
+        Context manager that groups all mutations made within it into a single journal entry, so that they are undone
+        and redone together. Calls to mutating EJson methods are already grouped in this way.
+        '''
+
+        self._edit_depth += 1
+        try:
+            yield self
+        finally:
+            self._edit_depth -= 1
+            if self._edit_depth == 0 and self._journal is not None:
+                self._journal.commit()
+
+    def undo(self):
+        '''
+        Undo the last journalled edit. The cost is proportional to the size of the edit. If it removed components,
+        putting them back in their original places in the component order takes a pass over the network, which is
+        deferred until the order is next needed, so is made once for a run of undos.
+
+        Returns:
+            The network.
+        '''
+
+        journal = self._journal
+        if journal is None or len(journal.done) == 0:
+            raise ValueError('Nothing to undo')
+
+        entry = journal.done.pop()
+        self._journal = None
+        try:
+            for op in reversed(entry):
+                apply_op(self, op, inverse=True)
+        finally:
+            self._journal = journal
+        journal.undone.append(entry)
+
+        return self
+
+    def redo(self):
+        '''
+        Redo the last undone edit.
+
+        Returns:
+            The network.
+        '''
+
+        journal = self._journal
+        if journal is None or len(journal.undone) == 0:
+            raise ValueError('Nothing to redo')
+
+        entry = journal.undone.pop()
+        self._journal = None
+        try:
+            for op in entry:
+                apply_op(self, op)
+        finally:
+            self._journal = journal
+        journal.done.append(entry)
 
         return self
 
+    @property
+    def graph(self) -> 'nx.MultiGraph':
+        '''
+        The underlying graph, with a node for each component, keyed by handle, and an edge for each connection. It
+        should be treated as read only: use the methods of EJson to make changes.
+        '''
+
+        if self._unordered:
+            self._restore_order()
+        return self._graph
+
+    def _restore_order(self):
+        # Components are ordered by handle, or by rank once reordered, as handles and ranks are only ever appended.
+        _graph_sort_nodes(self._graph)
+        if self._rank is not None:
+            rank = sorted(self._rank.items(), key=lambda x: x[1])
+            self._rank.clear()
+            self._rank.update(rank)
+        self._unordered = False
+
+    def _con_order(self, h: int) -> list:
+        # Connections of component h, as [[cid, con_idx], ...] in graph order, which for elements is the order of
+        # their 'cons'.
+        return [[self._cids[x[1]], x[2]] for x in self._graph.edges(h, keys=True)]
+
+    def _set_con_order(self, cid: str, order: list):
+        # Put the connections of cid in order, from _con_order(...), e.g. after connections have been restored one at
+        # a time by undo(...).
+        _graph_order_edges(self._graph, self._handles[cid], [(self._handles[x[0]], x[1]) for x in order])
+        self._topo_version += 1
+
+    def handle_of(self, cid: str) -> int:
+        '''
+        Return the internal handle of component cid, i.e. its node in self._graph.
+        '''
+
+        return self._handles[cid]
+
+    def cid_of(self, handle: int) -> str:
+        '''
+        Return the ID of the component with internal handle handle.
+        '''
+
+        return self._cids[handle]
+
+    def has_component(self, cid: str) -> bool:
+        return cid in self._handles
+
+    def _connection(self, edge: tuple) -> Connection:
+        return Connection(self._cids[edge[0]], self._cids[edge[1]], edge[2], edge[3])
+
+    def _elem_node_connection(self, edge: tuple) -> Connection:
+        if self._graph.nodes[edge[0]]['comp']['type'] == 'Node':
+            return Connection(self._cids[edge[1]], self._cids[edge[0]], edge[2], edge[3])
+
+        return Connection(self._cids[edge[0]], self._cids[edge[1]], edge[2], edge[3])
+
+    def adjacency(self):
+        '''
+        Return an array-backed snapshot of the network structure, for fast, allocation-free queries.
+
+        The snapshot is cached until the topology of the network next changes through the EJson API (directly
+        modifying self._graph will not invalidate it).
+
+        Returns:
+            NetworkArrays snapshot.
+        '''
+
+        if self._arrays is None or self._arrays[0] != self._topo_version:
+            from .arrays import NetworkArrays
+            self._arrays = (self._topo_version, NetworkArrays(self))
+
+        return self._arrays[1]
+
+    @property
+    def version(self) -> Tuple[int, int]:
+        '''
+        (topology version, parameter version): counters that increase whenever the topology changes, or component
+        fields are written through update_comp(...) or touch(...). Useful for invalidating derived data.
+        '''
+
+        return (self._topo_version, self._param_version)
+
+    def degree(self, cid: str) -> int:
+        '''
+        Return the number of connections from cid.
+        '''
+
+        return self._graph.degree(self._handles[cid])
+
     @staticmethod
     def read_from_file(path):
 
@@ -151,7 +626,13 @@ class EJson:
             Generator over component dicts
         '''
 
-        retval = (v for k, v in self.graph.nodes(data='comp'))
+        graph = self.graph  # Restores the order, if need be.
+        if self._rank is None:
+            retval = (v for k, v in graph.nodes(data='comp'))
+        else:
+            nodes = graph.nodes
+            retval = (nodes[k]['comp'] for k in self._rank)
+
         if ctype is not None:
             retval = (x for x in retval if x['type'] == ctype)
 
@@ -164,20 +645,41 @@ class EJson:
         return retval
 
     def component(self, cid: str) -> dict:
-        return self.graph.nodes[cid]['comp']
+        return self._graph.nodes[self._handles[cid]]['comp']
 
     def connections(self):
         '''
         Return all connections in the network
 
         Returns:
-            (Connection(component_1, component_2, terminal_idx, connection_data), ...)
+            (Connection(element, node, terminal_idx, connection_data), ...)
             where terminal_idx is the index in the element's 'cons' array,
             e.g. for a line or transformer with two terminals, terminal_idx
             could be either 0 or 1
         '''
 
-        return (Connection(*x) for x in self.graph.edges(keys=True, data='con'))
+        graph = self.graph  # Restores the order, if need be.
+        if self._rank is None:
+            return (self._elem_node_connection(x) for x in graph.edges(keys=True, data='con'))
+
+        return self._ranked_connections()
+
+    def _ranked_connections(self):
+        # Mirrors the networkx edge iteration order, but over the reordered components.
+        done = set()
+        for h in self._rank:
+            for x in self._edges_from(h):
+                if x[1] not in done:
+                    yield self._elem_node_connection(x)
+            done.add(h)
+
+    def _edges_from(self, h: int):
+        edges = self._graph.edges(h, keys=True, data='con')
+        if self._rank is not None and self._graph.nodes[h]['comp']['type'] == 'Node':
+            # Element terminals are put in order by reorder(...) itself; node connections are ordered lazily, here.
+            edges = sorted(edges, key=lambda x: self._rank[x[1]])
+
+        return edges
 
     def connections_from(self, cid: str):
         '''
@@ -193,7 +695,23 @@ class EJson:
             could be either 0 or 1
         '''
 
-        return (Connection(*x) for x in self.graph.edges(cid, keys=True, data='con'))
+        return (self._connection(x) for x in self._edges_from(self._handles[cid]))
+
+    def connections_from_many(self, cids):
+        '''
+        Return the connections from each of cids, as lightweight views over the cached adjacency() snapshot.
+
+        Args:
+            cids: The components we want to find connections from
+
+        Returns:
+            [ConnectionsView, ...], one per cid. Iterating over a view yields the same Connections as
+            connections_from(cid), while its rows, cids and term_idxs properties give the same information without
+            creating any Connection tuples.
+        '''
+
+        arrays = self.adjacency()
+        return [arrays.connections_from(arrays.rows[cid]) for cid in cids]
 
     def connections_between(self, cid_a: str, cid_b: str):
         '''
@@ -211,43 +729,114 @@ class EJson:
         '''
 
         try:
-            return (Connection(cid_a, cid_b, k, v['con']) for k, v in self.graph.adj[cid_a][cid_b].items())
+            adj = self._graph.adj[self._handles[cid_a]][self._handles[cid_b]]
         except KeyError:
             return ()
 
+        return (Connection(cid_a, cid_b, k, v['con']) for k, v in adj.items())
+
     def neighbors(self, cid: str):
-        return self.graph.neighbors(cid)
+        h = self._handles[cid]
+        if self._rank is None:
+            return (self._cids[x] for x in self._graph.neighbors(h))
+
+        return iter(OrderedSet(self._cids[x[1]] for x in self._edges_from(h)))
 
+    @_journaled
     def reconnect_elem(self, cid, node_remap: dict):
-        cons = list(list(x) for x in self.connections_from(cid))
+        h = self._handles[cid]
+        h_remap = {self._handles[k]: self._handles[v] for k, v in node_remap.items()}
+        cons = list(self._graph.edges(h, keys=True, data='con'))
+        self._set_cons(h, cons, [(h_0, h_remap.get(h_1, h_1), term_idx, con) for h_0, h_1, term_idx, con in cons])
 
-        for con in cons:
-            self.graph.remove_edge(con[0], con[1], con[2])
+        return self
 
-            for k, v in node_remap.items():
-                if con[1] == k:
-                    con[1] = v
+    @_journaled
+    def set_cons(self, elem_id: str, cons: list):
+        '''
+        Replace all connections of element elem_id.
 
-        for con in cons:
-            self.connect(*con)
+        Args:
+            elem_id: ID of the element.
+            cons: [[node_id, con_idx, con], ...]
+
+        Returns:
+            The network.
+        '''
+
+        h = self._handles[elem_id]
+        self._set_cons(
+            h, list(self._graph.edges(h, keys=True, data='con')), [(h, self._handles[x[0]], x[1], x[2]) for x in cons]
+        )
 
         return self
 
+    def _set_cons(self, h: int, old_cons: list, new_cons: list):
+        if self._journal is not None:
+            self._journal.record(
+                ['set_cons', self._cids[h], [[self._cids[x[1]], x[2], x[3]] for x in old_cons],
+                 [[self._cids[x[1]], x[2], x[3]] for x in new_cons],
+                 {self._cids[h_1]: self._con_order(h_1) for h_1 in {x[1] for x in old_cons}}]
+            )
+
+        for con in old_cons:
+            self._graph.remove_edge(con[0], con[1], con[2])
+
+        for h_0, h_1, term_idx, con in new_cons:
+            _graph_add_edge(self._graph, h_0, h_1, term_idx, con)
+
+        self._topo_version += 1
+        self._dirty.add(h)
+
+    @_journaled
     def remove_component(self, cid: str):
         '''
         Remove a component.
         '''
 
-        self.graph.remove_node(cid)
+        if self._journal is not None:
+            h = self._handles[cid]
+            comp = self._graph.nodes[h]['comp']
+            edges = list(self._graph.edges(h, keys=True, data='con'))
+            cons = [list(self._elem_node_connection(x)) for x in edges]
+            # Restoring the connections one at a time would change the order of the neighbours' connections.
+            orders = {self._cids[x[1]]: self._con_order(x[1]) for x in edges}
+            rank = None if self._rank is None else self._rank.get(h)
+            self._journal.record(['remove_component', comp, cons, h, rank, orders])
+
+        if len(self._listeners) > 0:
+            self._notify('remove', [cid])
+
+        h = self._handles.pop(cid)
+        del self._cids[h]
+        self._dirty.update(self._graph.neighbors(h))
+        self._dirty.add(h)
+        self._graph.remove_node(h)
+        self._topo_version += 1
+        if self._rank is not None:
+            self._rank.pop(h, None)
+
         return self
 
+    @_journaled
+    def remove_components(self, cids):
+        '''
+        Remove several components.
+        '''
+
+        for cid in list(cids):
+            self.remove_component(cid)
+
+        return self
+
+    @_journaled
     def remove_unconnected_nodes(self):
         '''
         Removes unconnected nodes from the graph
         '''
         to_remove = []
         for c in self.components(nodes_only=True):
-            if len(list(self.connections_from(c['id']))) == 0:
+            if self.degree(c['id']) == 0:
                 to_remove.append(c['id'])
 
         for cid in to_remove:
@@ -305,63 +894,106 @@ class EJson:
 
     def _dfs(
         self,
-        curr_comp_id: str,
+        start_id: str,
         pre_cb: Optional[Callable],
         post_cb: Optional[Callable],
         visited: OrderedSet,
         accum: Any
     ) -> Tuple[List[str], Any]:
 
-        if (curr_comp_id in visited):
-            return visited, accum
-
-        curr_comp = self.component(curr_comp_id)
-
-        if pre_cb is not None:
-            stop, accum = pre_cb(self, curr_comp, accum)
-            if stop:
-                return visited, accum
-
-        visited.add(curr_comp_id)
-        for _, adj_comp, _, con in self.connections_from(curr_comp_id):
-            visited, accum = self._dfs(adj_comp, pre_cb=pre_cb, post_cb=post_cb, visited=visited, accum=accum)
-
-        if post_cb is not None:
-            accum = post_cb(self, curr_comp, accum)
+        # Iterative, using an explicit stack of (component, iterator over adjacent component IDs), so that deep
+        # networks such as long rural strings don't exhaust the Python stack.
+        def enter(comp_id):
+            nonlocal accum
+            if comp_id in visited:
+                return None
+
+            comp = self.component(comp_id)
+            if pre_cb is not None:
+                stop, accum = pre_cb(self, comp, accum)
+                if stop:
+                    return None
+
+            visited.add(comp_id)
+            return (comp, (x[1] for x in self.connections_from(comp_id)))
+
+        frame = enter(start_id)
+        stack = [] if frame is None else [frame]
+        while len(stack) > 0:
+            comp, adj = stack[-1]
+            adj_id = next(adj, None)
+            if adj_id is not None:
+                frame = enter(adj_id)
+                if frame is not None:
+                    stack.append(frame)
+                continue
+
+            stack.pop()
+            if post_cb is not None:
+                accum = post_cb(self, comp, accum)
 
         return visited, accum
 
+    @_journaled
     def reorder(self, start_id: str):
         '''
         Reorder the components in the network, according to a depth-first search.
 
+        The graph itself is not rebuilt. Instead, the DFS rank of each component is recorded, and is used to order
+        components and node connections as they are iterated over or serialised. Element terminals (other than those
+        of transformers) are renumbered in place, so that terminal_idx remains consistent with the new ordering.
+        Components that are not reachable from start_id are removed.
+
         Args:
-            ejson: e-JSON network
             start_id: starting component for the depth first search.
 
         Returns:
             Reordered network.
         '''
 
-        ordering = {n: i for i, n in enumerate(nx.dfs_preorder_nodes(self.graph, source=start_id))}
-        new_graph = nx.MultiGraph()
-        new_graph.add_nodes_from((k, {'comp': self.component(k)}) for k in ordering.keys())
+        old_rank, old_next_rank = self._rank_by_cid(), self._next_rank
+        rank = {n: i for i, n in enumerate(nx.dfs_preorder_nodes(self.graph, source=self._handles[start_id]))}
+        if len(rank) != len(self._graph):
+            self.remove_components([self._cids[h] for h in self._graph if h not in rank])
 
         # Re-order connections. Don't mess with transformer ordering as this would swap primary and secondary.
-        for _, c in new_graph.nodes(data='comp'):
-            if c['type'] != 'Node':
-                cons = list(self.connections_from(c['id']))
+        for h in rank:
+            if self._graph.nodes[h]['comp']['type'] in ('Node', 'Transformer'):
+                continue
 
-                if c['type'] != 'Transformer':
-                    cons = sorted(cons, key=lambda x: ordering[x.cid_1])
+            cons = list(self._graph.edges(h, keys=True, data='con'))
+            if len(cons) < 2:
+                continue
 
-                for i, con in enumerate(cons):
-                    new_graph.add_edge(con.cid_0, con.cid_1, key=i, con=con.con)
+            cons_sorted = sorted(cons, key=lambda x: rank[x[1]])
+            if [x[2] for x in cons_sorted] == list(range(len(cons))) and cons_sorted == cons:
+                continue
 
-        self.graph = new_graph
+            self._set_cons(h, cons, [(x[0], x[1], i, x[3]) for i, x in enumerate(cons_sorted)])
+
+        self._rank = rank
+        self._next_rank = len(rank)
+        self._topo_version += 1
+        if self._journal is not None:
+            self._journal.record(['reorder', old_rank, self._rank_by_cid(), old_next_rank, self._next_rank])
 
         return self
 
+    def _rank_by_cid(self) -> Optional[dict]:
+        return None if self._rank is None else {self._cids[h]: r for h, r in self._rank.items()}
+
+    def _set_rank(self, rank: Optional[dict], next_rank: int):
+        # Set the ranks from _rank_by_cid(...), e.g. to undo or replay reorder(...). Components that aren't present
+        # are skipped: when undoing, those removed by reorder(...) get their ranks back as they are restored.
+        if rank is None:
+            self._rank = None
+        else:
+            handles = self._handles
+            self._rank = {handles[k]: r for k, r in sorted(rank.items(), key=lambda x: x[1]) if k in handles}
+        self._next_rank = next_rank
+        self._topo_version += 1
+
+    @_journaled
     def trim(self, start_id: str, stop_cb: Callable = None):
         '''
         Remove selected components.
@@ -383,6 +1015,7 @@ class EJson:
 
         return self
 
+    @_journaled
     def only(self, start_id: str, stop_cb: Callable = None):
         '''
         Keep only selected components.
@@ -405,42 +1038,80 @@ class EJson:
 
         return self
 
+    @_journaled
     def rename(self):
         '''
         Rename according to a standard naming scheme.
 
         Returns:
-            New graph with renamed components.
+            (renamed network, {old_name: new_name} mapping)
         '''
 
-        i_dict = {}
+        counts = {}
         rename_dict = {}
         for c in self.components():
-            prefix_a = c['type'].lower()
-            i = i_dict.setdefault(prefix_a, 1)
-            i_dict[prefix_a] += 1
-            rename_dict[c['id']] = f'{prefix_a}_{i}'
+            prefix = c['type'].lower()
+            i = counts.get(prefix, 0) + 1
+            counts[prefix] = i
+            rename_dict[c['id']] = prefix + '_' + str(i)
 
         return (self.rename_to(rename_dict), rename_dict)
 
+    @_journaled
     def rename_to(self, rename_dict: dict):
         '''
         Rename according to a provided dict.
 
+        Only the ID lookup table and the renamed component dicts are updated; the graph itself is untouched, so the
+        cost is proportional to the number of renamed components. Old names that don't exist are ignored.
+
         Args:
             rename_dict: {old_name: new_name} mapping.
 
         Returns:
-            New graph with renamed components.
+            The renamed network.
         '''
 
-        self.graph = nx.relabel_nodes(self.graph, rename_dict)
-        for cid, cdat in self.graph.nodes(data='comp'):
-            cdat['id'] = cid
+        renames = [(self._handles[old], new) for old, new in rename_dict.items() if old in self._handles]
+        taken = set()
+        for h, new in renames:
+            if new in taken or (new in self._handles and new not in rename_dict):
+                raise ValueError(f'Can\'t rename {self._cids[h]} to {new}: a component with this ID already exists')
+            taken.add(new)
+
+        if self._journal is not None:
+            self._journal.record(['rename_to', {self._cids[h]: new for h, new in renames}])
+
+        for h, _ in renames:
+            del self._handles[self._cids[h]]
+
+        for h, new in renames:
+            self._handles[new] = h
+            self._cids[h] = new
+            self._graph.nodes[h]['comp']['id'] = new
+            self._dirty.add(h)
+            self._dirty.update(self._graph.neighbors(h))
+
+        if len(renames) > 0:
+            self._topo_version += 1
+            if len(self._listeners) > 0:
+                self._notify('rename', [new for _, new in renames])
 
         return self
 
 
+_HASH_MOD = 1 << 128
+
+
+def _digest(x) -> int:
+    '''
+    128 bit hash of a JSON-like object.
+    '''
+
+    s = json.dumps(x, sort_keys=True, separators=(',', ':'), default=str)
+    return int.from_bytes(hashlib.blake2b(s.encode(), digest_size=16).digest(), 'little')
+
+
 def _netw_components(netw_ejson, ctype: str = None) -> Generator:
     '''
     Generator to iterate through components in an e-JSON network.
@@ -456,9 +1127,36 @@ def _netw_components(netw_ejson, ctype: str = None) -> Generator:
            (x for x in netw_ejson['components'] if x.cid_1 == ctype)
 
 
-def _graph_add_node(graph: nx.MultiGraph, c: dict):
-    graph.add_node(c['id'], comp=c)
+def _graph_add_node(graph: 'nx.MultiGraph', h: int, c: dict):
+    graph.add_node(h, comp=c)
 
 
-def _graph_add_edge(graph: nx.MultiGraph, elem_id: str, node_id: str, con_idx: int, con: dict):
+def _graph_add_edge(graph: 'nx.MultiGraph', elem_id: str, node_id: str, con_idx: int, con: dict):
     graph.add_edge(elem_id, node_id, key=con_idx, con=con)
+
+
+def _graph_sort_nodes(graph: 'nx.MultiGraph'):
+    # Sorted in place, as graph views hold references to these dicts.
+    for d in (graph._node, graph._adj):
+        items = sorted(d.items(), key=lambda x: x[0])
+        d.clear()
+        d.update(items)
+
+
+def _graph_order_edges(graph: 'nx.MultiGraph', h: int, order: list):
+    # Reorder the edges from h to order, [(neighbour, key), ...], without touching the neighbours' own adjacency.
+    # Key dicts are shared between both ends of the edges, but only h's edges to each neighbour are in them.
+    nbrs = graph._adj[h]
+    keys = {}
+    for h_1, k in order:
+        keys.setdefault(h_1, []).append(k)
+
+    for h_1, ks in keys.items():
+        keydict = nbrs[h_1]
+        items = [(k, keydict[k]) for k in ks] + [x for x in keydict.items() if x[0] not in ks]
+        keydict.clear()
+        keydict.update(items)
+
+    items = [(h_1, nbrs[h_1]) for h_1 in keys] + [x for x in nbrs.items() if x[0] not in keys]
+    nbrs.clear()
+    nbrs.update(items)
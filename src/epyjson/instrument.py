@@ -0,0 +1,123 @@
+import contextlib
+from collections import namedtuple
+import time
+from typing import Callable, Dict, Optional
+
+from .ejson import EJson
+
+
+StageEvent = namedtuple('StageEvent', ['name', 'seconds', 'n_before', 'n_after', 'details'])
+StageEvent.__doc__ = '''
+Report of one run of an instrumented stage, passed to each observer.
+
+Attributes:
+    name: stage name, e.g. 'reduce_network.merge_strings' or 'audit.schema_errors'.
+    seconds: wall time spent in the stage.
+    n_before: number of components in the network before the stage.
+    n_after: number of components in the network after the stage.
+    details: dict of stage specific values, e.g. {'n_problems': 3} for audit checks.
+'''
+
+Observer = Callable[[StageEvent], None]
+
+_observers = []
+
+
+def add_observer(observer: Observer):
+    '''
+    Register an observer, which will be called with a StageEvent after each run of an instrumented stage.
+
+    Instrumented stages are the sub-stages of reduce_network(...) and the checks of audit(...). While no observer is
+    registered, nothing is timed or counted.
+    '''
+
+    _observers.append(observer)
+
+
+def remove_observer(observer: Observer):
+    _observers.remove(observer)
+
+
+def is_observed() -> bool:
+    return len(_observers) > 0
+
+
+@contextlib.contextmanager
+def observing(observer: Observer):
+    '''
+    Context manager to register observer for the duration of a block.
+    '''
+
+    add_observer(observer)
+    try:
+        yield observer
+    finally:
+        remove_observer(observer)
+
+
+def notify(event: StageEvent):
+    for observer in list(_observers):
+        observer(event)
+
+
+class _Stage:
+    def __init__(self, name: str, netw: EJson):
+        self.name = name
+        self.netw = netw
+
+    def __enter__(self):
+        self.n_before = len(self.netw.graph)
+        self.t_0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.t_0
+        if exc_type is None:
+            notify(StageEvent(self.name, seconds, self.n_before, len(self.netw.graph), {}))
+
+
+_null_stage = contextlib.nullcontext()
+
+
+def stage(name: str, netw: EJson):
+    '''
+    Context manager that instruments a stage operating on netw.
+
+    If there are no observers, this returns a shared no-op context, so that instrumentation costs nothing.
+    '''
+
+    return _Stage(name, netw) if len(_observers) > 0 else _null_stage
+
+
+class StageProfiler:
+    '''
+    Observer that accumulates calls, time and components removed for each stage.
+
+    Example:
+        with observing(StageProfiler()) as prof:
+            reduce_network(netw)
+        print(prof.stats)
+    '''
+
+    def __init__(self):
+        self.stats = {}  # {name: {'calls': int, 'seconds': float, 'removed': int, **summed details}}
+
+    def __call__(self, event: StageEvent):
+        s = self.stats.setdefault(event.name, {'calls': 0, 'seconds': 0.0, 'removed': 0})
+        s['calls'] += 1
+        s['seconds'] += event.seconds
+        s['removed'] += event.n_before - event.n_after
+        for k, v in event.details.items():
+            s[k] = s.get(k, 0) + v
+
+    def reset(self):
+        self.stats = {}
+
+    def summary(self, prefix: Optional[str] = None) -> Dict[str, dict]:
+        '''
+        Returns:
+            stats for the stages whose names start with prefix (or all), slowest first.
+        '''
+
+        items = [(k, v) for k, v in self.stats.items() if prefix is None or k.startswith(prefix)]
+        return dict(sorted(items, key=lambda x: -x[1]['seconds']))
@@ -0,0 +1,138 @@
+import copy
+from typing import List
+
+
+class Journal:
+    '''
+    Journal of the mutations made to an EJson network, used for undo / redo and for replaying edits elsewhere.
+
+    The journal is a list of entries, each of which is one edit: a list of primitive operations. Operations are plain
+    JSON lists, recording enough of the state before the change that they can be inverted:
+
+        ['add_comp', comp, prev_comp or None]
+        ['connect', elem_id, node_id, con_idx, con, prev_con or None]
+        ['disconnect', elem_id, node_id, con_idx, con, {cid: con_order}]
+        ['set_cons', elem_id, old_cons, new_cons, {cid: con_order}], with cons as [[node_id, con_idx, con], ...]
+        ['remove_component', comp, [[elem_id, node_id, con_idx, con], ...], handle, rank, {cid: con_order}]
+        ['rename_to', {old_name: new_name}]
+        ['update_comp', cid, new_fields, old_fields, added_keys]
+        ['reorder', old_rank, new_rank, old_next_rank, new_next_rank], with ranks as {cid: rank} or None
+
+    where con_order is [[cid, con_idx], ...], the order of the connections of a neighbouring component before the
+    change, and handle and rank are the internal handle and rank (or None) of the removed component, so that undoing
+    the removal puts it back in its original place. Undoing an edit thus restores the order of components and
+    connections exactly, as well as their content.
+
+    Don't create a Journal directly: use EJson.start_journal().
+    '''
+
+    def __init__(self, done: List[list] = None, undone: List[list] = None):
+        self.done = [] if done is None else done
+        self.undone = [] if undone is None else undone
+        self.pending = []
+
+    def record(self, op: list):
+        self.pending.append(copy.deepcopy(op))
+
+    def commit(self):
+        if len(self.pending) > 0:
+            self.done.append(self.pending)
+            self.undone.clear()
+        self.pending = []
+
+    def to_json(self) -> dict:
+        '''
+        Returns:
+            JSON serialisable dict, which can be passed to from_json(...).
+        '''
+
+        return {'done': self.done, 'undone': self.undone}
+
+    @staticmethod
+    def from_json(d: dict) -> 'Journal':
+        return Journal(copy.deepcopy(d['done']), copy.deepcopy(d['undone']))
+
+    def replay(self, netw, start: int = 0):
+        '''
+        Apply the done entries of this journal, from entry start onwards, to netw, e.g. another process's copy of the
+        same base network. If netw is journalling, each entry is recorded there as a single edit.
+
+        Returns:
+            in-place mutated network
+        '''
+
+        for entry in self.done[start:]:
+            with netw.edit():
+                for op in entry:
+                    apply_op(netw, op)
+
+        return netw
+
+
+def apply_op(netw, op: list, inverse: bool = False):
+    '''
+    Apply a journal operation, or its inverse, to netw.
+    '''
+
+    kind = op[0]
+    if kind == 'add_comp':
+        _, comp, prev = op
+        if not inverse:
+            netw.add_comp(copy.deepcopy(comp))
+        elif prev is None:
+            netw.remove_component(comp['id'])
+        else:
+            netw.add_comp(copy.deepcopy(prev))
+    elif kind == 'connect':
+        _, elem_id, node_id, con_idx, con, prev = op
+        if not inverse:
+            netw.connect(elem_id, node_id, con_idx, copy.deepcopy(con))
+        elif prev is None:
+            netw.disconnect(elem_id, node_id, con_idx)
+        else:
+            netw.connect(elem_id, node_id, con_idx, copy.deepcopy(prev))
+    elif kind == 'disconnect':
+        _, elem_id, node_id, con_idx, con, orders = op
+        if not inverse:
+            netw.disconnect(elem_id, node_id, con_idx)
+        else:
+            netw.connect(elem_id, node_id, con_idx, copy.deepcopy(con))
+            for cid, order in orders.items():
+                netw._set_con_order(cid, order)
+    elif kind == 'set_cons':
+        _, elem_id, old_cons, new_cons, orders = op
+        netw.set_cons(elem_id, copy.deepcopy(old_cons if inverse else new_cons))
+        if inverse:
+            for cid, order in orders.items():
+                netw._set_con_order(cid, order)
+    elif kind == 'remove_component':
+        _, comp, cons, handle, rank, orders = op
+        if not inverse:
+            netw.remove_component(comp['id'])
+        else:
+            netw._add_comp(copy.deepcopy(comp), handle, rank)
+            for elem_id, node_id, con_idx, con in cons:
+                netw.connect(elem_id, node_id, con_idx, copy.deepcopy(con))
+            for cid, order in orders.items():
+                netw._set_con_order(cid, order)
+    elif kind == 'rename_to':
+        _, rename_dict = op
+        netw.rename_to({v: k for k, v in rename_dict.items()} if inverse else rename_dict)
+    elif kind == 'update_comp':
+        _, cid, new_fields, old_fields, added_keys = op
+        if not inverse:
+            netw.update_comp(cid, copy.deepcopy(new_fields))
+        else:
+            netw.update_comp(cid, copy.deepcopy(old_fields))
+            comp = netw.component(cid)
+            for k in added_keys:
+                comp.pop(k, None)
+            netw.touch(cid)
+    elif kind == 'reorder':
+        _, old_rank, new_rank, old_next_rank, new_next_rank = op
+        if not inverse:
+            netw._set_rank(new_rank, new_next_rank)
+        else:
+            netw._set_rank(old_rank, old_next_rank)
+    else:
+        raise ValueError(f'Unknown journal operation {kind}')
@@ -0,0 +1,33 @@
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    '''
+    Import a module lazily: the returned module is only executed when one of its attributes is first accessed.
+
+    Use this for heavy dependencies that are only needed by some code paths, so that importing epyjson stays fast.
+    If the module has already been imported, it is returned as is.
+
+    Args:
+        name: absolute module name, e.g. 'networkx'.
+
+    Returns:
+        module
+    '''
+
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+
+    return module
@@ -0,0 +1,320 @@
+'''
+Conversion from the legacy e-JSON 0 format. See utils/convert_from_ejson_0.md for the differences between the formats.
+
+Conversion is streaming: legacy components are parsed, converted and written one at a time, so arbitrarily large files
+can be converted in bounded memory.
+'''
+
+from collections import namedtuple
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+from .ejson import order_component_keys
+from .streaming import PathLike, _Reader, open_file
+
+
+LegacyConversion = namedtuple('LegacyConversion', ['src', 'dst', 'n_components', 'problems', 'seconds'])
+LegacyConversion.__doc__ = '''
+Result of converting a legacy e-JSON 0 file.
+
+Attributes:
+    src: input path
+    dst: output path
+    n_components: number of components written.
+    problems: schema problem dicts for the output, as in audit(...)['schema_errors']['problems'], or None if the output
+        wasn't validated.
+    seconds: wall time of the conversion.
+'''
+
+# e-JSON 0 units keys, and the scale factors they imply, by quantity.
+_UNITS = {'voltage': 'vf', 'impedance': 'zf', 'power': 'pf', 'current': 'if_'}
+
+
+class LegacyReader:
+    '''
+    Read an e-JSON 0 file incrementally, like StreamingReader.
+
+    components() yields (id, type, data) for each legacy component, in file order. Top level properties, including
+    units, are collected into self.properties as they are read.
+    '''
+
+    def __init__(self, f: IO[str], chunk_size: int = 1 << 16):
+        self._reader = _Reader(f, chunk_size)
+        self.properties = {}
+        self._started = False
+
+    def components(self) -> Iterator[Tuple[str, str, dict]]:
+        if self._started:
+            raise ValueError('components() can only be iterated once')
+        self._started = True
+
+        r = self._reader
+        r.expect('{')
+        if r.peek() == '}':
+            r.pos += 1
+            return
+
+        while True:
+            key = r.value()
+            if not isinstance(key, str):
+                raise ValueError('Invalid e-JSON 0: expected a property name')
+            r.expect(':')
+            if key == 'components':
+                r.expect('{')
+                if r.peek() == '}':
+                    r.pos += 1
+                else:
+                    while True:
+                        cid = r.value()
+                        r.expect(':')
+                        c = r.value()
+                        if not isinstance(cid, str) or not isinstance(c, dict):
+                            raise ValueError('Invalid e-JSON 0: expected "<id>": {"<type>": {...}} in components')
+                        for ctype, data in c.items():
+                            yield cid, ctype, data
+                        if r.expect(',}') == '}':
+                            break
+            else:
+                self.properties[key] = r.value()
+
+            if r.expect(',}') == '}':
+                break
+
+
+def scale_factors(units: Optional[dict]) -> dict:
+    '''
+    Args:
+        units: e-JSON 0 units dict, e.g. {'voltage': 1000, 'impedance': 1, 'power': 1000, 'current': 1}, or None.
+            Missing quantities are taken to be in SI units already.
+
+    Returns:
+        {'vf': ..., 'zf': ..., 'pf': ..., 'if_': ...}, the factors that convert each quantity to SI units.
+    '''
+
+    units = units or {}
+    return {f: units.get(q, 1.0) for q, f in _UNITS.items()}
+
+
+def _tocplx(z):
+    return complex(*z) if isinstance(z, list) else complex(z, 0.0)
+
+
+def _fromcplx(z):
+    return [z.real, z.imag]
+
+
+def convert_component(cid: str, ctype: str, data: dict, factors: dict) -> dict:
+    '''
+    Convert an e-JSON 0 component to the current format.
+
+    Args:
+        cid: component ID
+        ctype: e-JSON 0 component type
+        data: e-JSON 0 component data
+        factors: unit scale factors, from scale_factors(...)
+
+    Returns:
+        Component dict.
+    '''
+
+    vf, zf, pf, if_ = factors['vf'], factors['zf'], factors['pf'], factors['if_']
+
+    c = {'id': cid, 'type': 'Generator' if ctype == 'Gen' else ctype}
+    c.update((k, v) for k, v in data.items() if k not in ('id', 'type'))
+
+    if 'v_base' in c:
+        c['v_base'] *= vf
+
+    if 'v_setpoint' in c:
+        c['v_setpoint'] *= vf
+
+    if 'v_winding_base' in c:
+        c['v_winding_base'] = [x * vf for x in c['v_winding_base']]
+
+    if c['type'] == 'Transformer':
+        if 'z' in c:
+            (c['z_p'], c['z_s']) = [_fromcplx(_tocplx(x) * zf) for x in c.pop('z')]
+
+        if 'z0' in c:
+            (c['z0_p'], c['z0_s']) = [_fromcplx(_tocplx(x) * zf) for x in c.pop('z0')]
+    else:
+        if 'z' in c:
+            c['z'] = _fromcplx(_tocplx(c['z']) * zf)
+
+        if 'z0' in c:
+            c['z0'] = _fromcplx(_tocplx(c['z0']) * zf)
+
+    if 's_max' in c:
+        c['s_max'] *= pf
+
+    if 'i_max' in c:
+        c['i_max'] *= if_
+
+    return order_component_keys(c)
+
+
+def _write_properties(f: IO[str], props: dict, written: set):
+    for k, v in props.items():
+        if k != 'units' and k not in written:
+            f.write(f'{json.dumps(k)}: {json.dumps(v)}, ')
+            written.add(k)
+
+
+def _convert(
+    f_in: IO[str], f_out: IO[str], validate: bool, max_workers: Optional[int]
+) -> Tuple[int, Optional[List[dict]]]:
+    from .audits import _SCHEMA_CHUNK_SIZE, _validate_components, _validate_properties
+
+    reader = LegacyReader(f_in)
+    comps = reader.components()
+    first = next(comps, None)
+    comps = itertools.chain([first] if first is not None else [], comps)
+
+    with contextlib.ExitStack() as stack:
+        # Units are needed before any component can be converted. If they don't precede the components, e.g. if they
+        # follow them or are absent, spool the components to a temporary file while reading to the end of the input
+        # to find out. The input is thus only read once, and needn't be seekable, e.g. stdin.
+        if first is not None and 'units' not in reader.properties:
+            spool = stack.enter_context(tempfile.TemporaryFile('w+', encoding='utf-8'))
+            for x in comps:
+                spool.write(json.dumps(x) + '\n')
+            spool.seek(0)
+            comps = (json.loads(x) for x in spool)
+
+        header = dict(reader.properties)
+        factors = scale_factors(header.get('units'))
+
+        written = set()
+        f_out.write('{')
+        _write_properties(f_out, header, written)
+        f_out.write('"components": [\n')
+
+        # Converted components are validated in chunks, in parallel over a process pool for large files unless
+        # max_workers == 1, with at most a few chunks per worker in flight at once, as for audit(...).
+        problems = [] if validate else None
+        chunk = []
+        futures = []
+        window = 2 * (max_workers or os.cpu_count() or 1)
+        pool = None
+
+        def flush(offset, final):
+            nonlocal pool
+            if max_workers == 1 or (final and pool is None):
+                problems.extend(_validate_components(offset, chunk))
+                return
+            if pool is None:
+                pool = stack.enter_context(ProcessPoolExecutor(max_workers=max_workers))
+            futures.append(pool.submit(_validate_components, offset, list(chunk)))
+            if len(futures) >= window:
+                problems.extend(futures.pop(0).result())
+
+        n = 0
+        for cid, ctype, data in comps:
+            c = convert_component(cid, ctype, data, factors)
+            if n > 0:
+                f_out.write(',\n')
+            f_out.write(json.dumps(c))
+            n += 1
+            if validate:
+                chunk.append(c)
+                if len(chunk) == _SCHEMA_CHUNK_SIZE:
+                    flush(n - len(chunk), False)
+                    chunk.clear()
+
+        if validate and len(chunk) > 0:
+            flush(n - len(chunk), True)
+        for fut in futures:
+            problems.extend(fut.result())
+
+    # Any properties that followed the components (all have been read by now).
+    f_out.write('\n]')
+    trailing = {k: v for k, v in reader.properties.items() if k != 'units' and k not in written}
+    for k, v in trailing.items():
+        f_out.write(f', {json.dumps(k)}: {json.dumps(v)}')
+    f_out.write('}\n')
+
+    if validate:
+        problems[:0] = _validate_properties({k: v for k, v in reader.properties.items() if k != 'units'})
+
+    return n, problems
+
+
+def convert_from_ejson_0(
+    src: PathLike, dst: PathLike, validate: bool = True, max_workers: Optional[int] = 1
+) -> LegacyConversion:
+    '''
+    Convert an e-JSON 0 file to the current format, streaming, so that neither file is ever held in memory. Either file
+    may be compressed (see open_file(...)).
+
+    Args:
+        src: input path, or '-' for stdin.
+        dst: output path, or '-' for stdout. May be the same as src.
+        validate: If True, validate the output against the e-JSON schema as it is written.
+        max_workers: maximum number of worker processes for validation. 1 validates in this process.
+
+    Returns:
+        LegacyConversion
+    '''
+
+    t_0 = time.perf_counter()
+
+    # Write via a temporary file when converting in place, so that the input isn't clobbered as it is read.
+    out = dst
+    if str(dst) != '-' and str(src) != '-' and os.path.exists(dst) and os.path.samefile(src, dst):
+        fd, out = tempfile.mkstemp(
+            prefix=os.path.basename(dst) + '.', suffix=os.path.splitext(dst)[1], dir=os.path.dirname(dst) or None
+        )
+        os.close(fd)
+
+    f_in = open_file(src, 'r')
+    f_out = open_file(out, 'w')
+    try:
+        n, problems = _convert(f_in, f_out, validate, max_workers)
+    except BaseException:
+        if out != dst:
+            os.remove(out)
+        raise
+    finally:
+        for f in (f_in, f_out):
+            if f not in (sys.stdin, sys.stdout):
+                f.close()
+
+    if out != dst:
+        os.replace(out, dst)
+
+    return LegacyConversion(src, dst, n, problems, time.perf_counter() - t_0)
+
+
+def _convert_pair(pair: Tuple[PathLike, PathLike], validate: bool) -> LegacyConversion:
+    return convert_from_ejson_0(pair[0], pair[1], validate, max_workers=1)
+
+
+def convert_files_from_ejson_0(
+    pairs: Iterable[Tuple[PathLike, PathLike]], validate: bool = True, max_workers: Optional[int] = None
+) -> List[LegacyConversion]:
+    '''
+    Convert many e-JSON 0 files to the current format, in parallel over a process pool.
+
+    Args:
+        pairs: (input path, output path) for each file.
+        validate: as for convert_from_ejson_0(...).
+        max_workers: maximum number of worker processes. Files are converted in parallel, each in a single process. 1
+            converts the files one at a time in this process.
+
+    Returns:
+        LegacyConversion for each file, in order.
+    '''
+
+    pairs = list(pairs)
+    if max_workers == 1 or len(pairs) <= 1:
+        return [_convert_pair(x, validate) for x in pairs]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(_convert_pair, pairs, [validate] * len(pairs)))
@@ -0,0 +1,123 @@
+from typing import Optional, Union
+
+import numpy as np
+
+from .ejson import EJson
+
+
+class LoadScaler:
+    '''
+    Batch scaling of the s_nom of all loads in a network.
+
+    The base s_nom of every load is captured once, as a flat complex array with one entry per load phase, in the order
+    of netw.components('Load'). Scaled loads for a single factor, a time series of factors, or a matrix of per-load
+    factors over time are then computed as array operations, and any single time step can be written back into the
+    network without re-deriving the base loads.
+    '''
+
+    def __init__(self, netw: EJson):
+        '''
+        Constructor.
+
+        Args:
+            netw: e-JSON network. Its current load s_nom values are used as the base loads.
+        '''
+
+        self.netw = netw
+        self.loads = list(netw.components('Load'))
+        self.load_ids = [x['id'] for x in self.loads]
+
+        self.n_phs = np.array([len(x['s_nom']) for x in self.loads], dtype=int)
+        self.offsets = np.concatenate(([0], np.cumsum(self.n_phs)))
+        self.load_idx = np.repeat(np.arange(len(self.loads)), self.n_phs)
+
+        s = np.array([x for load in self.loads for x in load['s_nom']], dtype=float).reshape(-1, 2)
+        self.s_base = s[:, 0] + 1j * s[:, 1]
+
+    @property
+    def n_loads(self) -> int:
+        return len(self.loads)
+
+    def _per_phase(self, x: Union[complex, np.ndarray]) -> np.ndarray:
+        x = np.asarray(x, dtype=complex)
+        if x.ndim == 0:
+            return x
+        elif x.ndim == 1:
+            return x[:, np.newaxis]
+        elif x.ndim == 2:
+            if x.shape[1] != self.n_loads:
+                raise ValueError(f'Expected {self.n_loads} columns (one per load), got {x.shape[1]}')
+            return x[:, self.load_idx]
+        else:
+            raise ValueError(f'Expected a scalar, vector or matrix, got an array with {x.ndim} dimensions')
+
+    def scaled(self, factors: Union[complex, np.ndarray]) -> np.ndarray:
+        '''
+        Scale the base loads.
+
+        Args:
+            factors: Either a single complex factor, a vector of factors (one per time step), or a matrix of per-load
+                factors with shape (n_steps, n_loads).
+
+        Returns:
+            Complex array of per-phase s_nom values, with shape (n_phases,) for a single factor, or
+            (n_steps, n_phases) otherwise.
+        '''
+
+        return self._per_phase(factors) * self.s_base
+
+    def balanced(self, tot_loads: Union[complex, np.ndarray]) -> np.ndarray:
+        '''
+        Set every load to a balanced load, splitting its total equally between its phases.
+
+        Args:
+            tot_loads: Either a single complex total for every load, a vector of totals (one per time step), or a
+                matrix of per-load totals with shape (n_steps, n_loads).
+
+        Returns:
+            Complex array of per-phase s_nom values, shaped as for scaled(...).
+        '''
+
+        return self._per_phase(tot_loads) / self.n_phs[self.load_idx]
+
+    def load_totals(self, s: np.ndarray) -> np.ndarray:
+        '''
+        Total per-phase s_nom values for each load.
+
+        Args:
+            s: Complex array with shape (..., n_phases), e.g. the result of scaled(...).
+
+        Returns:
+            Complex array with shape (..., n_loads)
+        '''
+
+        s = np.asarray(s, dtype=complex)
+        totals = np.zeros(s.shape[:-1] + (self.n_loads,), dtype=complex)
+        np.add.at(totals, (..., self.load_idx), s)
+        return totals
+
+    def write(self, s: np.ndarray, step: Optional[int] = None) -> EJson:
+        '''
+        Write per-phase s_nom values back into the network loads.
+
+        Args:
+            s: Complex array with shape (n_phases,), or (n_steps, n_phases) in which case step must be given.
+            step: Time step (row of s) to write.
+
+        Returns:
+            in-place mutated network
+        '''
+
+        s = np.asarray(s, dtype=complex)
+        if step is not None:
+            s = s[step]
+
+        if s.shape != self.s_base.shape:
+            raise ValueError(f'Expected {len(self.s_base)} per-phase values, got shape {s.shape}')
+
+        re = s.real.tolist()
+        im = s.imag.tolist()
+        for load, i_0, i_1 in zip(self.loads, self.offsets[:-1].tolist(), self.offsets[1:].tolist()):
+            self.netw.update_comp(load['id'], {'s_nom': [[re[i], im[i]] for i in range(i_0, i_1)]})
+
+        return self.netw
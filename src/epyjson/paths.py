@@ -0,0 +1,189 @@
+import heapq
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .ejson import EJson
+from .utils import a2c, is_live
+
+
+def _weights(netw: EJson, comps: List[dict], weight: str) -> np.ndarray:
+    '''
+    The cost of passing through each component. Nodes are free.
+    '''
+
+    if weight == 'hops':
+        return np.array([0.0 if x['type'] == 'Node' else 1.0 for x in comps])
+    elif weight == 'length':
+        return np.array([float(x['length']) if x['type'] == 'Line' else 0.0 for x in comps])
+    elif weight == 'impedance':
+        return np.array([abs(a2c(x['z'])) * x['length'] if x['type'] == 'Line' and 'z' in x else 0.0 for x in comps])
+    else:
+        raise ValueError(f'Unknown weight {weight}')
+
+
+class ShortestPathTree:
+    '''
+    Shortest paths from a single source component to all others.
+
+    Attributes:
+        source: ID of the source component.
+        dist: distance to each row of arrays (inf if unreachable).
+        pred: predecessor row on the shortest path to each row (-1 for the source or if unreachable).
+        arrays: the NetworkArrays snapshot that rows refer to.
+    '''
+
+    def __init__(self, source: str, dist: np.ndarray, pred: np.ndarray, arrays):
+        self.source = source
+        self.dist = dist
+        self.pred = pred
+        self.arrays = arrays
+
+    def distance(self, target: str) -> float:
+        return float(self.dist[self.arrays.rows[target]])
+
+    def distances(self) -> Dict[str, float]:
+        '''
+        Returns:
+            {cid: distance} for all reachable components.
+        '''
+
+        cids = self.arrays.cids
+        return {cids[i]: d for i, d in enumerate(self.dist.tolist()) if d != np.inf}
+
+    def path(self, target: str) -> Optional[List[str]]:
+        '''
+        Returns:
+            IDs of the components on the shortest path from source to target inclusive, or None if target is
+            unreachable.
+        '''
+
+        row = self.arrays.rows[target]
+        if self.dist[row] == np.inf:
+            return None
+
+        rows = []
+        pred = self.pred
+        while row != -1:
+            rows.append(row)
+            row = pred[row]
+
+        cids = self.arrays.cids
+        return [cids[x] for x in reversed(rows)]
+
+
+class PathFinder:
+    '''
+    Shortest path queries between components, weighted by hops, line length or line impedance.
+
+    Paths alternate between nodes and elements, and the cost of a path is the sum of the weights of the elements it
+    passes through, including its end points:
+        'hops': 1 for each element.
+        'length': line length; other elements are free.
+        'impedance': |z| * length for lines; other elements are free. Note that this doesn't refer impedances across
+            transformers.
+    If live_only, elements that aren't live (see is_live(...)) can't be passed through, other than at the start of a
+    path.
+
+    Each query from a new source runs a single Dijkstra pass over the array-backed adjacency (see EJson.adjacency()),
+    and if cache is True, the resulting ShortestPathTree is kept until the network next changes, as measured by
+    EJson.version. Checking the version keeps cache hits cheap, but it only sees changes made through the EJson API:
+    after writing directly into component dicts, e.g. to take a line out of service, call netw.touch(...), or use
+    netw.update_comp(...) instead, otherwise stale paths will be returned.
+    '''
+
+    def __init__(self, netw: EJson, weight: str = 'length', live_only: bool = True, cache: bool = True):
+        self.netw = netw
+        self.weight = weight
+        self.live_only = live_only
+        self.cache = cache
+        self._version = None
+        self._trees = {}
+
+    def _prepare(self):
+        if self._version == self.netw.version:
+            return
+
+        arrays = self.netw.adjacency()
+        self._arrays = arrays
+        self._w = _weights(self.netw, arrays.comps, self.weight).tolist()
+        self._blocked = [self.live_only and x['type'] != 'Node' and not is_live(x) for x in arrays.comps]
+        self._adj = arrays.adj.tolist()
+        self._indptr = arrays.indptr.tolist()
+        self._trees = {}
+        self._version = self.netw.version
+
+    def tree(self, source: str) -> ShortestPathTree:
+        '''
+        Shortest paths from source to all other components, e.g. from an Infeeder.
+        '''
+
+        self._prepare()
+        retval = self._trees.get(source)
+        if retval is not None:
+            return retval
+
+        arrays = self._arrays
+        n = len(arrays)
+        dist = [np.inf] * n
+        pred = [-1] * n
+        done = [False] * n
+        w = self._w
+        blocked = self._blocked
+        adj = self._adj
+        indptr = self._indptr
+
+        src = arrays.rows[source]
+        dist[src] = w[src]
+        heap = [(dist[src], src)]
+        while len(heap) > 0:
+            d, i = heapq.heappop(heap)
+            if done[i]:
+                continue
+            done[i] = True
+
+            for j in adj[indptr[i]:indptr[i + 1]]:
+                if done[j] or blocked[j]:
+                    continue
+
+                d_j = d + w[j]
+                if d_j < dist[j]:
+                    dist[j] = d_j
+                    pred[j] = i
+                    heapq.heappush(heap, (d_j, j))
+
+        retval = ShortestPathTree(source, np.array(dist), np.array(pred, dtype=np.int64), arrays)
+        if self.cache:
+            self._trees[source] = retval
+
+        return retval
+
+    def path(self, source: str, target: str) -> Optional[List[str]]:
+        '''
+        Returns:
+            IDs of the components on the shortest path from source to target inclusive, or None if there is none.
+        '''
+
+        return self.tree(source).path(target)
+
+    def distance(self, source: str, target: str) -> float:
+        return self.tree(source).distance(target)
+
+    def components_between(self, source: str, target: str, select: Callable[[dict], bool]) -> List[str]:
+        '''
+        Find selected components, e.g. fuses or switches, on the shortest path between source and target.
+
+        Args:
+            source: ID of the first component.
+            target: ID of the second component.
+            select: select(comp) -> bool
+
+        Returns:
+            IDs of the selected components on the path, in order from source to target.
+        '''
+
+        path = self.path(source, target)
+        if path is None:
+            return []
+
+        return [x for x in path if select(self.netw.component(x))]
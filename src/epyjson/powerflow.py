@@ -0,0 +1,311 @@
+from collections import namedtuple
+import pathlib
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+from .ejson import EJson
+from .loads import LoadScaler
+from .utils import a2c, c2a, is_live
+from .ybus import _UnionFind, build_ybus
+
+
+PowerFlowResult = namedtuple('PowerFlowResult', ('v', 'converged', 'n_iter'))
+PowerFlowResult.__doc__ = '''
+Result of PowerFlow.solve(...).
+
+Attributes:
+    v: complex voltage of each bus, in the order of PowerFlow.ybus.labels.
+    converged: True iff the solution converged to within the tolerance.
+    n_iter: number of iterations used.
+'''
+
+PowerFlowSeriesResult = namedtuple('PowerFlowSeriesResult', ('v', 'converged', 'n_iter'))
+PowerFlowSeriesResult.__doc__ = '''
+Result of PowerFlow.solve_series(...).
+
+Attributes:
+    v: complex node voltages with shape (n_steps, n_nodes), columns in the order of PowerFlow.node_ids. This is a
+        memory map of the output file if one was given.
+    converged: boolean array with shape (n_steps,).
+    n_iter: number of iterations used for each step.
+'''
+
+
+class PowerFlow:
+    '''
+    Balanced power flow on a single phased network, i.e. a network that has been through make_single_phased(...).
+
+    Infeeders are slack buses, with voltage magnitude v_setpoint and angle zero. Loads are constant power, with
+    their total s_nom drawn from the bus of their node. Lines and transformers are modelled as in
+    build_ybus(netw, mode='sequence').
+
+    The solver is a Z-bus fixed point iteration: for the non-slack buses L,
+
+        v_L = w + Z conj(s_L / v_L),
+
+    where Z = inv(Y_LL) and w = -Z Y_LS v_S is the no-load voltage. For radial networks this is equivalent to a
+    backward / forward sweep, and it converges in a handful of iterations for normal loading. Z is never formed:
+    Y_LL is factored once by the constructor (see SparseLU), and each iteration is a pair of sparse triangular solves.
+    For radial networks the factors have at most one fill in entry per bus above and below the diagonal, so memory and
+    time per iteration are linear in the number of buses.
+
+    Buses that are not connected to any infeeder are unsupplied and get zero voltage.
+    '''
+
+    def __init__(self, netw: EJson):
+        '''
+        Constructor.
+
+        Args:
+            netw: single phased e-JSON network. Its current load s_nom values are used as the default loads.
+        '''
+
+        for node in netw.components('Node'):
+            if len([x for x in node['phs'] if x.upper() not in ('N', 'G')]) != 1:
+                raise ValueError(f'Node {node["id"]} is not single phased: call make_single_phased(...) first')
+
+        self.netw = netw
+        self.ybus = build_ybus(netw, mode='sequence')
+        ybus = self.ybus
+        n_bus = len(ybus)
+
+        self.node_ids = [x['id'] for x in netw.components('Node')]
+        self.node_bus = np.array([ybus.bus(x) for x in self.node_ids], dtype=np.int64)
+
+        arrs = netw.adjacency()
+        term_cons = arrs.terminal_cons()
+
+        def bus_of(cid: str) -> int:
+            return ybus.bus(arrs.cids[arrs.con_node[term_cons[arrs.rows[cid]][0]]])
+
+        # Slack buses.
+        v_slack = {}
+        for inf in netw.components('Infeeder'):
+            if is_live(inf):
+                v_slack.setdefault(bus_of(inf['id']), complex(inf['v_setpoint']))
+
+        # Buses that can't be reached from a slack bus are unsupplied.
+        rows, cols, _ = ybus.matrix.tocoo()
+        uf = _UnionFind(n_bus)
+        for i, j in zip(rows.tolist(), cols.tolist()):
+            uf.union(i, j)
+        supplied_roots = set(uf.find(x) for x in v_slack)
+        is_supplied = np.array([uf.find(x) in supplied_roots for x in range(n_bus)], dtype=bool)
+
+        self.slack = np.array(sorted(v_slack), dtype=np.int64)
+        self.v_slack = np.array([v_slack[x] for x in self.slack.tolist()], dtype=complex)
+        is_pq = is_supplied.copy()
+        is_pq[self.slack] = False
+        self.pq = np.flatnonzero(is_pq)
+
+        # Loads, and the bus each one draws from, or -1 if it is not live.
+        self.scaler = LoadScaler(netw)
+        self.load_bus = np.array(
+            [bus_of(x['id']) if is_live(x) else -1 for x in self.scaler.loads], dtype=np.int64
+        )
+
+        pq_idx = np.full(n_bus, -1, dtype=np.int64)
+        pq_idx[self.pq] = np.arange(len(self.pq))
+        self.load_pq = np.where(self.load_bus >= 0, pq_idx[np.maximum(self.load_bus, 0)], -1)
+
+        self.lu = ybus.matrix.submatrix(self.pq, self.pq).factor()
+        y_ls = ybus.matrix.submatrix(self.pq, self.slack)
+        self.w = -self.lu.solve(y_ls @ self.v_slack) if len(self.slack) > 0 else np.zeros(len(self.pq), dtype=complex)
+
+    def load_s(self) -> np.ndarray:
+        '''
+        Returns:
+            Complex total s_nom of each load, in the order of self.scaler.loads.
+        '''
+
+        return self.scaler.load_totals(self.scaler.s_base)
+
+    def pq_s(self, s_loads: np.ndarray) -> np.ndarray:
+        '''
+        Total complex load on each non-slack bus.
+
+        Args:
+            s_loads: Complex total s_nom of each load, with shape (..., n_loads).
+
+        Returns:
+            Complex array with shape (..., len(self.pq)).
+        '''
+
+        s_loads = np.asarray(s_loads, dtype=complex)
+        keep = self.load_pq >= 0
+        retval = np.zeros(s_loads.shape[:-1] + (len(self.pq),), dtype=complex)
+        np.add.at(retval, (..., self.load_pq[keep]), s_loads[..., keep])
+        return retval
+
+    def solve(
+        self, s_loads: Optional[np.ndarray] = None, v0: Optional[np.ndarray] = None, tol: float = 1e-8,
+        max_iter: int = 100
+    ) -> PowerFlowResult:
+        '''
+        Solve the power flow.
+
+        Args:
+            s_loads: Complex total s_nom of each load. Defaults to the network loads.
+            v0: Initial bus voltages, e.g. the v of a previous result, for a warm start. Defaults to the no-load
+                voltages, which are also used in place of any zero voltages in v0.
+            tol: Convergence tolerance on the largest voltage change in an iteration, relative to the no-load voltage.
+            max_iter: Maximum number of iterations.
+
+        Returns:
+            PowerFlowResult
+        '''
+
+        s = -self.pq_s(self.load_s() if s_loads is None else s_loads)
+        v_l = self.w.copy() if v0 is None else np.asarray(v0, dtype=complex)[self.pq]
+        v_l, converged, n_iter = self._iterate(s[:, np.newaxis], v_l[:, np.newaxis], tol, max_iter)
+
+        v = np.zeros(len(self.ybus), dtype=complex)
+        v[self.slack] = self.v_slack
+        v[self.pq] = v_l[:, 0]
+        return PowerFlowResult(v, bool(converged[0]), int(n_iter[0]))
+
+    def solve_series(
+        self, s_loads: np.ndarray, out: Optional[Union[str, pathlib.Path]] = None, chunk_size: int = 1024,
+        v0: Optional[np.ndarray] = None, tol: float = 1e-8, max_iter: int = 100
+    ) -> PowerFlowSeriesResult:
+        '''
+        Solve the power flow for a time series of loads.
+
+        The time steps are solved in chunks, and all steps in a chunk are iterated together, as right hand sides of the
+        same triangular solves. Each chunk is warm started from the last solution of the previous chunk. Only one chunk
+        of loads and voltages is held in memory at a time when s_loads is memory mapped (e.g. from
+        np.load(..., mmap_mode='r')) and out is given.
+
+        Args:
+            s_loads: Complex total s_nom of each load over time, with shape (n_steps, n_loads), e.g. from
+                LoadScaler.load_totals(LoadScaler.scaled(...)).
+            out: If given, node voltages are streamed to a .npy file at this path, one chunk at a time.
+            chunk_size: Number of time steps to solve together.
+            v0: Initial bus voltages for the first chunk. Defaults to the no-load voltages.
+            tol: Convergence tolerance, see solve(...).
+            max_iter: Maximum number of iterations per time step.
+
+        Returns:
+            PowerFlowSeriesResult
+        '''
+
+        n_steps = len(s_loads)
+        n_nodes = len(self.node_ids)
+        if out is not None:
+            v_nd = np.lib.format.open_memmap(out, mode='w+', dtype=complex, shape=(n_steps, n_nodes))
+        else:
+            v_nd = np.zeros((n_steps, n_nodes), dtype=complex)
+        converged = np.zeros(n_steps, dtype=bool)
+        n_iter = np.zeros(n_steps, dtype=np.int64)
+
+        v_start = self.w.copy() if v0 is None else np.asarray(v0, dtype=complex)[self.pq]
+        for i_0 in range(0, n_steps, chunk_size):
+            i_1 = min(i_0 + chunk_size, n_steps)
+            s = -self.pq_s(np.asarray(s_loads[i_0:i_1], dtype=complex)).T
+            v_l = np.repeat(v_start[:, np.newaxis], i_1 - i_0, axis=1)
+            v_l, converged[i_0:i_1], n_iter[i_0:i_1] = self._iterate(s, v_l, tol, max_iter)
+
+            v_bus = np.zeros((len(self.ybus), i_1 - i_0), dtype=complex)
+            v_bus[self.slack] = self.v_slack[:, np.newaxis]
+            v_bus[self.pq] = v_l
+            v_nd[i_0:i_1] = v_bus[self.node_bus].T
+            v_start = v_l[:, -1]
+
+        if out is not None:
+            v_nd.flush()
+
+        return PowerFlowSeriesResult(v_nd, converged, n_iter)
+
+    def _iterate(self, s: np.ndarray, v_l: np.ndarray, tol: float, max_iter: int) -> Tuple[np.ndarray, ...]:
+        '''
+        Z-bus iterations for the columns of s and v_l, each with shape (len(self.pq), n_cols). Converged columns drop
+        out of the iteration.
+        '''
+
+        v_l = np.where(v_l == 0.0, self.w[:, np.newaxis], v_l)  # E.g. warm starting from previously unsupplied buses.
+        v_ref = np.abs(self.w)[:, np.newaxis]
+        n_cols = s.shape[1]
+        converged = np.full(n_cols, len(self.pq) == 0)
+        n_iter = np.zeros(n_cols, dtype=np.int64)
+
+        active = np.flatnonzero(~converged)
+        for _ in range(max_iter):
+            if len(active) == 0:
+                break
+
+            v_a = v_l[:, active]
+            v_new = self.w[:, np.newaxis] + self.lu.solve(np.conj(s[:, active] / v_a))
+            done = np.all(np.abs(v_new - v_a) <= tol * v_ref, axis=0)
+            v_l[:, active] = v_new
+            n_iter[active] += 1
+            converged[active[done]] = True
+            active = active[~done]
+
+        return v_l, converged, n_iter
+
+    def write(self, v: np.ndarray) -> EJson:
+        '''
+        Write bus voltages into the v of each network node.
+
+        Args:
+            v: Complex bus voltages, e.g. the v of a PowerFlowResult.
+
+        Returns:
+            in-place mutated network
+        '''
+
+        v_nd = np.asarray(v, dtype=complex)[self.node_bus].tolist()
+        for nd_id, x in zip(self.node_ids, v_nd):
+            self.netw.update_comp(nd_id, {'v': [c2a(x)]})
+
+        return self.netw
+
+    def node_v(self, netw: Optional[EJson] = None) -> np.ndarray:
+        '''
+        Bus voltages taken from the v of each network node, e.g. for a warm start from a previously solved network.
+
+        Args:
+            netw: network to take voltages from. Defaults to self.netw.
+
+        Returns:
+            Complex bus voltages. Buses with no node voltages get their no-load voltage.
+        '''
+
+        netw = self.netw if netw is None else netw
+        v = np.zeros(len(self.ybus), dtype=complex)
+        v[self.pq] = self.w
+        v[self.slack] = self.v_slack
+        for nd_id, b in zip(self.node_ids, self.node_bus.tolist()):
+            v_nd = netw.component(nd_id).get('v')
+            if v_nd is not None and len(v_nd) > 0:
+                v[b] = a2c(v_nd[0])
+
+        return v
+
+
+def run_power_flow(
+    netw: EJson, warm_start: bool = False, tol: float = 1e-8, max_iter: int = 100
+) -> EJson:
+    '''
+    Solve a balanced power flow on a single phased network, and write the resulting voltages into the node v fields.
+
+    See PowerFlow for the model. To solve the same network many times, e.g. for different loads, use PowerFlow directly
+    so that the network matrices are only computed once.
+
+    Args:
+        netw: single phased e-JSON network
+        warm_start: If True, start from the existing node v values, where present.
+        tol: Convergence tolerance, see PowerFlow.solve(...).
+        max_iter: Maximum number of iterations.
+
+    Returns:
+        in-place mutated network
+    '''
+
+    pf = PowerFlow(netw)
+    res = pf.solve(v0=pf.node_v() if warm_start else None, tol=tol, max_iter=max_iter)
+    if not res.converged:
+        raise RuntimeError(f'Power flow did not converge after {res.n_iter} iterations')
+
+    return pf.write(res.v)
@@ -0,0 +1,225 @@
+import math
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from .ejson import EJson
+
+
+BBox = Tuple[float, float, float, float]  # (x_min, y_min, x_max, y_max)
+
+
+class SpatialIndex:
+    '''
+    Uniform grid index over the coordinates of the nodes in a network, for bounding box, nearest neighbour and region
+    queries.
+
+    Points are bucketed into square grid cells, and held in flat arrays sorted by cell, so that a query only looks at
+    the points in the cells it overlaps. Nodes are tracked by handle, so renaming doesn't affect the index.
+
+    The index listens to the network: nodes that are added, removed or have their coordinates updated (through
+    update_comp(...) or touch(...)) go into a small overlay, which is merged into the grid once it grows large. Call
+    close() to stop listening.
+
+    Coordinates are treated as planar, including lat_long; distances are Euclidean in the coordinate units.
+    '''
+
+    def __init__(self, netw: EJson, key: str = 'xy', points_per_cell: float = 4.0):
+        '''
+        Constructor.
+
+        Args:
+            netw: e-JSON network
+            key: Node field holding the coordinates, e.g. 'xy' or 'lat_long'. Nodes without it aren't indexed.
+            points_per_cell: Average number of points per grid cell.
+        '''
+
+        self.netw = netw
+        self.key = key
+        self.points_per_cell = points_per_cell
+        self._pending = {}  # {handle: (x, y)}, for nodes added or moved since the grid was built.
+        self._build()
+        netw.add_listener(self._on_change)
+
+    def close(self):
+        self.netw.remove_listener(self._on_change)
+
+    def __len__(self):
+        return int(np.count_nonzero(self._alive)) + len(self._pending)
+
+    def _build(self):
+        netw = self.netw
+        handles = []
+        pts = []
+        for c in netw.components('Node'):
+            p = c.get(self.key)
+            if p is not None:
+                handles.append(netw.handle_of(c['id']))
+                pts.append(p[:2])
+        self._pending = {}
+
+        handles = np.array(handles, dtype=np.int64)
+        pts = np.array(pts, dtype=float).reshape(-1, 2)
+
+        if len(pts) > 0:
+            self._lo = pts.min(axis=0)
+            extent = pts.max(axis=0) - self._lo
+        else:
+            self._lo = np.zeros(2)
+            extent = np.zeros(2)
+
+        area = extent[0] * extent[1]
+        if area > 0.0:
+            cell = math.sqrt(area * self.points_per_cell / len(pts))
+        else:
+            cell = max(extent.max() * self.points_per_cell / max(len(pts), 1), 1.0)
+        self._cell = cell
+        self._shape = (np.floor(extent / cell).astype(np.int64) + 1)  # (n_x, n_y)
+
+        cell_ids = self._cell_ids(pts)
+        order = np.argsort(cell_ids, kind='stable')
+        self._pts = pts[order]
+        self._handles = handles[order]
+        n_cells = int(self._shape[0] * self._shape[1])
+        self._indptr = np.concatenate(([0], np.cumsum(np.bincount(cell_ids, minlength=n_cells)))).astype(np.int64)
+        self._alive = np.ones(len(pts), dtype=bool)
+        self._pos = {h: i for i, h in enumerate(self._handles.tolist())}
+
+    def _cell_ij(self, pts: np.ndarray) -> np.ndarray:
+        ij = np.floor((pts - self._lo) / self._cell).astype(np.int64)
+        return np.clip(ij, 0, self._shape - 1)
+
+    def _cell_ids(self, pts: np.ndarray) -> np.ndarray:
+        ij = self._cell_ij(pts)
+        return ij[:, 1] * self._shape[0] + ij[:, 0]
+
+    def _on_change(self, netw: EJson, event: str, cids: List[str]):
+        for cid in cids:
+            comp = netw.component(cid)
+            if comp['type'] != 'Node':
+                continue
+
+            h = netw.handle_of(cid)
+            i = self._pos.get(h)
+            p = comp.get(self.key) if event != 'remove' else None
+            self._pending.pop(h, None)
+            if i is not None:
+                self._alive[i] = p is not None and self._pts[i, 0] == p[0] and self._pts[i, 1] == p[1]
+                if self._alive[i]:
+                    continue  # Not moved.
+
+            if p is not None:
+                self._pending[h] = (float(p[0]), float(p[1]))
+
+        if len(self._pending) > 1024 + len(self._pts) // 8:
+            self._build()
+
+    def _cells_in(self, ij_lo: np.ndarray, ij_hi: np.ndarray) -> np.ndarray:
+        '''
+        Indices of the grid points in the cells from ij_lo to ij_hi inclusive.
+        '''
+
+        rows = np.arange(ij_lo[1], ij_hi[1] + 1)
+        starts = self._indptr[rows * self._shape[0] + ij_lo[0]]
+        ends = self._indptr[rows * self._shape[0] + ij_hi[0] + 1]
+        counts = ends - starts
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+        idx = offsets + np.arange(int(counts.sum()))
+        return idx[self._alive[idx]]
+
+    def _query_bbox(self, bbox: BBox) -> np.ndarray:
+        x_min, y_min, x_max, y_max = bbox
+        retval = []
+        if len(self._pts) > 0:
+            ij = self._cell_ij(np.array([[x_min, y_min], [x_max, y_max]], dtype=float))
+            idx = self._cells_in(ij[0], ij[1])
+            p = self._pts[idx]
+            inside = (p[:, 0] >= x_min) & (p[:, 0] <= x_max) & (p[:, 1] >= y_min) & (p[:, 1] <= y_max)
+            retval.append(self._handles[idx[inside]])
+
+        retval.append(np.array(
+            [h for h, (x, y) in self._pending.items() if x_min <= x <= x_max and y_min <= y <= y_max], dtype=np.int64
+        ))
+        return np.concatenate(retval)
+
+    def nodes_in_bbox(self, bbox: BBox) -> List[str]:
+        '''
+        Args:
+            bbox: (x_min, y_min, x_max, y_max), inclusive.
+
+        Returns:
+            IDs of the nodes within bbox.
+        '''
+
+        cid_of = self.netw.cid_of
+        return [cid_of(h) for h in self._query_bbox(bbox).tolist()]
+
+    def elements_in_bbox(self, bbox: BBox, require_all: bool = False) -> List[str]:
+        '''
+        Args:
+            bbox: (x_min, y_min, x_max, y_max), inclusive.
+            require_all: If True, only include elements whose connected nodes are all in bbox. Otherwise, include
+                elements with any connected node in bbox.
+
+        Returns:
+            IDs of the elements connected to nodes within bbox.
+        '''
+
+        graph = self.netw.graph
+        node_hs = set(self._query_bbox(bbox).tolist())
+        elem_hs = dict.fromkeys(x for h in node_hs for x in graph.neighbors(h))
+        if require_all:
+            elem_hs = [h for h in elem_hs if all(x in node_hs for x in graph.neighbors(h))]
+
+        cid_of = self.netw.cid_of
+        return [cid_of(h) for h in elem_hs]
+
+    def nearest(self, point: Sequence[float], k: int = 1) -> List[Tuple[str, float]]:
+        '''
+        Find the k nearest nodes to a point.
+
+        Args:
+            point: (x, y)
+            k: number of nodes to find.
+
+        Returns:
+            [(node ID, distance), ...], nearest first.
+        '''
+
+        q = np.asarray(point, dtype=float)[:2]
+        cand_h = [np.array(list(self._pending.keys()), dtype=np.int64)]
+        cand_p = [np.array(list(self._pending.values()), dtype=float).reshape(-1, 2)]
+
+        if len(self._pts) > 0:
+            c = self._cell_ij(q[np.newaxis, :])[0]
+            r = 0
+            while True:
+                ij_lo = np.maximum(c - r, 0)
+                ij_hi = np.minimum(c + r, self._shape - 1)
+                idx = self._cells_in(ij_lo, ij_hi)
+                d = np.sort(np.hypot(*(self._pts[idx] - q).T))
+
+                # Any point not yet searched is beyond one of the sides of the searched rectangle that isn't at the
+                # edge of the grid.
+                rect_lo = self._lo + ij_lo * self._cell
+                rect_hi = self._lo + (ij_hi + 1) * self._cell
+                bound = np.inf
+                for dim in range(2):
+                    if ij_lo[dim] > 0:
+                        bound = min(bound, max(q[dim] - rect_lo[dim], 0.0))
+                    if ij_hi[dim] < self._shape[dim] - 1:
+                        bound = min(bound, max(rect_hi[dim] - q[dim], 0.0))
+
+                if bound == np.inf or (len(d) >= k and d[k - 1] <= bound):
+                    break
+                r = max(2 * r, 1)
+
+            cand_h.append(self._handles[idx])
+            cand_p.append(self._pts[idx])
+
+        cand_h = np.concatenate(cand_h)
+        dist = np.hypot(*(np.concatenate(cand_p) - q).T)
+        order = np.argsort(dist, kind='stable')[:k]
+
+        cid_of = self.netw.cid_of
+        return [(cid_of(h), d) for h, d in zip(cand_h[order].tolist(), dist[order].tolist())]
@@ -0,0 +1,214 @@
+import bz2
+import gzip
+import json
+import lzma
+import os
+import sys
+from typing import IO, Iterator, Union
+
+from .dumper import dump_pretty
+from .ejson import EJson, order_component_keys
+
+
+PathLike = Union[str, os.PathLike]
+
+_OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+
+def open_file(path: PathLike, mode: str = 'r') -> IO[str]:
+    '''
+    Open a text file for reading or writing, compressed according to its suffix: .gz, .bz2 or .xz, or uncompressed
+    otherwise. '-' means stdin or stdout.
+
+    Args:
+        path: file path
+        mode: 'r' or 'w'
+
+    Returns:
+        text file object
+    '''
+
+    if str(path) == '-':
+        return sys.stdin if mode == 'r' else sys.stdout
+
+    opener = _OPENERS.get(os.path.splitext(str(path))[1])
+    if opener is None:
+        return open(path, mode, encoding='utf-8')
+
+    return opener(path, mode + 't', encoding='utf-8')
+
+
+class _Reader:
+    '''
+    Incremental JSON tokenizer over a text file, reading it in chunks and decoding one value at a time with
+    json.JSONDecoder.raw_decode.
+    '''
+
+    _WS = ' \t\n\r'
+
+    def __init__(self, f: IO[str], chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        chunk = self.f.read(self.chunk_size)
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        if len(chunk) == 0:
+            self.eof = True
+        return len(chunk) > 0
+
+    def peek(self) -> str:
+        '''
+        Skip whitespace and return the next character, or '' at the end of the file.
+        '''
+
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in self._WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars: str) -> str:
+        c = self.peek()
+        if c == '' or c not in chars:
+            raise ValueError(f'Invalid e-JSON: expected one of {chars!r}, found {c or "end of file"!r}')
+        self.pos += 1
+        return c
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+
+            # A number or literal might continue into the next chunk.
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+
+            self.pos = end
+            return obj
+
+
+class StreamingReader:
+    '''
+    Read an e-JSON file incrementally, so that its text and its components list never need to be held in memory.
+
+    components() yields the components one at a time. Top level properties are collected into self.properties as they
+    are read, so are only complete once components() has been exhausted (or immediately, if they precede the components
+    in the file, as is usual).
+    '''
+
+    def __init__(self, f: IO[str], chunk_size: int = 1 << 16):
+        self._reader = _Reader(f, chunk_size)
+        self.properties = {}
+        self._started = False
+
+    def components(self) -> Iterator[dict]:
+        if self._started:
+            raise ValueError('components() can only be iterated once')
+        self._started = True
+
+        r = self._reader
+        r.expect('{')
+        if r.peek() == '}':
+            r.pos += 1
+            return
+
+        while True:
+            key = r.value()
+            if not isinstance(key, str):
+                raise ValueError('Invalid e-JSON: expected a property name')
+            r.expect(':')
+            if key == 'components':
+                r.expect('[')
+                if r.peek() == ']':
+                    r.pos += 1
+                else:
+                    while True:
+                        yield r.value()
+                        if r.expect(',]') == ']':
+                            break
+            else:
+                self.properties[key] = r.value()
+
+            if r.expect(',}') == '}':
+                break
+
+
+def read_ejson(path: PathLike, stream: bool = True) -> EJson:
+    '''
+    Read an e-JSON network from a file, which may be compressed (see open_file(...)).
+
+    Args:
+        path: file path, or '-' for stdin.
+        stream: If True, parse the file incrementally using StreamingReader, otherwise load it whole.
+
+    Returns:
+        e-JSON network
+    '''
+
+    f = open_file(path, 'r')
+    try:
+        if not stream:
+            return EJson(json.load(f))
+
+        reader = StreamingReader(f)
+        netw = EJson({'components': reader.components()})
+        netw.properties = reader.properties
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+    return netw
+
+
+def iter_raw_components(netw: EJson) -> Iterator[dict]:
+    '''
+    The components of netw as they appear in raw_ejson, without copying the whole network. Node dicts are the
+    network's own, so must not be modified.
+    '''
+
+    for c in netw.components():
+        if c['type'] != 'Node':
+            c = order_component_keys(c | {'cons': [{'node': x.cid_1} | x.con for x in netw.connections_from(c['id'])]})
+        yield c
+
+
+def write_ejson(netw: EJson, path: PathLike, stream: bool = True):
+    '''
+    Write an e-JSON network to a file, which may be compressed (see open_file(...)).
+
+    Args:
+        netw: e-JSON network
+        path: file path, or '-' for stdout.
+        stream: If True, write the components one at a time, one per line, without building raw_ejson. Otherwise,
+            write raw_ejson in the same pretty format as EJson.write_to_file(...).
+    '''
+
+    f = open_file(path, 'w')
+    try:
+        if not stream:
+            dump_pretty(netw.raw_ejson, f)
+            return
+
+        props = json.dumps(netw.properties)
+        f.write(props[:-1] + (', ' if len(netw.properties) > 0 else '') + '"components": [\n')
+        for i, c in enumerate(iter_raw_components(netw)):
+            if i > 0:
+                f.write(',\n')
+            f.write(json.dumps(c))
+        f.write('\n]}\n')
+    finally:
+        if f is not sys.stdout:
+            f.close()
@@ -0,0 +1,182 @@
+from collections import deque
+from typing import List, Tuple
+
+from .ejson import EJson
+from .utils import is_live
+
+
+class SupplyTracker:
+    '''
+    Incrementally maintained supply state of a network: a component is supplied if it is live and connected to a live
+    infeeder through live components, as for remove_unsupplied(...).
+
+    The tracker keeps a spanning forest of the supplied components, rooted at the infeeders. When a component goes
+    live, only the region it newly supplies is searched. When a supplied component stops being live, only its subtree
+    in the forest can lose supply: that subtree is detached, and then re-attached wherever it still has a supplied
+    neighbour. Either way, the cost is proportional to the affected region, not to the network.
+
+    The tracker listens to the network, so changes to in_service or switch_state made through update_comp(...) or
+    touch(...) are picked up immediately. Topology changes cause a full rebuild on the next query. Call close() to
+    stop listening.
+    '''
+
+    def __init__(self, netw: EJson):
+        self.netw = netw
+        self.last_gained = []
+        self.last_lost = []
+        self._stale = True
+        self._build()
+        netw.add_listener(self._on_change)
+
+    def close(self):
+        self.netw.remove_listener(self._on_change)
+
+    def _build(self):
+        netw = self.netw
+        arrays = netw.adjacency()
+        self._arrays = arrays
+        self._adj = arrays.adj.tolist()
+        self._indptr = arrays.indptr.tolist()
+        n = len(arrays)
+        self._live = [is_live(x) for x in arrays.comps]
+        self._supplied = [False] * n
+        self._parent = [-1] * n
+        self._children = [set() for _ in range(n)]
+        self._is_infeeder = (arrays.ctype == 'Infeeder').tolist()
+        self._topo_version = netw.version[0]
+        self._stale = False
+
+        self._grow([(i, -1) for i in range(n) if self._is_infeeder[i] and self._live[i]])
+
+    def _check(self):
+        if self._stale or self.netw.version[0] != self._topo_version:
+            self._build()
+
+    def _on_change(self, netw: EJson, event: str, cids: List[str]):
+        if event != 'update' or self._stale or netw.version[0] != self._topo_version:
+            self._stale = True
+            return
+
+        gained = []
+        lost = []
+        for cid in cids:
+            g, lo = self._set_live(self._arrays.rows[cid], is_live(netw.component(cid)))
+            gained.extend(g)
+            lost.extend(lo)
+
+        self.last_gained = gained
+        self.last_lost = lost
+
+    def _grow(self, seeds: List[Tuple[int, int]]) -> List[int]:
+        '''
+        Breadth first search from seeds [(row, parent row), ...] into live, unsupplied components.
+
+        Returns:
+            Rows that became supplied.
+        '''
+
+        adj = self._adj
+        indptr = self._indptr
+        live = self._live
+        supplied = self._supplied
+        parent = self._parent
+        children = self._children
+
+        gained = []
+        queue = deque()
+        for r, p in seeds:
+            if supplied[r] or not live[r]:
+                continue
+            supplied[r] = True
+            parent[r] = p
+            if p != -1:
+                children[p].add(r)
+            gained.append(r)
+            queue.append(r)
+
+        while len(queue) > 0:
+            i = queue.popleft()
+            for j in adj[indptr[i]:indptr[i + 1]]:
+                if live[j] and not supplied[j]:
+                    supplied[j] = True
+                    parent[j] = i
+                    children[i].add(j)
+                    gained.append(j)
+                    queue.append(j)
+
+        return gained
+
+    def _set_live(self, r: int, live: bool) -> Tuple[List[str], List[str]]:
+        if live == self._live[r]:
+            return [], []
+
+        self._live[r] = live
+        adj = self._adj
+        indptr = self._indptr
+        supplied = self._supplied
+        cids = self._arrays.cids
+
+        if live:
+            if self._is_infeeder[r]:
+                seeds = [(r, -1)]
+            else:
+                seeds = [(r, j) for j in adj[indptr[r]:indptr[r + 1]] if supplied[j]][:1]
+            return [cids[x] for x in self._grow(seeds)], []
+
+        if not supplied[r]:
+            return [], []
+
+        # Detach the subtree of r.
+        parent = self._parent
+        children = self._children
+        if parent[r] != -1:
+            children[parent[r]].discard(r)
+
+        subtree = [r]
+        k = 0
+        while k < len(subtree):
+            subtree.extend(children[subtree[k]])
+            k += 1
+
+        for x in subtree:
+            supplied[x] = False
+            parent[x] = -1
+            children[x] = set()
+
+        # Re-attach wherever the subtree is still supplied from outside, or contains a live infeeder.
+        seeds = []
+        for x in subtree[1:]:
+            if self._is_infeeder[x]:
+                seeds.append((x, -1))
+            else:
+                for j in adj[indptr[x]:indptr[x + 1]]:
+                    if supplied[j]:
+                        seeds.append((x, j))
+                        break
+
+        regained = set(self._grow(seeds))
+        return [], [cids[x] for x in subtree if x not in regained]
+
+    def is_supplied(self, cid: str) -> bool:
+        self._check()
+        return self._supplied[self._arrays.rows[cid]]
+
+    def supplied_cids(self) -> List[str]:
+        self._check()
+        cids = self._arrays.cids
+        return [cids[i] for i, x in enumerate(self._supplied) if x]
+
+    def update(self, cid: str, fields: dict) -> Tuple[List[str], List[str]]:
+        '''
+        Write fields, e.g. {'switch_state': 'open'} or {'in_service': False}, into component cid and update the supply
+        state.
+
+        Returns:
+            (gained, lost): IDs of the components that gained and lost supply.
+        '''
+
+        self._check()
+        self.last_gained = []
+        self.last_lost = []
+        self.netw.update_comp(cid, fields)
+        return self.last_gained, self.last_lost
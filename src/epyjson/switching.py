@@ -0,0 +1,162 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .ejson import EJson
+from .utils import is_closed, is_in_service
+
+
+class SwitchingResult:
+    '''
+    Supply state of a network under one switching configuration.
+
+    Attributes:
+        supplied: boolean array over the rows of the model, True for components that are live and connected to a live
+            infeeder through live components, i.e. those that clone() + remove_unsupplied(...) would keep.
+    '''
+
+    def __init__(self, model: 'SwitchingModel', supplied: np.ndarray):
+        self.model = model
+        self.supplied = supplied
+
+    def supplied_cids(self, ctype: Optional[str] = None) -> List[str]:
+        return self.model._cids_where(self.supplied, ctype)
+
+    def unsupplied_cids(self, ctype: Optional[str] = None) -> List[str]:
+        return self.model._cids_where(~self.supplied, ctype)
+
+    def n_unsupplied(self, ctype: Optional[str] = None) -> int:
+        mask = ~self.supplied if ctype is None else ~self.supplied & (self.model.ctype == ctype)
+        return int(np.count_nonzero(mask))
+
+
+class SwitchingModel:
+    '''
+    What-if evaluation of switching configurations over a fixed network structure.
+
+    A configuration is a lightweight overlay of in_service and switch_state values, {cid: {field: value}}, over the
+    base network. Supply is found by a vectorised breadth first search over the array-backed adjacency, using the
+    base liveness with the overlay applied, so the network is never copied or modified.
+
+    The model holds only arrays (no EJson), so it is cheap to share between threads, and is sent to each process of a
+    process pool only once. It is a snapshot of the network when it was constructed.
+    '''
+
+    def __init__(self, netw: EJson):
+        arrays = netw.adjacency()
+        self.cids = list(arrays.cids)
+        self.rows = dict(arrays.rows)
+        self.ctype = arrays.ctype.copy()
+        self.adj = arrays.adj.copy()
+        self.indptr = arrays.indptr.copy()
+        self.degree = arrays.degree.copy()
+        self.in_service = np.array([is_in_service(x) for x in arrays.comps], dtype=bool)
+        self.closed = np.array([is_closed(x) for x in arrays.comps], dtype=bool)
+        self.infeeders = np.flatnonzero(self.ctype == 'Infeeder')
+
+    def __len__(self):
+        return len(self.cids)
+
+    def _cids_where(self, mask: np.ndarray, ctype: Optional[str]) -> List[str]:
+        if ctype is not None:
+            mask = mask & (self.ctype == ctype)
+        return [self.cids[x] for x in np.flatnonzero(mask).tolist()]
+
+    def live(self, changes: Optional[Dict[str, dict]] = None) -> np.ndarray:
+        '''
+        Liveness of each row, with the overlay applied.
+
+        Args:
+            changes: {cid: {'in_service': bool, 'switch_state': str}}, either field optional.
+
+        Returns:
+            boolean array
+        '''
+
+        in_service = self.in_service
+        closed = self.closed
+        if changes:
+            in_service = in_service.copy()
+            closed = closed.copy()
+            for cid, fields in changes.items():
+                r = self.rows[cid]
+                if 'in_service' in fields:
+                    in_service[r] = fields['in_service']
+                if 'switch_state' in fields:
+                    closed[r] = fields['switch_state'] != 'open'
+
+        return in_service & closed
+
+    def supplied(self, changes: Optional[Dict[str, dict]] = None) -> np.ndarray:
+        '''
+        Returns:
+            The supplied array of evaluate(changes).
+        '''
+
+        live = self.live(changes)
+        visited = np.zeros(len(self.cids), dtype=bool)
+        frontier = self.infeeders[live[self.infeeders]]
+        visited[frontier] = True
+        while len(frontier) > 0:
+            counts = self.degree[frontier]
+            starts = np.repeat(self.indptr[frontier] - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+            nbrs = self.adj[starts + np.arange(int(counts.sum()))]
+            nbrs = np.unique(nbrs[live[nbrs] & ~visited[nbrs]])
+            visited[nbrs] = True
+            frontier = nbrs
+
+        return visited
+
+    def evaluate(self, changes: Optional[Dict[str, dict]] = None) -> SwitchingResult:
+        '''
+        Evaluate a single switching configuration.
+
+        Args:
+            changes: {cid: {'in_service': bool, 'switch_state': str}}, either field optional.
+
+        Returns:
+            SwitchingResult
+        '''
+
+        return SwitchingResult(self, self.supplied(changes))
+
+    def evaluate_many(
+        self, configs: Iterable[Optional[Dict[str, dict]]], max_workers: Optional[int] = None,
+        executor: str = 'thread'
+    ) -> List[SwitchingResult]:
+        '''
+        Evaluate many switching configurations in parallel.
+
+        Args:
+            configs: switching configurations, as for evaluate(...).
+            max_workers: maximum number of workers, as for concurrent.futures.
+            executor: 'thread' or 'process'.
+
+        Returns:
+            [SwitchingResult, ...], in the order of configs.
+        '''
+
+        configs = list(configs)
+        if executor == 'thread':
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                supplied = list(pool.map(self.supplied, configs))
+        elif executor == 'process':
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(self,)) as pool:
+                supplied = list(pool.map(_worker_supplied, configs, chunksize=max(1, len(configs) // 64)))
+        else:
+            raise ValueError(f'Unknown executor {executor}')
+
+        return [SwitchingResult(self, x) for x in supplied]
+
+
+_worker_model = None
+
+
+def _init_worker(model: SwitchingModel):
+    global _worker_model
+    _worker_model = model
+
+
+def _worker_supplied(changes: Optional[Dict[str, dict]]) -> np.ndarray:
+    return _worker_model.supplied(changes)
@@ -0,0 +1,185 @@
+from typing import List, Optional
+
+import numpy as np
+
+from .ejson import EJson
+from .utils import is_live
+
+
+class RadialTree:
+    '''
+    Tree index over a radial network, rooted at a chosen component such as an Infeeder.
+
+    All arrays are indexed by the rows of the NetworkArrays snapshot (see EJson.adjacency()):
+        parent: parent row, or -1 for the root and for unreachable components.
+        depth: number of steps from the root, or -1 if unreachable.
+        tin: position in the preorder (Euler tour entry index), or -1 if unreachable.
+        size: number of components in the subtree, including the component itself.
+        order: reachable rows, in preorder. The subtree of row r is order[tin[r]:tin[r] + size[r]].
+
+    "Is x downstream of y" is O(1), the subtree of a component is an array slice, and the lowest common ancestor is
+    O(log n), using binary lifting.
+
+    The index is a snapshot: queries raise ValueError once the network topology has changed (or, if live_only, once
+    any component has changed), and a new RadialTree must be built.
+    '''
+
+    def __init__(self, netw: EJson, root: str, live_only: bool = False):
+        '''
+        Constructor.
+
+        Args:
+            netw: e-JSON network, which must be radial, e.g. the result of make_radial(...).
+            root: ID of the root component.
+            live_only: If True, elements that aren't live are not entered, so are treated as unreachable.
+        '''
+
+        self.netw = netw
+        self.root = root
+        self.live_only = live_only
+        self._version = netw.version
+
+        arrays = netw.adjacency()
+        self.arrays = arrays
+        n = len(arrays)
+        adj = arrays.adj.tolist()
+        indptr = arrays.indptr.tolist()
+        blocked = [live_only and x['type'] != 'Node' and not is_live(x) for x in arrays.comps]
+
+        parent = [-1] * n
+        depth = [-1] * n
+        order = []
+        r = arrays.rows[root]
+        depth[r] = 0
+        stack = [r]
+        while len(stack) > 0:
+            i = stack.pop()
+            order.append(i)
+            for j in reversed(adj[indptr[i]:indptr[i + 1]]):
+                if j == parent[i] or blocked[j]:
+                    continue
+                if depth[j] != -1:
+                    raise ValueError(
+                        f'Network is not radial: {arrays.cids[j]} is reachable by more than one path from {root}'
+                    )
+                parent[j] = i
+                depth[j] = depth[i] + 1
+                stack.append(j)
+
+        self.parent = np.array(parent, dtype=np.int64)
+        self.depth = np.array(depth, dtype=np.int64)
+        self.order = np.array(order, dtype=np.int64)
+        self.tin = np.full(n, -1, dtype=np.int64)
+        self.tin[self.order] = np.arange(len(order))
+
+        # Subtree sizes, accumulated from the deepest components upwards.
+        size = np.zeros(n, dtype=np.int64)
+        size[self.order] = 1
+        for i in reversed(order[1:]):
+            size[parent[i]] += size[i]
+        self.size = size
+
+        # Binary lifting: up[k][r] is the 2^k-th ancestor of r (the root is its own ancestor).
+        up_0 = np.where(self.parent >= 0, self.parent, np.arange(n))
+        self._up = [up_0]
+        for _ in range(max(int(self.depth.max(initial=0)).bit_length() - 1, 0)):
+            self._up.append(self._up[-1][self._up[-1]])
+
+    def _row(self, cid: str) -> int:
+        if self.netw.version[0] != self._version[0] or (self.live_only and self.netw.version != self._version):
+            raise ValueError('The network has changed since this RadialTree was built')
+
+        row = self.arrays.rows[cid]
+        if self.tin[row] == -1:
+            raise ValueError(f'{cid} is not reachable from {self.root}')
+
+        return row
+
+    def is_downstream(self, cid: str, of: str) -> bool:
+        '''
+        Return True iff cid is in the subtree of of (including of itself).
+        '''
+
+        r = self._row(cid)
+        s = self._row(of)
+        return bool(self.tin[s] <= self.tin[r] < self.tin[s] + self.size[s])
+
+    def downstream(self, cid: str) -> List[str]:
+        '''
+        IDs of the components in the subtree of cid, including cid itself, in preorder.
+        '''
+
+        r = self._row(cid)
+        cids = self.arrays.cids
+        return [cids[x] for x in self.order[self.tin[r]:self.tin[r] + self.size[r]].tolist()]
+
+    def upstream(self, cid: str) -> List[str]:
+        '''
+        IDs of the components on the path from cid up to the root, inclusive.
+        '''
+
+        r = self._row(cid)
+        retval = []
+        parent = self.parent
+        while r != -1:
+            retval.append(self.arrays.cids[r])
+            r = parent[r]
+
+        return retval
+
+    def parent_of(self, cid: str) -> Optional[str]:
+        p = self.parent[self._row(cid)]
+        return None if p == -1 else self.arrays.cids[p]
+
+    def lca(self, cid_a: str, cid_b: str) -> str:
+        '''
+        Lowest common ancestor of cid_a and cid_b.
+        '''
+
+        a = self._row(cid_a)
+        b = self._row(cid_b)
+        depth = self.depth
+        up = self._up
+        if depth[a] < depth[b]:
+            a, b = b, a
+
+        diff = int(depth[a] - depth[b])
+        k = 0
+        while diff > 0:
+            if diff & 1:
+                a = up[k][a]
+            diff >>= 1
+            k += 1
+
+        if a != b:
+            for k in reversed(range(len(up))):
+                if up[k][a] != up[k][b]:
+                    a = up[k][a]
+                    b = up[k][b]
+            a = up[0][a]
+
+        return self.arrays.cids[a]
+
+    def trim(self, cid: str) -> EJson:
+        '''
+        Remove cid and everything downstream of it from the network. The tree is invalid afterwards.
+
+        Returns:
+            in-place mutated network
+        '''
+
+        return self.netw.remove_components(self.downstream(cid))
+
+    def only(self, cid: str) -> EJson:
+        '''
+        Keep only cid and everything downstream of it in the network. The tree is invalid afterwards.
+
+        Returns:
+            in-place mutated network
+        '''
+
+        r = self._row(cid)
+        keep = np.zeros(len(self.arrays), dtype=bool)
+        keep[self.order[self.tin[r]:self.tin[r] + self.size[r]]] = True
+        cids = self.arrays.cids
+        return self.netw.remove_components([cids[x] for x in np.flatnonzero(~keep).tolist()])
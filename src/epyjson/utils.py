@@ -1,13 +1,18 @@
 import copy
+import logging
 from ordered_set import OrderedSet
 from typing import Sequence, List
 
-import jsonschema
 import math
-import networkx as nx
 import numpy as np
 
+from .audits import audit
 from .ejson import get_schema, EJson, logger
+from .instrument import stage
+from .lazy import lazy_import
+from .loads import LoadScaler
+
+nx = lazy_import('networkx')
 
 
 def a2c(a: Sequence[float]) -> complex:
@@ -115,19 +120,14 @@ def remove_hanging_nodes(netw: EJson) -> EJson:
     Returns:
         in-place mutated network
     '''
-    to_remove = []
-    for comp in netw.components('Node'):
-        adj = list(netw.connections_from(comp['id']))
-        if len(adj) == 1:
-            comp_to = netw.component(adj[0].cid_1)
-            if comp_to['type'] in ('Line', 'Connector'):
-                if len(list(netw.connections_from(comp_to['id']))) <= 2:
-                    # Connectors could have any number of terminals.
-                    to_remove.append(comp['id'])
-                    to_remove.append(comp_to['id'])
+    arrs = netw.adjacency()
+    nds = np.flatnonzero(arrs.is_node & (arrs.degree == 1))
+    elems = arrs.adj[arrs.indptr[nds]]
+    # Connectors could have any number of terminals.
+    hanging = arrs.type_mask('Line', 'Connector')[elems] & (arrs.degree[elems] <= 2)
 
-    for cid in to_remove:
-        netw.remove_component(cid)
+    to_remove = np.column_stack((nds[hanging], elems[hanging])).ravel()
+    netw.remove_components(dict.fromkeys(arrs.cids[x] for x in to_remove))
 
     return netw
 
@@ -174,7 +174,7 @@ def collapse_elem(netw: EJson, cid: str) -> EJson:
             netw.reconnect_elem(con.cid_1, {node: nodes[0]})
 
     for node in other_nodes:
-        assert len(list(netw.connections_from(node))) == 0
+        assert netw.degree(node) == 0
         netw.remove_component(node)
     
     return netw
@@ -198,7 +198,7 @@ def coalesce_connectors(
 
     for comp in list(netw.components('Connector')):
         has_switch = 'switch_state' in comp and comp['switch_state'] != "no_switch"
-        is_twoterm = len(list(netw.connections_from(comp['id']))) == 2
+        is_twoterm = netw.degree(comp['id']) == 2
         if (
             (ignore == 'switched' and has_switch) or
             (ignore == 'twoterm' and is_twoterm) or
@@ -212,7 +212,7 @@ def coalesce_connectors(
             con_nds = [x.cid_1 for x in netw.connections_from(comp['id'])]
             netw.remove_component(comp['id'])
             for con_nd in con_nds:
-                if len(list(netw.connections_from(con_nd))) == 0:
+                if netw.degree(con_nd) == 0:
                     netw.remove_component(con_nd)
 
     return netw
@@ -273,10 +273,8 @@ def is_short_circuit(comp: dict, netw: EJson) -> bool:
     if not is_zero_impedance(comp):
         return False
 
-    l_phs = [con.con['phs'] for con in netw.connections_from(comp['id'])]
-    nds = [netw.component(con.cid_1) for con in netw.connections_from(comp['id'])]
-    nd_phs = [x['phs'] for x in nds]
-    return l_phs == nd_phs
+    cons = list(netw.connections_from(comp['id']))
+    return [x.con['phs'] for x in cons] == [netw.component(x.cid_1)['phs'] for x in cons]
 
 
 def merge_dups(netw: EJson) -> EJson:
@@ -328,9 +326,7 @@ def merge_dups(netw: EJson) -> EJson:
 
         zs_merged = (1.0 / ys_merged) / min_length
 
-        l0['z'] = c2a(zs_merged[0])
-        l0['z0'] = c2a(zs_merged[1])
-        l0['length'] = min_length
+        netw.update_comp(l0['id'], {'z': c2a(zs_merged[0]), 'z0': c2a(zs_merged[1]), 'length': min_length})
 
     return netw
 
@@ -358,7 +354,7 @@ def _get_strings(netw: EJson) -> EJson:
     # lines / connectors are differently connected. A mismatch at an element component means there is a transposition.
     # In either case, remove the component in question from consideration to be part of a string.
     keep = set()
-    for nd in sorted(subg.nodes):
+    for nd in subg.nodes:
         edges = list(g.edges(nd, keys=True, data='con')) # Note: this may include edges to nodes not in subg
         assert len(edges) == 2
         phs0 = edges[0][3]['phs']
@@ -372,17 +368,18 @@ def _get_strings(netw: EJson) -> EJson:
 
     for cc in nx.connected_components(subg):
         cc_subg = subg.subgraph(cc)
-        ends = sorted(x for x in cc_subg.nodes if cc_subg.degree(x) == 1)
+        # Graph nodes are handles: sort by component ID to ensure deterministic behaviour.
+        ends = sorted((x for x in cc_subg.nodes if cc_subg.degree(x) == 1), key=netw.cid_of)
         if len(ends) == 0:
             # This must be a circular string: rare but a logical possibility
             # Simply break the string at any node and everything should be OK.
-            nds = sorted(x for x in cc_subg.nodes if netw.component(x)['type'] == 'Node')
+            nds = sorted((x for x in cc_subg.nodes if g.nodes[x]['comp']['type'] == 'Node'), key=netw.cid_of)
             cc_subg = cc_subg.subgraph(x for x in cc_subg if x != nds[0])
             if len(cc_subg.nodes()) < 3:
                 # We want at least 2 lines or connectors separated by at least 1 node
                 continue
 
-            ends = sorted(x for x in cc_subg.nodes if cc_subg.degree(x) == 1)
+            ends = sorted((x for x in cc_subg.nodes if cc_subg.degree(x) == 1), key=netw.cid_of)
         
         assert len(ends) == 2
         assert len(cc_subg.nodes) >= 3
@@ -393,9 +390,8 @@ def _get_strings(netw: EJson) -> EJson:
         # Add on the two external nodes for convenience
         node_0 = [x for x in g.neighbors(start) if x not in cc_subg.nodes][0]
         node_1 = [x for x in g.neighbors(end) if x not in cc_subg.nodes][0]
-        ord = [netw.component(x) for x in [node_0] + ord + [node_1]]
-
-        phs = list(g[ord[0]['id']][ord[1]['id']].values())[0]['con']['phs']
+        phs = list(g[node_0][ord[0]].values())[0]['con']['phs']
+        ord = [g.nodes[x]['comp'] for x in [node_0] + ord + [node_1]]
 
         assert ord[0]['type'] == 'Node'
         assert ord[1]['type'] in ('Line', 'Connector')
@@ -528,7 +524,11 @@ def reduce_network(netw: EJson) -> EJson:
         in-place mutated network
     '''
 
-    def report_stats(netw: EJson, prefix: str, log=logger.debug):
+    def report_stats(netw: EJson, prefix: str, level=logging.DEBUG):
+        # This iterates over the whole network, so skip it unless it will be logged.
+        if not logger.isEnabledFor(level):
+            return
+
         l = 0.0
         for line in netw.components('Line'):
             l += line['length']
@@ -538,34 +538,39 @@ def reduce_network(netw: EJson) -> EJson:
             by_type.setdefault(c['type'], 0)
             by_type[c['type']] += 1
 
-        log(f'    {prefix}:')
-        log(f'        Total line length = {l}')
+        logger.log(level, f'    {prefix}:')
+        logger.log(level, f'        Total line length = {l}')
         for t, n in by_type.items():
-            log(f'        Number of {t}s = {n}')
+            logger.log(level, f'        Number of {t}s = {n}')
 
+    # Written through update_comp(...), rather than in place, so that the write is journalled.
     for line in netw.components('Line'):
-        line.setdefault('user_data', {})['orig_ids'] = [line['id']]
+        netw.update_comp(line['id'], {'user_data': line.get('user_data', {}) | {'orig_ids': [line['id']]}})
 
-    report_stats(netw, 'Initial', logger.info)
+    report_stats(netw, 'Initial', logging.INFO)
     while True:
         n = len(netw.graph.nodes)
 
-        merge_strings(netw)
+        with stage('reduce_network.merge_strings', netw):
+            merge_strings(netw)
         report_stats(netw, 'After merge strings')
 
-        remove_hanging_nodes(netw)
+        with stage('reduce_network.remove_hanging_nodes', netw):
+            remove_hanging_nodes(netw)
         report_stats(netw, 'After remove hanging')
 
-        merge_short_circuits(netw)
+        with stage('reduce_network.merge_short_circuits', netw):
+            merge_short_circuits(netw)
         report_stats(netw, 'After merge short circuits')
 
-        merge_dups(netw)
+        with stage('reduce_network.merge_dups', netw):
+            merge_dups(netw)
         report_stats(netw, 'After merge dups')
 
         if len(netw.graph.nodes) == n:
             break
 
-    report_stats(netw, 'Final', logger.info)
+    report_stats(netw, 'Final', logging.INFO)
     
     return netw
 
@@ -588,7 +593,7 @@ def remove_unsupplied(netw: EJson) -> EJson:
             visited, _ = netw.dfs(infeeder, stop_cb=lambda _, comp: not is_live(comp))
             connected.update(visited)
 
-    netw.graph.remove_nodes_from([n for n in netw.graph if n not in connected])
+    netw.remove_components([c['id'] for c in netw.components() if c['id'] not in connected])
 
     return netw
 
@@ -619,6 +624,7 @@ def annotate_upstream_transformers(netw: EJson, comp_types: list[str]) -> EJson:
         for comp in netw.components(comp_type):
             _, txs = netw.dfs(comp, pre_cb=_upstream_txs_cb, accum=[])
             comp.setdefault("user_data", {})["upstream_txs"] = txs
+            netw.touch(comp['id'])
 
 
 def add_map(netw: EJson, points: Sequence[dict]) -> EJson:
@@ -667,9 +673,9 @@ def add_map(netw: EJson, points: Sequence[dict]) -> EJson:
 
     for c in netw.components('Node'):
         if 'lat_long' in c:
-            c['xy'] = (A_inv @ (np.array(c['lat_long']) - b)).tolist()
+            netw.update_comp(c['id'], {'xy': (A_inv @ (np.array(c['lat_long']) - b)).tolist()})
         elif 'xy' in c:
-            c['lat_long'] = (A @ np.array(c['xy']) + b).tolist()
+            netw.update_comp(c['id'], {'lat_long': (A @ np.array(c['xy']) + b).tolist()})
     
     return netw
 
@@ -704,11 +710,28 @@ def add_missing_locations(netw: EJson, keys=['xy', 'lat_long']) -> EJson:
                 pre_cb=lambda netw, comp, accum: _add_missing_locs_cb(netw, comp, accum, key),
                 accum=[]
             )
-            nd[key] = [sum(xs) / len(xs) for xs in zip(*poss)] if len(poss) > 0 else default
+            netw.update_comp(nd['id'], {key: [sum(xs) / len(xs) for xs in zip(*poss)] if len(poss) > 0 else default})
 
     return netw
 
 
+def _column(comps: Sequence[dict], key: str) -> np.ndarray:
+    '''
+    Extract a numeric field from a list of components as a float array.
+    '''
+
+    return np.array([x[key] for x in comps], dtype=float)
+
+
+def _set_column(comps: Sequence[dict], key: str, values: np.ndarray):
+    '''
+    Write an array back into a numeric field for a list of components, as regular python types.
+    '''
+
+    for comp, x in zip(comps, values.tolist()):
+        comp[key] = x
+
+
 def make_radial(netw: EJson, start_id: str) -> EJson:
     '''
     Break cycles, making the graph radial.
@@ -786,31 +809,45 @@ def make_single_phased(netw: EJson) -> EJson:
     v_mult = s3 if netw.properties['voltage_type'] == 'lg' else 1.0
     netw.properties['voltage_type'] = 'lg'
 
-    for line in lines:
-        cons = list(netw.connections_from(line['id']))
-        assert len(cons) == 2
-        nph = len([x for x in cons[0].con['phs'] if x.lower() not in 'ng'])
-        line['z'] = [x * 3 / nph for x in line['z']]
-        line['z0'] = line['z']
-        try:
-            line['i_max'] *= s3
-        except KeyError:
-            pass
-
-    for _, _, _, con in netw.connections():
-        assert 'phs' in con
-        con['phs'] = ['A']
+    # A single pass over the connections, to find the line phasing and to replace all phasings with ['A'].
+    line_n_cons = dict.fromkeys((x['id'] for x in lines), 0)
+    line_nph = {}
+    for con in netw.connections():
+        assert 'phs' in con.con
+        elem_id = con.cid_0 if con.cid_0 in line_n_cons else con.cid_1
+        if elem_id in line_n_cons:
+            line_n_cons[elem_id] += 1
+            if con.term_idx == 0:
+                line_nph[elem_id] = len([x for x in con.con['phs'] if x.lower() not in 'ng'])
+        con.con['phs'] = ['A']
+
+    assert all(x == 2 for x in line_n_cons.values())
+
+    if len(lines) > 0:
+        nph = np.array([line_nph[x['id']] for x in lines], dtype=float)
+        zs = _column(lines, 'z').reshape(-1, 2) * 3 / nph[:, np.newaxis]
+        for line, z in zip(lines, zs.tolist()):
+            line['z'] = z
+            line['z0'] = z
+
+        lines_i_max = [x for x in lines if x.get('i_max') is not None]
+        _set_column(lines_i_max, 'i_max', _column(lines_i_max, 'i_max') * s3)
 
     for node in nodes:
         node['phs'] = ['A']
-        node['v_base'] *= v_mult
+    _set_column(nodes, 'v_base', _column(nodes, 'v_base') * v_mult)
 
-    for inf in infs:
-        inf['v_setpoint'] *= v_mult
+    _set_column(infs, 'v_setpoint', _column(infs, 'v_setpoint') * v_mult)
 
-    for load in loads:
+    # Total the load phases using flattened arrays: load_idx maps each phase's s_nom to its load.
+    n_phs = [len(x['s_nom']) for x in loads]
+    load_idx = np.repeat(np.arange(len(loads)), n_phs)
+    s_nom = np.array([x for load in loads for x in load['s_nom']], dtype=float).reshape(-1, 2)
+    s_tot_re = np.bincount(load_idx, weights=s_nom[:, 0], minlength=len(loads))
+    s_tot_im = np.bincount(load_idx, weights=s_nom[:, 1], minlength=len(loads))
+    for load, s_re, s_im in zip(loads, s_tot_re.tolist(), s_tot_im.tolist()):
         load['wiring'] = 'wye'  # i.e. in this case, equivalent of a single line to ground.
-        load['s_nom'] = [c2a(sum((a2c(x) for x in load['s_nom'])))]
+        load['s_nom'] = [[s_re, s_im]]
 
     for tx in txs:
         vg = tx['vector_group']
@@ -830,6 +867,8 @@ def make_single_phased(netw: EJson) -> EJson:
             tx['nom_turns_ratio'] = tx['nom_turns_ratio'] * mult[0] / mult[1]
         if 'taps' in tx:
             tx['taps'] = [tx['taps'][0]]
+
+    netw.touch(*(x['id'] for x in comps))
     
     return netw
 
@@ -846,8 +885,8 @@ def scale_loads(netw: EJson, factor: complex) -> EJson:
         in-place mutated network
     '''
 
-    for load in netw.components('Load'):
-        load['s_nom'] = [c2a(factor * a2c(x)) for x in load['s_nom']]
+    scaler = LoadScaler(netw)
+    scaler.write(scaler.scaled(factor))
     
     return netw
 
@@ -858,126 +897,13 @@ def set_balanced_loads(netw: EJson, tot_load: complex) -> EJson:
 
     Args:
         netw: e-JSON network
-        factor: scaling factor
+        tot_load: total load for each load, split equally between its phases
     
     Returns:
         in-place mutated network
     '''
 
-    for load in netw.components('Load'):
-        n = len(load['s_nom'])
-        load['s_nom'] = [c2a(tot_load / n)] * n
+    scaler = LoadScaler(netw)
+    scaler.write(scaler.balanced(tot_load))
     
     return netw
-
-
-def audit(netw: EJson) -> dict:
-    '''
-    Audit e-JSON.
-
-    Args:
-        netw: e-JSON network
-
-    Returns:
-        dict containing the results of the audit.
-        '''
-
-    aud = {}
-
-    # Audit based on the schema.
-    _audit_schema(netw, aud)
-
-    # Check for unconnected or ill-connected components.
-    _audit_connections(netw, aud)
-
-    # Check for circular connections.
-    _audit_circular_cons(netw, aud)
-
-    # Check for connection phasing.
-    _audit_conn_phase_consistency(netw, aud)
-
-    return aud
-
-
-def _audit_schema(netw: EJson, aud: dict):
-    probs = aud.setdefault(
-        'schema_errors', {'description': 'List of JSON schema errors'}
-    ).setdefault('problems', [])
-    netw_ej = netw.raw_ejson
-    val = jsonschema.validators.Draft202012Validator(get_schema())
-    errs = sorted(val.iter_errors(netw_ej), key=lambda e: e.path)
-    for e in errs:
-        e_str = ' | '.join((x.strip() for x in str(e).split('\n') if len(x) > 0))
-        probs.append({
-            'type': 'error',
-            'fixed': False,
-            'details': {
-                'path': e.json_path,
-                'description': e_str
-            }
-        })
-
-
-def _audit_connections(netw: EJson, aud: dict):
-    probs = aud.setdefault(
-        'connections', {'description': 'Check for wrongly connected components'}
-    ).setdefault('problems', [])
-
-    for comp in netw.components(elems_only=True):
-        ncons = len(list(netw.connections_from(comp['id'])))
-        if (
-            (comp['type'] in ('Line', 'Transformer') and ncons != 2) or
-            (comp['type'] in ('Infeeder', 'Load') and ncons != 1)
-        ):
-            probs.append({
-                'type': 'error',
-                'fixed': False,
-                'details': {
-                    'elem_id': comp,
-                    'n_cons': ncons
-                }
-            })
-
-
-def _audit_circular_cons(netw: EJson, aud: dict):
-    probs = aud.setdefault(
-        'circular_connections', {'description': 'Check for circular connections'}
-    ).setdefault('problems', [])
-
-    for comp in netw.components(elems_only=True):
-        for cons in netw.connections_from(comp['id']):
-            if len(cons) == 2 and cons[0].cid_1 == cons[1].cid_1:
-                probs.append({
-                    'type': 'error',
-                    'fixed': False,
-                    'details': {
-                        'elem_id': comp['id']
-                    }
-                })
-
-
-def _audit_conn_phase_consistency(netw: EJson, aud: dict):
-    probs = aud.setdefault(
-        'phase_consistency', {'description': 'Check that phases of connection exist in the node'}
-    ).setdefault('problems', [])
-
-    for con in netw.connections():
-        try:
-            nd_comp = netw.component(con.cid_1)
-            con_phs = con.con['phs']
-            nd_phs = nd_comp['phs']
-            if not (set(con_phs) <= set(nd_phs)):
-                probs.append({
-                    'type': 'error',
-                    'fixed': False,
-                    'details': {
-                        'elem_id': con.cid_0,
-                        'node_id': con.cid_1,
-                        'con_idx': con.term_idx,
-                        'con_phs': con_phs,
-                        'node_phs': nd_phs
-                    }
-                })
-        except KeyError:
-            # This error would have been picked up earlier. Don't let it cause trouble here.
-            pass
@@ -0,0 +1,383 @@
+import math
+import re
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from .ejson import EJson
+from .sparse import CsrMatrix
+from .utils import a2c, is_live, is_zero_impedance
+
+
+_A = np.exp(2j * np.pi / 3)
+_SEQ = np.array([[1, 1, 1], [1, _A ** 2, _A], [1, _A, _A ** 2]])  # V_abc = _SEQ @ V_012
+_SEQ_INV = np.linalg.inv(_SEQ)
+
+
+class Ybus:
+    '''
+    Bus admittance matrix for a network.
+
+    Each bus is either a node (sequence mode) or a phase of a node (phase mode). Nodes or node phases that are joined
+    by live connectors or zero impedance lines share a bus.
+
+    Attributes:
+        matrix: CsrMatrix with shape (n_buses, n_buses).
+        mode: 'sequence' or 'phase'.
+        labels: For each bus, its representative label: a node ID in sequence mode, or (node ID, phase) in phase mode.
+        index: {label: bus} for every label, including those merged into another bus.
+    '''
+
+    def __init__(self, matrix: CsrMatrix, mode: str, labels: list, index: dict):
+        self.matrix = matrix
+        self.mode = mode
+        self.labels = labels
+        self.index = index
+
+    def __len__(self):
+        return len(self.labels)
+
+    def bus(self, label: Union[str, Tuple[str, str]]) -> int:
+        return self.index[label]
+
+
+def _is_ground(ph: str) -> bool:
+    return ph.upper() in ('N', 'G')
+
+
+def _phases(phs: List[str]) -> List[str]:
+    return [x for x in phs if not _is_ground(x)]
+
+
+def _complex(x) -> complex:
+    return a2c(x) if isinstance(x, list) else complex(x)
+
+
+def parse_vector_group(vg: str) -> Tuple[str, str, int]:
+    '''
+    Parse a transformer vector group such as 'Dyn11' or 'yy0'.
+
+    Returns:
+        (primary winding, secondary winding, clock number), where windings are 'd' or 'y'.
+    '''
+
+    m = re.fullmatch(r'([dyz])n?([dyz])n?(\d+)', vg.lower())
+    if m is None:
+        raise ValueError(f'Invalid vector group {vg}')
+
+    return m.group(1), m.group(2), int(m.group(3))
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i: int, j: int):
+        i = self.find(i)
+        j = self.find(j)
+        if i != j:
+            self.parent[max(i, j)] = min(i, j)
+
+
+def build_ybus(netw: EJson, mode: str = 'sequence') -> Ybus:
+    '''
+    Build the bus admittance matrix of a network.
+
+    Only live lines and transformers are stamped. Loads, generators and infeeders are not included. Lines are modelled
+    as pi sections: either from z, z0 and the optional b_chg (charging susceptance per length unit, split between the
+    two ends), or from y_bus. All lines, and transformers with the same number of winding pairs, are stamped
+    together using array operations.
+
+    In sequence mode, the matrix is the positive sequence matrix, with one bus per node. Transformers use the line to
+    line voltage ratio and the phase shift of their vector group, in the same way as make_single_phased(...), and the
+    wye equivalents (z / 3) of delta winding impedances, so that the result agrees with phase mode.
+
+    In phase mode, there is a bus for each non-neutral, non-ground phase of each node, and connection phasings are used
+    to map line conductors and transformer windings to buses. Transformer windings may be wye (treated as grounded) or
+    delta, for clock numbers 0, 1 and 11.
+
+    Args:
+        netw: e-JSON network
+        mode: 'sequence' or 'phase'
+
+    Returns:
+        Ybus
+    '''
+
+    if mode not in ('sequence', 'phase'):
+        raise ValueError(f'Unknown mode {mode}')
+
+    arrs = netw.adjacency()
+    term_cons = arrs.terminal_cons()
+
+    # Raw bus labels, before merging.
+    labels = []
+    raw_idx = {}
+    for i in np.flatnonzero(arrs.is_node).tolist():
+        nd_labels = [arrs.cids[i]] if mode == 'sequence' else [(arrs.cids[i], x) for x in _phases(arrs.comps[i]['phs'])]
+        for x in nd_labels:
+            raw_idx[x] = len(labels)
+            labels.append(x)
+
+    def con_raw_idxs(con_idx: int) -> List[int]:
+        nd = arrs.cids[arrs.con_node[con_idx]]
+        if mode == 'sequence':
+            return [raw_idx[nd]]
+        return [raw_idx[(nd, x)] for x in _phases(arrs.con_data[con_idx]['phs'])]
+
+    lines = []
+    txs = []
+    uf = _UnionFind(len(labels))
+    for i, comp in enumerate(arrs.comps):
+        if comp['type'] not in ('Connector', 'Line', 'Transformer') or not is_live(comp):
+            continue
+
+        cons = term_cons[i]
+        if comp['type'] == 'Connector' or (comp['type'] == 'Line' and 'y_bus' not in comp and is_zero_impedance(comp)):
+            # Zero impedance: merge the buses at each terminal.
+            idxs = [con_raw_idxs(x) for x in cons]
+            for other in idxs[1:]:
+                for a, b in zip(idxs[0], other):
+                    uf.union(a, b)
+        elif comp['type'] == 'Line':
+            lines.append((comp, [con_raw_idxs(x) for x in cons]))
+        else:
+            txs.append((comp, [con_raw_idxs(x) for x in cons]))
+
+    roots = [uf.find(i) for i in range(len(labels))]
+    bus_of_root = {}
+    for r in roots:
+        bus_of_root.setdefault(r, len(bus_of_root))
+    bus = np.array([bus_of_root[r] for r in roots], dtype=np.int64)
+    n_bus = len(bus_of_root)
+
+    rows = []
+    cols = []
+    vals = []
+
+    def stamp(idxs: np.ndarray, blocks: np.ndarray):
+        # idxs has shape (n_branches, n_terminals), blocks has shape (n_branches, n_terminals, n_terminals).
+        b = bus[idxs]
+        rows.append(np.broadcast_to(b[:, :, np.newaxis], blocks.shape))
+        cols.append(np.broadcast_to(b[:, np.newaxis, :], blocks.shape))
+        vals.append(blocks)
+
+    for idxs, blocks in _line_blocks(lines, mode):
+        stamp(idxs, blocks)
+
+    for idxs, blocks in _tx_blocks(txs, mode):
+        stamp(idxs, blocks)
+
+    if len(vals) > 0:
+        matrix = CsrMatrix.from_coo(
+            np.concatenate([x.ravel() for x in rows]),
+            np.concatenate([x.ravel() for x in cols]),
+            np.concatenate([x.ravel() for x in vals]),
+            (n_bus, n_bus)
+        )
+    else:
+        matrix = CsrMatrix.from_coo([], [], np.zeros(0, dtype=complex), (n_bus, n_bus))
+
+    bus_labels = [None] * n_bus
+    for label, b in zip(labels, bus.tolist()):
+        if bus_labels[b] is None:
+            bus_labels[b] = label
+
+    return Ybus(matrix, mode, bus_labels, dict(zip(labels, bus.tolist())))
+
+
+def _group_by_size(branches: list) -> Dict[int, list]:
+    groups = {}
+    for comp, idxs in branches:
+        if len(idxs) != 2 or len(idxs[0]) != len(idxs[1]):
+            raise ValueError(f'{comp["type"]} {comp["id"]}: expected two terminals with the same number of phases')
+        groups.setdefault(len(idxs[0]), []).append((comp, idxs))
+    return groups
+
+
+def _line_blocks(lines: list, mode: str):
+    '''
+    Yield (idxs, blocks) for all lines, grouped by number of conductors.
+    '''
+
+    for n, group in _group_by_size(lines).items():
+        idxs = np.array([idxs[0] + idxs[1] for _, idxs in group], dtype=np.int64)
+        z_lines = [x for x, (comp, _) in enumerate(group) if 'y_bus' not in comp]
+        y_lines = [x for x, (comp, _) in enumerate(group) if 'y_bus' in comp]
+
+        if len(z_lines) > 0:
+            comps = [group[x][0] for x in z_lines]
+            length = np.array([x['length'] for x in comps], dtype=float)
+            z = np.array([a2c(x['z']) for x in comps]) * length
+            z0 = np.array([a2c(x['z0']) for x in comps]) * length
+            b_chg = np.array([_complex(x.get('b_chg', 0.0)) for x in comps]) * length
+
+            if mode == 'sequence':
+                _check_line_impedance(comps, z == 0.0)
+                y_ser = (1.0 / z)[:, np.newaxis, np.newaxis] * np.ones((1, n, n))
+                y_sh = (0.5j * b_chg)[:, np.newaxis, np.newaxis] * np.eye(n)
+            else:
+                z_s = (2.0 * z + z0) / 3.0
+                z_m = (z0 - z) / 3.0
+                # The eigenvalues of the phase impedance matrix are z (n - 1 times) and z_s + (n - 1) z_m.
+                _check_line_impedance(comps, (z_s + (n - 1) * z_m == 0.0) | ((z == 0.0) & (n > 1)))
+                z_p = (z_s - z_m)[:, np.newaxis, np.newaxis] * np.eye(n) + z_m[:, np.newaxis, np.newaxis]
+                y_ser = np.linalg.inv(z_p)
+                y_sh = (0.5j * b_chg)[:, np.newaxis, np.newaxis] * np.eye(n)
+
+            blocks = np.block([[y_ser + y_sh, -y_ser], [-y_ser, y_ser + y_sh]])
+            yield idxs[z_lines], blocks
+
+        if len(y_lines) > 0:
+            comps = [group[x][0] for x in y_lines]
+            blocks = []
+            for comp in comps:
+                y = np.array([[a2c(x) for x in row] for row in comp['y_bus']]) / comp['length']
+                if mode == 'sequence':
+                    y = _y_bus_to_positive_sequence(y, comp['id'])
+                blocks.append(y)
+
+            yield idxs[y_lines], np.array(blocks)
+
+
+def _check_line_impedance(comps: List[dict], singular: np.ndarray):
+    '''
+    Raise ValueError if any line has a singular series impedance. Lines with z == z0 == 0 are shorts, and never get
+    here.
+    '''
+
+    if np.any(singular):
+        bad = [comps[x]['id'] for x in np.flatnonzero(singular).tolist()]
+        raise ValueError(f'Lines must have non-zero series impedance, or z == z0 == 0 to be merged as shorts: {bad}')
+
+
+def _y_bus_to_positive_sequence(y: np.ndarray, cid: str) -> np.ndarray:
+    n = y.shape[0] // 2
+    if n == 1:
+        return y
+    elif n == 3:
+        return np.array([[(_SEQ_INV @ y[3 * i:3 * i + 3, 3 * j:3 * j + 3] @ _SEQ)[1, 1] for j in range(2)]
+                         for i in range(2)])
+    else:
+        raise ValueError(f'Line {cid}: sequence mode needs a 1 or 3 conductor y_bus, got {n} conductors')
+
+
+def _turns_ratio(tx: dict, winding_pair: int) -> complex:
+    taps = tx.get('taps', [])
+    tap = taps[min(winding_pair, len(taps) - 1)] if len(taps) > 0 else 0.0
+    m = 1.0 + tx.get('tap_factor', 0.0) * tap
+    # Taps scale the turns of the winding they are on, so secondary taps divide the primary to secondary ratio.
+    if tx.get('tap_side', 'primary') == 'secondary':
+        return _complex(tx['nom_turns_ratio']) / m
+    return _complex(tx['nom_turns_ratio']) * m
+
+
+def _two_winding_block(a: np.ndarray, z_p: np.ndarray, z_s: np.ndarray) -> np.ndarray:
+    '''
+    Primitive admittance of ideal transformers with ratio a (V_p = a V_s) in series with their leakage impedances.
+    '''
+
+    z = z_p / np.abs(a) ** 2 + z_s
+    if np.any(z == 0.0):
+        raise ValueError('Transformers must have non-zero leakage impedance')
+
+    y = 1.0 / z
+    return np.array([[y / np.abs(a) ** 2, -y / np.conj(a)], [-y / a, y]]).transpose(2, 0, 1)
+
+
+def _leakage(tx: dict) -> Tuple[complex, complex]:
+    return _complex(tx.get('z_p', 0.0)), _complex(tx.get('z_s', 0.0))
+
+
+def _tx_blocks(txs: list, mode: str):
+    '''
+    Yield (idxs, blocks) for all transformers.
+    '''
+
+    if mode == 'sequence':
+        if len(txs) == 0:
+            return
+
+        comps = [x[0] for x in txs]
+        idxs = np.array([x[1][0] + x[1][1] for x in txs], dtype=np.int64)
+        a = []
+        z_p = []
+        z_s = []
+        for tx in comps:
+            wp, ws, clock = _windings(tx)
+            mult = [math.sqrt(3.0) if x == 'y' else 1.0 for x in (wp, ws)]
+            a.append(_turns_ratio(tx, 0) * mult[0] / mult[1] * np.exp(1j * clock * np.pi / 6.0))
+            # Delta winding impedances are replaced by their wye equivalents.
+            z = _leakage(tx)
+            z_p.append(z[0] / 3.0 if wp == 'd' else z[0])
+            z_s.append(z[1] / 3.0 if ws == 'd' else z[1])
+        yield idxs, _two_winding_block(np.array(a), np.array(z_p), np.array(z_s))
+        return
+
+    for n, group in _group_by_size(txs).items():
+        idxs = np.array([x[1][0] + x[1][1] for x in group], dtype=np.int64)
+        blocks = []
+        for tx, _ in group:
+            c = _winding_incidence(tx, n)
+            a = np.array([_turns_ratio(tx, k) for k in range(n)])
+            z_p, z_s = _leakage(tx)
+            prim = _two_winding_block(a, np.full(n, z_p), np.full(n, z_s))
+            y_prim = np.zeros((2 * n, 2 * n), dtype=complex)
+            for k in range(n):
+                for p in range(2):
+                    for q in range(2):
+                        y_prim[p * n + k, q * n + k] = prim[k, p, q]
+            blocks.append(c.T @ y_prim @ c)
+
+        yield idxs, np.array(blocks)
+
+
+def _windings(tx: dict) -> Tuple[str, str, int]:
+    '''
+    As for parse_vector_group(...), but raise ValueError for the (unsupported) zigzag windings.
+    '''
+
+    wp, ws, clock = parse_vector_group(tx['vector_group'])
+    if 'z' in (wp, ws):
+        raise ValueError(f'Transformer {tx["id"]}: zigzag windings are not supported')
+
+    return wp, ws, clock
+
+
+def _winding_incidence(tx: dict, n: int) -> np.ndarray:
+    '''
+    Matrix C such that winding voltages = C @ [primary phase voltages, secondary phase voltages].
+    '''
+
+    wp, ws, clock = _windings(tx)
+
+    if 'd' in (wp, ws) and n != 3:
+        raise ValueError(f'Transformer {tx["id"]}: delta windings need three phases')
+
+    # Delta windings span phases (k, k + offset). The offsets determine the phase shift between primary and secondary.
+    if wp == 'd' and ws == 'd' and clock == 0:
+        offsets = (1, 1)
+    elif wp == 'd' and ws == 'y' and clock in (1, 11):
+        offsets = (1 if clock == 11 else -1, 0)
+    elif wp == 'y' and ws == 'd' and clock in (1, 11):
+        offsets = (0, 1 if clock == 1 else -1)
+    elif wp == 'y' and ws == 'y' and clock == 0:
+        offsets = (0, 0)
+    else:
+        raise ValueError(f'Transformer {tx["id"]}: vector group {tx["vector_group"]} is not supported')
+
+    c = np.zeros((2 * n, 2 * n))
+    for side, (w, offset) in enumerate(zip((wp, ws), offsets)):
+        for k in range(n):
+            c[side * n + k, side * n + k] = 1.0
+            if w == 'd':
+                c[side * n + k, side * n + (k + offset) % n] = -1.0
+
+    return c
@@ -0,0 +1,80 @@
+import io
+import json
+import pathlib
+
+import jsonschema
+
+import epyjson as epj
+import epyjson.audits
+
+test_netws_path = pathlib.Path(__file__).parent / 'test_data'
+
+
+def _broken_netw() -> epj.EJson:
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    netw.update_comp('ln3_4', {'length': 'x'})
+    netw.update_comp('nd5', {'phs': 'A'})
+    netw.update_comp('ld13', {'wiring': 'bogus'})
+    return netw
+
+
+def test_schema_audit(monkeypatch):
+    netw = _broken_netw()
+    val = jsonschema.validators.Draft202012Validator(epj.get_schema())
+    expected = [e.json_path for e in sorted(val.iter_errors(netw.raw_ejson), key=lambda e: e.path)]
+    assert len(expected) == 3
+
+    serial = epj.audit(netw, ['schema_errors'], max_workers=1)
+    assert [x['details']['path'] for x in serial['schema_errors']['problems']] == expected
+
+    # Force several chunks over a process pool.
+    monkeypatch.setattr(epyjson.audits, '_SCHEMA_CHUNK_SIZE', 4)
+    assert epj.audit(netw, ['schema_errors'], max_workers=2) == serial
+
+
+def test_audit_registry_and_jsonl():
+    netw = _broken_netw()
+    names = [x.name for x in epj.audit_checks()]
+    assert names[:4] == ['schema_errors', 'connections', 'circular_connections', 'phase_consistency']
+
+    @epj.register_audit_check('long_lines', 'Check for very long lines')
+    def _audit_long_lines(netw, max_workers):
+        for comp in netw.components('Line'):
+            if isinstance(comp['length'], (int, float)) and comp['length'] > 0.5:
+                yield {'type': 'warning', 'fixed': False, 'details': {'elem_id': comp['id']}}
+
+    try:
+        aud = epj.audit(netw)
+        assert aud['long_lines']['description'] == 'Check for very long lines'
+        n_probs = sum(len(x['problems']) for x in aud.values())
+
+        f = io.StringIO()
+        assert epj.write_audit_jsonl(netw, f) == n_probs
+        lines = [json.loads(x) for x in f.getvalue().splitlines()]
+        assert len(lines) == n_probs
+        assert sum(x['check'] == 'schema_errors' for x in lines) == 3
+        assert lines[-1]['check'] == 'long_lines'
+    finally:
+        del epyjson.audits._checks['long_lines']
+
+
+def test_connectivity_audits():
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    aud = epj.audit(netw, ['connections', 'circular_connections', 'phase_consistency'])
+    assert all(len(x['problems']) == 0 for x in aud.values())
+
+    netw.add_comp({'id': 'ln_loop', 'type': 'Line', 'length': 1, 'z': [1, 0], 'z0': [1, 0]})
+    netw.connect('ln_loop', 'nd3', 0, {'phs': ['A', 'B', 'C']})
+    netw.connect('ln_loop', 'nd3', 1, {'phs': ['A', 'B', 'D']})
+    netw.connect('ld9', 'nd8', 1, {'phs': ['A']})
+    netw.add_comp({'id': 'ld_x', 'type': 'Load'})
+
+    aud = epj.audit(netw, ['connections', 'circular_connections', 'phase_consistency'])
+    assert [x['details'] for x in aud['connections']['problems']] == [
+        {'elem_id': 'ld9', 'n_cons': 2}, {'elem_id': 'ld_x', 'n_cons': 0}
+    ]
+    assert [x['details'] for x in aud['circular_connections']['problems']] == [{'elem_id': 'ln_loop'}]
+    assert [x['details'] for x in aud['phase_consistency']['problems']] == [{
+        'elem_id': 'ln_loop', 'node_id': 'nd3', 'con_idx': 1, 'con_phs': ['A', 'B', 'D'],
+        'node_phs': ['A', 'B', 'C']
+    }]
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+import epyjson as epj
+from benchmarks import generate, import_time, run
+
+
+@pytest.mark.parametrize('kind', generate.KINDS)
+def test_generate(kind, tmp_path):
+    d = generate.generate(kind, 500, seed=1)
+    assert len(d['components']) >= 500
+    assert d == generate.generate(kind, 500, seed=1)
+
+    netw = epj.EJson(d)
+    assert all(len(x['problems']) == 0 for x in epj.audit(netw).values())
+    assert netw.component(run.INFEEDER_ID)['type'] == 'Infeeder'
+
+    path = tmp_path / 'netw.json'
+    assert generate.write_network(path, kind, 500, seed=1) == len(d['components'])
+    with open(path) as f:
+        assert json.load(f) == d
+
+
+def test_run(tmp_path):
+    out = tmp_path / 'results.json'
+    run.main(['-k', 'radial', 'circular', '-s', '300', '-q', '-o', str(out)])
+    with open(out) as f:
+        results = json.load(f)
+
+    assert len(results['results']) == 2 * len(run.BENCHMARKS)
+    for res in results['results']:
+        assert res['error'] is None, res
+        assert res['seconds'] > 0.0 and res['peak_bytes'] > 0
+
+
+def test_import_time():
+    res = import_time.measure(repeat=1)
+    assert res['seconds'] > 0.0
+    assert not res['loaded']['networkx'] and not res['loaded']['jsonschema']
@@ -0,0 +1,82 @@
+import pathlib
+
+import epyjson as epj
+
+test_netws_path = pathlib.Path(__file__).parent / 'test_data'
+
+
+def test_result_cache(tmp_path):
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_test_reduce.json')
+    fp = netw.fingerprint()
+    cache = epj.ResultCache(tmp_path)
+
+    reduced = cache.reduce_network(netw)
+    assert netw.fingerprint() == fp
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert reduced.fingerprint() == epj.reduce_network(netw.clone()).fingerprint()
+
+    # A fresh cache on the same directory picks up the stored entry.
+    cache = epj.ResultCache(tmp_path)
+    assert cache.reduce_network(epj.EJson.read_from_file(test_netws_path / 'netw_test_reduce.json')).fingerprint() == \
+        reduced.fingerprint()
+    assert (cache.hits, cache.misses) == (1, 0)
+
+    # Arguments and content are part of the key.
+    cache.coalesce_connectors(netw, ignore='switched')
+    cache.coalesce_connectors(netw, ignore='twoterm')
+    assert cache.audit(netw) == epj.audit(netw)
+    assert cache.audit(netw) == epj.audit(netw)
+    assert (cache.hits, cache.misses) == (2, 3)
+    assert len(cache) == 4
+
+    netw.update_comp(next(netw.components('Line'))['id'], {'length': 123.0})
+    cache.audit(netw)
+    assert cache.misses == 4
+
+
+def test_result_cache_eviction(tmp_path):
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    cache = epj.ResultCache(tmp_path, max_entry_bytes=None)
+    cache.make_single_phased(netw)
+    entry_bytes = cache.total_bytes
+
+    cache = epj.ResultCache(tmp_path, max_bytes=int(2.5 * entry_bytes), max_entry_bytes=None)
+    lines = [x['id'] for x in netw.components('Line')]
+    for i in range(4):
+        netw.update_comp(lines[0], {'length': float(i)})
+        cache.make_single_phased(netw)
+    assert len(cache) == 2
+    assert cache.total_bytes <= cache.max_bytes
+    assert len(list(tmp_path.iterdir())) == 2
+
+    # The most recently used entries are kept.
+    cache.make_single_phased(netw)
+    assert cache.hits == 1
+
+    cache = epj.ResultCache(tmp_path, max_entry_bytes=10)
+    cache.clear()
+    cache.make_single_phased(netw)
+    assert len(cache) == 0
+
+
+def test_result_cache_key(tmp_path):
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_test_reduce.json')
+    raw = netw.raw_ejson
+    shuffled = epj.EJson(raw | {'components': raw['components'][::-1]})
+    assert shuffled.fingerprint() == netw.fingerprint()
+
+    # Results depend on component order, so equal fingerprints aren't enough for a hit.
+    cache = epj.ResultCache(tmp_path)
+    cache.reduce_network(netw)
+    reduced = cache.reduce_network(shuffled)
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert reduced.raw_ejson == epj.reduce_network(shuffled.clone()).raw_ejson
+
+    # Direct writes, followed by touch(...), change the key.
+    netw.component('ln2_3')['length'] = 1000.0
+    netw.touch('ln2_3')
+    assert cache.reduce_network(netw).raw_ejson == epj.reduce_network(netw.clone()).raw_ejson
+    netw.component('ln2_3')['z'][0] *= 2
+    netw.touch('ln2_3')
+    assert cache.reduce_network(netw).raw_ejson == epj.reduce_network(netw.clone()).raw_ejson
+    assert (cache.hits, cache.misses) == (0, 4)
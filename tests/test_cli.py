@@ -0,0 +1,74 @@
+import json
+import pathlib
+import shutil
+
+import pytest
+
+import epyjson as epj
+from epyjson import cli
+
+test_netws_path = pathlib.Path(__file__).parent / 'test_data'
+
+
+def _inputs(tmp_path, n=2):
+    for i in range(n):
+        shutil.copy(test_netws_path / 'netw_generic_a.json', tmp_path / f'netw_{i}.json')
+
+
+def test_reduce(tmp_path, capsys):
+    _inputs(tmp_path)
+    assert cli.main(['-j', '2', 'reduce', str(tmp_path / '*.json'), '-o', str(tmp_path / 'out'), '--ext', '.json.gz']) == 0
+
+    expected = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    epj.reduce_network(expected)
+    for i in range(2):
+        netw = epj.read_ejson(tmp_path / 'out' / f'netw_{i}.json.gz')
+        assert netw.raw_ejson == expected.raw_ejson
+
+    summary = capsys.readouterr().err
+    assert 'netw_0.json' in summary and 'netw_1.json' in summary
+
+
+def test_stream_convert_and_diff(tmp_path, capsys):
+    _inputs(tmp_path, 1)
+    assert cli.main(['--stream', '-q', 'convert', str(tmp_path / 'netw_0.json'), '-o', str(tmp_path / 'a.json.xz')]) == 0
+    assert cli.main(['diff', str(tmp_path / 'netw_0.json'), str(tmp_path / 'a.json.xz')]) == 0
+
+    assert cli.main(['-q', 'radialise', str(tmp_path / 'netw_0.json'), '-o', str(tmp_path / 'b.json')]) == 0
+    assert cli.main(['-q', 'single-phase', str(tmp_path / 'b.json'), '--in-place']) == 0
+    capsys.readouterr()
+    assert cli.main(['diff', str(tmp_path / 'netw_0.json'), str(tmp_path / 'b.json')]) == 1
+    assert not epj.is_empty_patch(json.loads(capsys.readouterr().out))
+
+
+def test_audit(tmp_path):
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    netw.update_comp('ld13', {'wiring': 'bogus'})
+    netw.write_to_file(tmp_path / 'bad.json')
+    _inputs(tmp_path, 1)
+
+    assert cli.main(['-q', 'audit', str(tmp_path / '*.json'), '-o', str(tmp_path / 'audit')]) == 0
+    problems = [json.loads(x) for x in (tmp_path / 'audit' / 'bad.json.audit.jsonl').read_text().splitlines()]
+    assert [x['check'] for x in problems] == ['schema_errors']
+    assert (tmp_path / 'audit' / 'netw_0.json.audit.jsonl').read_text() == ''
+
+    # Errors are reported per file, without stopping the others.
+    (tmp_path / 'broken.json').write_text('{"components": [')
+    assert cli.main(['-q', 'audit', str(tmp_path / '*.json')]) == 1
+
+
+def test_output_paths(tmp_path):
+    for d in ('a', 'b'):
+        (tmp_path / d).mkdir()
+        shutil.copy(test_netws_path / 'netw_generic_a.json', tmp_path / d / 'netw.json')
+
+    # Outputs keep their paths relative to the common directory of the inputs, so don't overwrite each other.
+    out = tmp_path / 'out'
+    assert cli.main(['-q', 'convert', str(tmp_path / '**' / 'netw.json'), '-o', str(out)]) == 0
+    assert (out / 'a' / 'netw.json').exists() and (out / 'b' / 'netw.json').exists()
+
+    # Inputs that would be written to the same output are rejected before anything is written.
+    epj.write_ejson(epj.read_ejson(tmp_path / 'a' / 'netw.json'), tmp_path / 'a' / 'netw.json.gz')
+    with pytest.raises(SystemExit):
+        cli.main(['-q', 'convert', str(tmp_path / 'a' / 'netw.*'), '--ext', '.json.xz'])
+    assert not (tmp_path / 'a' / 'netw.json.xz').exists()
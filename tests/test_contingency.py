@@ -0,0 +1,41 @@
+import pathlib
+
+import pytest
+
+import epyjson as epj
+
+test_netws_path = pathlib.Path(__file__).parent / 'test_data'
+
+
+def _lost_loads(netw: epj.EJson, cid: str) -> set:
+    before = set(x['id'] for x in netw.components('Load'))
+    netw = netw.clone()
+    epj.remove_unsupplied(netw)
+    supplied = set(x['id'] for x in netw.components('Load'))
+    netw.remove_component(cid)
+    epj.remove_unsupplied(netw)
+    return (supplied & before) - set(x['id'] for x in netw.components('Load'))
+
+
+@pytest.mark.parametrize('meshed', [False, True])
+def test_contingency_analysis(meshed):
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    if meshed:
+        netw.add_comp({'id': 'ln3_9', 'type': 'Line', 'length': 1, 'z': [1, 0], 'z0': [1, 0]})
+        netw.connect('ln3_9', 'nd3', 0, {'phs': ['A', 'B', 'C']})
+        netw.connect('ln3_9', 'nd9', 1, {'phs': ['A', 'B', 'C']})
+
+    ca = epj.ContingencyAnalysis(netw)
+    elems = [x['id'] for x in netw.components() if x['type'] in ('Line', 'Transformer', 'Load', 'Node')]
+    for cid in elems:
+        assert set(ca.lost(cid, 'Load')) == _lost_loads(netw, cid), cid
+        assert ca.contingency(cid).n_loads == len(_lost_loads(netw, cid))
+
+    screen = ca.screen()
+    assert (ca.contingency('ln6_7').n_loads == 0) == meshed
+    assert [x.n_loads for x in screen] == sorted((x.n_loads for x in screen), reverse=True)
+    assert all(netw.component(x.cid)['type'] in ('Line', 'Transformer') for x in screen)
+
+    netw.touch('ld9')
+    with pytest.raises(ValueError):
+        ca.lost('ld9')
@@ -0,0 +1,65 @@
+import json
+import pathlib
+
+import epyjson as epj
+
+test_netws_path = pathlib.Path(__file__).parent / 'test_data'
+
+
+def test_diff_apply_patch():
+    a = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    assert epj.is_empty_patch(epj.diff(a, a.clone()))
+
+    b = a.clone()
+    b.properties['comment'] = 'new'
+    b.update_comp('ln2_3', {'length': 2})
+    del b.component('ld9')['s_nom']
+    b.touch('ld9')
+    b.remove_component('ld13')
+    b.add_comp({'id': 'nd14', 'type': 'Node', 'phs': ['A', 'B', 'C'], 'v_base': 415})
+    b.add_comp({'id': 'ln12_14', 'type': 'Line', 'length': 1, 'z': [1, 0], 'z0': [1, 0]})
+    b.connect('ln12_14', 'nd12', 0, {'phs': ['A', 'B', 'C']})
+    b.connect('ln12_14', 'nd14', 1, {'phs': ['A', 'B', 'C']})
+    b.reconnect_elem('ld8', {'nd8': 'nd7'})
+    next(b.connections_from('ln3_4')).con['phs'] = ['A', 'C', 'B']
+    b.touch('ln3_4')
+
+    patch = json.loads(json.dumps(epj.diff(a, b)))
+    assert patch['components']['removed'] == ['ld13']
+    assert [x['id'] for x in patch['components']['added']] == ['nd14', 'ln12_14']
+    assert {x['id'] for x in patch['components']['modified']} == {'ln2_3', 'ld9'}
+    assert sorted(x[0] for x in patch['connections']['removed']) == ['ld8', 'ln3_4']
+    assert len(patch['connections']['added']) == 4
+
+    a_fp = a.fingerprint()
+    c = epj.apply_patch(a.clone(), patch)
+    assert a.fingerprint() == a_fp
+    assert c.fingerprint() == b.fingerprint()
+    assert epj.is_empty_patch(epj.diff(c, b))
+    assert c.component('ld9').get('s_nom') is None
+
+
+def test_diff_hashes_once(monkeypatch):
+    a = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    b = a.clone()
+    b.fingerprint()
+    b.component('ln2_3')['length'] = 2  # Direct write, found by refresh(...).
+    n = len(a.graph)
+
+    refreshes = []
+    refresh = epj.EJson.refresh
+    monkeypatch.setattr(epj.EJson, 'refresh', lambda netw: refreshes.append(netw) or refresh(netw))
+    digests = []
+    digest = epj.ejson._digest
+    monkeypatch.setattr(epj.ejson, '_digest', lambda x: digests.append(x) or digest(x))
+
+    # Each component is hashed once, for its topology and its parameters, apart from those already hashed.
+    patch = epj.diff(a, b)
+    assert [x['id'] for x in patch['components']['modified']] == ['ln2_3']
+    assert len(refreshes) == 2
+    assert len(digests) == 2 * n + 2
+
+    # And never again while the networks are unchanged.
+    digests.clear()
+    epj.diff(a, b)
+    assert len(digests) == 0
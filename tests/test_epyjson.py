@@ -1,7 +1,11 @@
+import json
 import os
 import pathlib
 import tempfile
 
+import numpy as np
+import pytest
+
 import epyjson as epj
 
 test_netws_path = pathlib.Path(__file__).parent / 'test_data'
@@ -51,6 +55,252 @@ def test_quick_tests():
     ]
 
 
+def test_adjacency():
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    arrs = netw.adjacency()
+    assert netw.adjacency() is arrs
+
+    for c in netw.components():
+        view = arrs.connections_from(arrs.rows[c['id']])
+        assert list(view) == list(netw.connections_from(c['id']))
+        assert view.cids == list(netw.neighbors(c['id']))
+        assert len(view) == netw.degree(c['id'])
+
+    views = netw.connections_from_many(['ln2_3', 'nd6'])
+    assert [x.cids for x in views] == [['nd2', 'nd3'], ['ln5_6', 'ln6_7', 'ln6_8']]
+    assert views[0].term_idxs.tolist() == [0, 1]
+
+    owner, idx = arrs.connections_from_many([arrs.rows['nd6'], arrs.rows['ld8']])
+    assert owner.tolist() == [0, 0, 0, 1]
+    assert [arrs.cids[x] for x in arrs.adj[idx]] == ['ln5_6', 'ln6_7', 'ln6_8', 'nd8']
+
+    for con in netw.connections():
+        assert netw.component(con.cid_1)['type'] == 'Node'
+        assert epj.elem_node(con, netw) is con
+
+    netw.remove_component('ld8')
+    assert netw.adjacency() is not arrs
+    assert netw.adjacency().connections_from(netw.adjacency().rows['nd8']).cids == ['ln6_8']
+
+
+def test_fingerprint():
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    fp = netw.fingerprint()
+    fp_topo = netw.fingerprint('topology')
+
+    # Independent of component order, and the same for a fresh read of the same data.
+    raw = netw.raw_ejson
+    raw['components'].reverse()
+    assert epj.EJson(raw).fingerprint() == fp
+    assert netw.clone().reorder('in1').fingerprint() == fp
+
+    # Parameter changes don't affect the topology fingerprint.
+    netw.update_comp('ln2_3', {'length': 2})
+    assert netw.fingerprint() != fp
+    assert netw.fingerprint('topology') == fp_topo
+    netw.update_comp('ln2_3', {'length': 1})
+    assert netw.fingerprint() == fp
+
+    netw.component('ln3_4')['length'] = 3
+    netw.touch('ln3_4')
+    assert netw.fingerprint() != fp
+    netw.component('ln3_4')['length'] = 1
+    netw.touch('ln3_4')
+    assert netw.fingerprint() == fp
+
+    # Direct writes of fields into component and connection dicts aren't seen until touch(...) or refresh(...).
+    netw.component('ln3_4')['length'] = 1000
+    assert netw.fingerprint() == fp
+    assert netw.refresh() == ['ln3_4']
+    assert netw.fingerprint() != fp
+    netw.component('ln3_4')['length'] = 1
+    assert netw.refresh() == ['ln3_4']
+    assert netw.fingerprint() == fp
+    netw.component('ld9')['in_service'] = False
+    assert netw.refresh() == ['ld9']
+    assert netw.fingerprint() != fp
+    del netw.component('ld9')['in_service']
+    netw.component('ld9')['in_service'] = True
+    netw.refresh()
+    assert netw.fingerprint() == fp
+    con = next(netw.connections_from('ld9')).con
+    con['phs'] = ['A']
+    assert netw.refresh() == ['ld9']
+    assert netw.fingerprint('topology') != fp_topo
+    con['phs'] = ['A', 'B', 'C']
+    netw.refresh()
+    assert netw.fingerprint() == fp
+    assert netw.refresh() == []
+
+    # In-place modification of nested values needs touch(...).
+    netw.component('ln3_4')['z'][0] = 5
+    netw.touch('ln3_4')
+    assert netw.fingerprint() != fp
+    netw.component('ln3_4')['z'][0] = 2
+    netw.touch('ln3_4')
+    assert netw.fingerprint() == fp
+
+    # Topology changes.
+    netw.remove_component('ld8')
+    assert netw.fingerprint('topology') != fp_topo
+    netw.add_comp({'id': 'ld8', 'type': 'Load', 'in_service': True, 'wiring': 'wye',
+                   's_nom': [[1, 0], [0, 2], [1, 1]]})
+    netw.connect('ld8', 'nd8', 0, {'phs': ['A', 'B', 'C']})
+    assert netw.fingerprint() == fp
+
+    netw.rename_to({'nd2': 'nd2a'})
+    assert netw.fingerprint('topology') != fp_topo
+    assert netw.component_hash('nd3') == epj.EJson(raw).component_hash('nd3')
+    assert netw.component_hash('ln2_3') != epj.EJson(raw).component_hash('ln2_3')
+
+
+class _NoScan(dict):
+    def items(self):
+        raise AssertionError('scanned all components')
+
+
+def test_fingerprint_incremental(monkeypatch):
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    fp = netw.fingerprint()
+    netw._checks = _NoScan(netw._checks)
+
+    digests = []
+    digest = epj.ejson._digest
+    monkeypatch.setattr(epj.ejson, '_digest', lambda x: digests.append(x) or digest(x))
+
+    # Unchanged: nothing is rehashed, apart from the network properties, and nothing is scanned.
+    assert netw.fingerprint() == fp
+    assert netw.fingerprint('topology') == netw.fingerprint('topology')
+    assert netw.component_hash('ln2_3') == netw.component_hash('ln2_3')
+    assert digests == [netw.properties]
+
+    # After a change, only the changed component is rehashed.
+    digests.clear()
+    netw.update_comp('ln2_3', {'length': 2})
+    netw.fingerprint('topology')
+    assert len(digests) == 2
+
+
+def test_journal():
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    base = netw.clone()
+    journal = netw.start_journal()
+    fps = [netw.fingerprint()]
+
+    netw.update_comp('ln2_3', {'length': 2, 'b_chg': 0.1})
+    fps.append(netw.fingerprint())
+    netw.trim('ln10_11', stop_cb=lambda netw, c: c['id'] == 'nd10')
+    fps.append(netw.fingerprint())
+    netw.rename_to({'nd2': 'nd2a'})
+    fps.append(netw.fingerprint())
+    with netw.edit():
+        netw.reconnect_elem('ld8', {'nd8': 'nd7'})
+        netw.add_comp({'id': 'ld14', 'type': 'Load', 's_nom': [[1, 0]]})
+        netw.connect('ld14', 'nd3', 0, {'phs': ['A']})
+    fps.append(netw.fingerprint())
+    netw.reorder('in1')
+    fps.append(netw.fingerprint())
+    assert len(journal.done) == 5
+
+    for fp in reversed(fps[:-1]):
+        netw.undo()
+        assert netw.fingerprint() == fp
+    with pytest.raises(ValueError):
+        netw.undo()
+
+    netw.redo().redo()
+    assert netw.fingerprint() == fps[2]
+
+    # A new edit discards the redo stack.
+    netw.remove_component('ld13')
+    with pytest.raises(ValueError):
+        netw.redo()
+
+    # Replay on another copy of the base network.
+    replayed = epj.Journal.from_json(json.loads(json.dumps(journal.to_json()))).replay(base)
+    assert replayed.fingerprint() == netw.fingerprint()
+
+
+@pytest.mark.parametrize('reorder', [False, True])
+def test_journal_undo_restores_order(reorder):
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_test_reduce.json')
+    if reorder:
+        netw.reorder(next(netw.components('Infeeder'))['id'])
+    raw = netw.raw_ejson
+    cons = list(netw.connections())
+    journal = netw.start_journal()
+
+    epj.reduce_network(netw)
+    with netw.edit():
+        netw.disconnect('ld9', 'nd9', 0)
+        netw.connect('ld9', 'nd9', 0, {'phs': ['A', 'B', 'C']})
+        netw.reconnect_elem('ld9', {'nd9': 'nd8'})
+    n = len(journal.done)
+    for _ in range(n):
+        netw.undo()
+    assert netw.raw_ejson == raw
+    assert list(netw.connections()) == cons
+
+    for _ in range(n):
+        netw.redo()
+    for _ in range(n):
+        netw.undo()
+    assert netw.raw_ejson == raw
+    assert list(netw.connections()) == cons
+
+
+def test_journal_reorder():
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    base = netw.clone()
+    order = [x['id'] for x in netw.components()]
+    journal = netw.start_journal()
+
+    netw.reorder('ld9')
+    reordered = [x['id'] for x in netw.components()]
+    assert reordered != order
+    netw.reorder('ld9')  # Renumbers no terminals, but is still an edit of its own.
+    assert len(journal.done) == 2
+
+    netw.undo()
+    assert [x['id'] for x in netw.components()] == reordered
+    netw.undo()
+    assert [x['id'] for x in netw.components()] == order
+    assert netw.raw_ejson == base.raw_ejson
+
+    netw.redo()
+    assert [x['id'] for x in netw.components()] == reordered
+    replayed = epj.Journal.from_json(json.loads(json.dumps(journal.to_json()))).replay(base.clone())
+    assert [x['id'] for x in replayed.components()] == reordered
+    assert replayed.raw_ejson == netw.raw_ejson
+
+    # Components removed by reorder(...) get their places back.
+    netw = base.clone()
+    netw.reorder('in1')
+    order = [x['id'] for x in netw.components()]
+    netw.start_journal()
+    netw.remove_component('ln10_11')
+    netw.reorder('in1')
+    netw.undo()
+    netw.undo()
+    assert [x['id'] for x in netw.components()] == order
+
+
+def test_rename_to():
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    graph = netw.graph
+    h = netw.handle_of('nd2')
+    netw.rename_to({'nd2': 'nd3', 'nd3': 'nd2', 'missing': 'whatever'})
+    assert netw.graph is graph
+    assert netw.handle_of('nd3') == h
+    assert netw.component('nd3')['id'] == 'nd3'
+    assert [x.cid_1 for x in netw.connections_from('ln2_3')] == ['nd3', 'nd2']
+    assert not netw.has_component('missing')
+
+    with pytest.raises(ValueError):
+        netw.rename_to({'nd4': 'nd5'})
+    assert netw.component('nd4')['id'] == 'nd4'
+
+
 def test_round_trip():
     netw_a = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
 
@@ -83,6 +333,23 @@ def test_reorder():
     assert ln_cons == [['ln2_3', 'nd3', 0], ['ln2_3', 'nd2', 1]]
 
 
+def test_reorder_in_place():
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_test_reorder.json')
+    graph = netw.graph
+    netw.reorder('ld3')
+    assert netw.graph is graph
+
+    raw = netw.raw_ejson
+    assert [x['id'] for x in raw['components']] == ['ld3', 'nd3', 'ln2_3', 'nd2', 'tx1_2', 'nd1', 'in1']
+    assert [x['node'] for x in raw['components'][2]['cons']] == ['nd3', 'nd2']
+
+    netw.remove_component('in1')
+    netw.add_comp({'id': 'in2', 'type': 'Infeeder', 'v_setpoint': 11000})
+    netw.connect('in2', 'nd1', 0, {'phs': ['A', 'B', 'C']})
+    assert [x['id'] for x in netw.components()] == ['ld3', 'nd3', 'ln2_3', 'nd2', 'tx1_2', 'nd1', 'in2']
+    assert [x.cid_1 for x in netw.connections_from('nd1')] == ['tx1_2', 'in2']
+
+
 def test_make_radial():
     netw = epj.EJson.read_from_file(test_netws_path / 'netw_test_make_radial.json')
     epj.make_radial(netw, 'in1')
@@ -109,6 +376,28 @@ def test_set_loads():
     assert netw.component('ld8')['s_nom'] == [[8.0, 2.0], [8.0, 2.0], [8.0, 2.0]]
 
 
+def test_load_scaler():
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    epj.set_balanced_loads(netw, 12.0 + 3.0j)
+    scaler = epj.LoadScaler(netw)
+    assert scaler.load_ids == ['ld8', 'ld9', 'ld13']
+
+    profile = scaler.scaled(np.array([1.0, 0.5, 2.0]))
+    assert profile.shape == (3, 9)
+    assert np.allclose(scaler.load_totals(profile)[:, 0], [12.0 + 3.0j, 6.0 + 1.5j, 24.0 + 6.0j])
+
+    per_load = scaler.scaled(np.array([[1.0, 2.0, 3.0]] * 4))
+    assert np.allclose(scaler.load_totals(per_load[3]), [12.0 + 3.0j, 24.0 + 6.0j, 36.0 + 9.0j])
+
+    scaler.write(profile, step=1)
+    assert netw.component('ld8')['s_nom'] == [[2.0, 0.5], [2.0, 0.5], [2.0, 0.5]]
+    scaler.write(profile, step=2)
+    assert netw.component('ld13')['s_nom'] == [[8.0, 2.0], [8.0, 2.0], [8.0, 2.0]]
+
+    with pytest.raises(ValueError):
+        scaler.scaled(np.ones((2, 2)))
+
+
 def test_make_single_phased():
     netw = epj.EJson.read_from_file(test_netws_path / 'netw_test_make_single_phased.json')
     netw_sp = netw.clone()
@@ -118,6 +407,11 @@ def test_make_single_phased():
 
     for con in netw_sp.connections():
         assert con[3]['phs'] == ['A']
+    # Each phasing is its own list, so that modifying one doesn't modify the others.
+    phs_lists = [con.con['phs'] for con in netw_sp.connections()] + [
+        n['phs'] for n in netw_sp.components(nodes_only=True)
+    ]
+    assert len(set(id(x) for x in phs_lists)) == len(phs_lists)
 
     for n in netw_sp.components(nodes_only=True):
         assert n['phs'] == ['A']
@@ -203,6 +497,72 @@ def test_reduce():
     assert len(list(netw.components())) == 19
 
 
+def test_dfs():
+    def dfs_recursive(netw, cid, visited, events):
+        if cid in visited or cid == 'nd6':
+            return
+        events.append(('pre', cid))
+        visited.append(cid)
+        for _, adj, _, _ in netw.connections_from(cid):
+            dfs_recursive(netw, adj, visited, events)
+        events.append(('post', cid))
+
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    expected = []
+    dfs_recursive(netw, 'in1', [], expected)
+
+    def pre_cb(netw, comp, accum):
+        if comp['id'] == 'nd6':
+            return True, accum
+        return False, accum + [('pre', comp['id'])]
+
+    visited, events = netw.dfs(
+        'in1', pre_cb=pre_cb, post_cb=lambda netw, comp, accum: accum + [('post', comp['id'])], accum=[]
+    )
+    assert events == expected
+    assert list(visited) == [x for e, x in expected if e == 'pre']
+
+    # Deeper than the default recursion limit.
+    n = 5000
+    comps = [{'id': 'nd0', 'type': 'Node', 'phs': ['A'], 'v_base': 1}]
+    for i in range(1, n):
+        comps.append({'id': f'nd{i}', 'type': 'Node', 'phs': ['A'], 'v_base': 1})
+        comps.append({
+            'id': f'ln{i}', 'type': 'Line', 'length': 1, 'z': [1, 0], 'z0': [1, 0],
+            'cons': [{'node': f'nd{i - 1}', 'phs': ['A']}, {'node': f'nd{i}', 'phs': ['A']}]
+        })
+    netw = epj.EJson({'voltage_type': 'll', 'components': comps})
+    visited, depth = netw.dfs('nd0', post_cb=lambda netw, comp, accum: accum + 1, accum=0)
+    assert len(visited) == 2 * n - 1 and depth == 2 * n - 1 and visited[-1] == f'nd{n - 1}'
+
+
+def test_instrumentation():
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_test_reduce.json')
+    n_0 = len(list(netw.components()))
+    with epj.observing(epj.StageProfiler()) as prof:
+        epj.reduce_network(netw)
+        epj.audit(netw)
+    assert not epj.instrument.is_observed()
+
+    stats = prof.summary('reduce_network.')
+    assert set(stats) == set(
+        f'reduce_network.{x}' for x in ('merge_strings', 'remove_hanging_nodes', 'merge_short_circuits', 'merge_dups')
+    )
+    assert len(set(x['calls'] for x in stats.values())) == 1
+    assert sum(x['removed'] for x in stats.values()) == n_0 - 19
+
+    stats = prof.summary('audit.')
+    assert set(stats) == set(f'audit.{x.name}' for x in epj.audit_checks())
+    assert all(x['calls'] == 1 and 'n_problems' in x for x in stats.values())
+
+    events = []
+    epj.add_observer(events.append)
+    epj.audit(netw, ['connections'])
+    epj.remove_observer(events.append)
+    epj.audit(netw, ['connections'])
+    assert [x.name for x in events] == ['audit.connections']
+
+
 def test_audit():
     netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
     aud = epj.audit(netw)
@@ -0,0 +1,118 @@
+import io
+import json
+import pathlib
+
+import pytest
+
+import epyjson as epj
+import epyjson.audits
+import epyjson.legacy
+from epyjson import cli
+
+test_netws_path = pathlib.Path(__file__).parent / 'test_data'
+
+# Powers of two, so that scaling round trips exactly.
+_UNITS = {'voltage': 1024, 'impedance': 0.5, 'power': 1024, 'current': 2}
+
+
+def _legacy(units_first=True) -> dict:
+    '''
+    netw_generic_a in e-JSON 0 format.
+    '''
+
+    raw = json.loads((test_netws_path / 'netw_generic_a.json').read_text())
+    comps = {}
+    for c in raw['components']:
+        data = {k: v for k, v in c.items() if k not in ('id', 'type')}
+        for k in ('v_base', 'v_setpoint'):
+            if k in data:
+                data[k] /= _UNITS['voltage']
+        if 'v_winding_base' in data:
+            data['v_winding_base'] = [x / _UNITS['voltage'] for x in data['v_winding_base']]
+        if 'z_p' in data:
+            data['z'] = [[x / _UNITS['impedance'] for x in data.pop(k)] for k in ('z_p', 'z_s')]
+        for k in ('z', 'z0'):
+            if k in data and c['type'] != 'Transformer':
+                data[k] = [x / _UNITS['impedance'] for x in data[k]]
+        comps[c['id']] = {c['type']: data}
+
+    if units_first:
+        return {'units': _UNITS, 'voltage_type': raw['voltage_type'], 'components': comps}
+    return {'components': comps, 'voltage_type': raw['voltage_type'], 'units': _UNITS}
+
+
+def test_convert_component():
+    factors = epj.legacy.scale_factors({'voltage': 1000, 'impedance': 2, 'power': 10, 'current': 3})
+    c = epj.legacy.convert_component(
+        'tx', 'Transformer', {'user_data': {}, 'z': [[1, 2], 3], 'v_winding_base': [11, 0.4], 's_max': 5, 'i_max': 1},
+        factors
+    )
+    assert list(c) == ['id', 'type', 'v_winding_base', 's_max', 'i_max', 'z_p', 'z_s', 'user_data']
+    assert c['z_p'] == [2, 4] and c['z_s'] == [6, 0]
+    assert c['v_winding_base'] == [11000, 400] and c['s_max'] == 50 and c['i_max'] == 3
+
+    assert epj.legacy.convert_component('g', 'Gen', {'z': 1}, epj.legacy.scale_factors(None)) == {
+        'id': 'g', 'type': 'Generator', 'z': [1, 0]
+    }
+
+
+@pytest.mark.parametrize('units_first', [True, False])
+def test_convert_from_ejson_0(tmp_path, units_first):
+    expected = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    src = tmp_path / 'legacy.json'
+    src.write_text(json.dumps(_legacy(units_first)))
+
+    res = epj.convert_from_ejson_0(src, tmp_path / 'netw.json.gz')
+    assert res.n_components == len(expected.graph)
+    assert res.problems == []
+    netw = epj.read_ejson(tmp_path / 'netw.json.gz')
+    assert netw.raw_ejson == expected.raw_ejson
+    assert netw.properties == expected.properties
+
+    # In place.
+    epj.convert_from_ejson_0(src, src, validate=False)
+    assert epj.read_ejson(src).raw_ejson == expected.raw_ejson
+
+
+@pytest.mark.parametrize('units', [True, False])
+def test_convert_from_ejson_0_stdin(tmp_path, monkeypatch, units):
+    legacy = _legacy(units_first=False)
+    if not units:
+        del legacy['units']
+    monkeypatch.setattr('sys.stdin', io.StringIO(json.dumps(legacy)))
+
+    # Units follow the components, or are absent, and stdin can't be read twice.
+    res = epj.convert_from_ejson_0('-', tmp_path / 'netw.json')
+    assert res.problems == []
+    netw = epj.read_ejson(tmp_path / 'netw.json')
+    expected = epj.legacy.convert_component(
+        'ln2_3', 'Line', legacy['components']['ln2_3']['Line'], epj.legacy.scale_factors(legacy.get('units'))
+    )
+    assert netw.component('ln2_3') == {k: v for k, v in expected.items() if k != 'cons'}
+    if units:
+        assert netw.raw_ejson == epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json').raw_ejson
+
+
+def test_convert_files_from_ejson_0(tmp_path, capsys, monkeypatch):
+    legacy = _legacy()
+    legacy['components']['ln2_3']['Line']['length'] = 'x'
+    legacy['components']['ld13']['Load']['wiring'] = 'bogus'
+    for i in range(3):
+        (tmp_path / f'legacy_{i}.json').write_text(json.dumps(legacy))
+
+    pairs = [(tmp_path / f'legacy_{i}.json', tmp_path / f'netw_{i}.json') for i in range(3)]
+    results = epj.convert_files_from_ejson_0(pairs, max_workers=2)
+    assert [x.dst for x in results] == [x[1] for x in pairs]
+    for res in results:
+        assert [x['details']['path'] for x in res.problems] == ['$.components[4]', '$.components[28]']
+
+    # Validation of a single file in chunks, over a process pool.
+    monkeypatch.setattr(epyjson.audits, '_SCHEMA_CHUNK_SIZE', 4)
+    res = epj.convert_from_ejson_0(pairs[0][0], tmp_path / 'netw.json', max_workers=2)
+    assert res.problems == results[0].problems
+
+    assert cli.main([
+        '-j', '2', 'convert', '--from-ejson-0', str(tmp_path / 'legacy_*.json'), '-o', str(tmp_path / 'out')
+    ]) == 1
+    assert 'schema errors' in capsys.readouterr().err
+    assert epj.read_ejson(tmp_path / 'out' / 'legacy_0.json').raw_ejson == epj.read_ejson(pairs[0][1]).raw_ejson
@@ -0,0 +1,43 @@
+import pathlib
+
+import numpy as np
+
+import epyjson as epj
+
+test_netws_path = pathlib.Path(__file__).parent / 'test_data'
+
+
+def test_path_finder():
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    pf = epj.PathFinder(netw, weight='length')
+
+    assert pf.path('ld9', 'in1') == [
+        'ld9', 'nd9', 'ln7_9', 'nd7', 'ln6_7', 'nd6', 'ln5_6', 'nd5', 'ln4_5', 'nd4', 'ln3_4', 'nd3', 'ln2_3', 'nd2',
+        'tx1_2', 'nd1', 'in1'
+    ]
+    assert pf.distance('in1', 'ld9') == 6.0
+
+    tree = pf.tree('in1')
+    assert pf.tree('in1') is tree
+    dists = tree.distances()
+    assert dists['nd8'] == 5.0 and dists['nd13'] == 7.0
+    assert len(dists) == len(list(netw.components()))
+
+    lines = pf.components_between('ld8', 'in1', lambda c: c['type'] == 'Line')
+    assert lines == ['ln6_8', 'ln5_6', 'ln4_5', 'ln3_4', 'ln2_3']
+
+    assert epj.PathFinder(netw, weight='hops').distance('in1', 'ld9') == 9.0
+    assert epj.PathFinder(netw, weight='impedance').distance('in1', 'nd4') == 3.0
+
+    # Not live elements block paths, and changes invalidate the cache.
+    netw.update_comp('ln6_7', {'in_service': False})
+    assert pf.tree('in1') is not tree
+    assert pf.path('in1', 'ld9') is None
+    assert np.isinf(pf.distance('in1', 'nd7'))
+    assert pf.distance('in1', 'nd8') == 5.0
+    assert epj.PathFinder(netw, live_only=False).distance('in1', 'ld9') == 6.0
+
+    # Direct writes must be followed by touch(...) to invalidate the cache.
+    netw.component('ln6_7')['in_service'] = True
+    netw.touch('ln6_7')
+    assert pf.distance('in1', 'ld9') == 6.0
@@ -0,0 +1,80 @@
+import pathlib
+
+import numpy as np
+import pytest
+
+import epyjson as epj
+
+test_netws_path = pathlib.Path(__file__).parent / 'test_data'
+
+
+def _netw(meshed: bool = False) -> epj.EJson:
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    if meshed:
+        netw.add_comp({'id': 'ln3_9', 'type': 'Line', 'length': 1, 'z': [1, 0], 'z0': [1, 0]})
+        netw.connect('ln3_9', 'nd3', 0, {'phs': ['A', 'B', 'C']})
+        netw.connect('ln3_9', 'nd9', 1, {'phs': ['A', 'B', 'C']})
+    epj.make_single_phased(netw)
+    for load in netw.components('Load'):
+        load['s_nom'] = [[300.0, 100.0]]
+    return netw
+
+
+@pytest.mark.parametrize('meshed', [False, True])
+def test_power_flow(meshed):
+    netw = _netw(meshed)
+    pf = epj.PowerFlow(netw)
+    res = pf.solve()
+    assert res.converged
+
+    # Power balance: the injection at each load bus is minus the load.
+    y = pf.ybus.matrix.to_dense()
+    s = res.v * np.conj(y @ res.v)
+    for nd_id in ('nd8', 'nd9', 'nd13'):
+        assert np.isclose(s[pf.ybus.bus(nd_id)], -300.0 - 100.0j, atol=1e-4)
+    assert np.isclose(s[pf.ybus.bus('nd3')], 0.0, atol=1e-4)
+    assert res.v[pf.ybus.bus('nd1')] == 11000.0
+
+    # Warm start from the previous solution.
+    res_warm = pf.solve(v0=res.v)
+    assert res_warm.converged and res_warm.n_iter < res.n_iter
+    assert np.allclose(res_warm.v, res.v)
+
+    # No load: all voltages are the transformer secondary voltage.
+    res_0 = pf.solve(s_loads=np.zeros(pf.scaler.n_loads))
+    assert np.allclose(np.abs(res_0.v[pf.ybus.bus('nd12')]), 11000.0 / 27.61)
+
+
+def test_run_power_flow():
+    netw = _netw()
+    netw.component('ln11_12')['in_service'] = False
+    epj.run_power_flow(netw)
+
+    v_9 = epj.a2c(netw.component('nd9')['v'][0])
+    assert 0.9 * 11000.0 / 27.61 < abs(v_9) < 11000.0 / 27.61
+    assert netw.component('nd12')['v'] == [[0.0, 0.0]]
+
+    netw.component('nd9')['v'] = [[0.0, 0.0]]
+    epj.run_power_flow(netw, warm_start=True)
+    assert np.isclose(epj.a2c(netw.component('nd9')['v'][0]), v_9)
+
+
+def test_power_flow_not_single_phased():
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    with pytest.raises(ValueError):
+        epj.PowerFlow(netw)
+
+
+def test_power_flow_series(tmp_path):
+    netw = _netw()
+    pf = epj.PowerFlow(netw)
+
+    factors = np.linspace(0.0, 2.0, 11)
+    s_loads = factors[:, np.newaxis] * pf.load_s()
+    res = pf.solve_series(s_loads, out=tmp_path / 'v.npy', chunk_size=4)
+    assert res.converged.all()
+
+    v = np.load(tmp_path / 'v.npy')
+    assert v.shape == (len(factors), len(pf.node_ids))
+    for i, x in enumerate(s_loads):
+        assert np.allclose(v[i], pf.solve(s_loads=x).v[pf.node_bus])
@@ -0,0 +1,52 @@
+import numpy as np
+
+import epyjson as epj
+
+
+def _grid_netw(n: int) -> epj.EJson:
+    comps = []
+    for i in range(n):
+        for j in range(n):
+            comps.append({'id': f'nd{i}_{j}', 'type': 'Node', 'phs': ['A'], 'xy': [float(i), float(j)]})
+            if i > 0:
+                comps.append({
+                    'id': f'ln{i}_{j}', 'type': 'Line', 'length': 1.0, 'z': [1.0, 0.0], 'z0': [1.0, 0.0],
+                    'cons': [{'node': f'nd{i - 1}_{j}', 'phs': ['A']}, {'node': f'nd{i}_{j}', 'phs': ['A']}]
+                })
+    return epj.EJson({'components': comps})
+
+
+def test_spatial_index():
+    netw = _grid_netw(20)
+    idx = epj.SpatialIndex(netw)
+    assert len(idx) == 400
+
+    assert sorted(idx.nodes_in_bbox((2.5, 3.0, 4.0, 3.5))) == ['nd3_3', 'nd4_3']
+    assert sorted(idx.elements_in_bbox((2.5, 3.0, 4.0, 3.5))) == ['ln3_3', 'ln4_3', 'ln5_3']
+    assert idx.elements_in_bbox((2.5, 3.0, 4.0, 3.5), require_all=True) == ['ln4_3']
+
+    (nd_id, d), = idx.nearest((7.1, 8.2))
+    assert nd_id == 'nd7_8' and np.isclose(d, np.hypot(0.1, 0.2))
+    assert [x[0] for x in idx.nearest((-100.0, -100.0), k=3)] == ['nd0_0', 'nd0_1', 'nd1_0']
+
+    # Brute force comparison.
+    rng = np.random.default_rng(0)
+    pts = {c['id']: c['xy'] for c in netw.components('Node')}
+    for q in rng.uniform(-5.0, 25.0, size=(20, 2)):
+        dists = sorted(np.hypot(x - q[0], y - q[1]) for x, y in pts.values())
+        assert np.allclose([x[1] for x in idx.nearest(q, k=5)], dists[:5])
+
+    # Updates through the network.
+    netw.update_comp('nd7_8', {'xy': [50.0, 50.0]})
+    netw.add_comp({'id': 'nd_new', 'type': 'Node', 'phs': ['A'], 'xy': [7.0, 8.0]})
+    netw.remove_component('nd0_0')
+    netw.rename_to({'nd3_3': 'nd3_3a'})
+    assert idx.nearest((7.1, 8.2))[0][0] == 'nd_new'
+    assert idx.nearest((60.0, 60.0))[0][0] == 'nd7_8'
+    assert idx.nodes_in_bbox((-1.0, -1.0, 0.5, 0.5)) == []
+    assert idx.nodes_in_bbox((3.0, 3.0, 3.0, 3.0)) == ['nd3_3a']
+    assert len(idx) == 400
+
+    idx.close()
+    netw.remove_component('nd_new')
+    assert len(idx) == 400
@@ -0,0 +1,49 @@
+import io
+import json
+import pathlib
+
+import pytest
+
+import epyjson as epj
+
+test_netws_path = pathlib.Path(__file__).parent / 'test_data'
+
+
+def test_streaming_reader():
+    raw = json.loads((test_netws_path / 'netw_generic_a.json').read_text())
+    raw['notes'] = {'a': [1, 2.5e-3, None]}
+    text = json.dumps({'components': raw['components'], 'voltage_type': raw['voltage_type'], 'notes': raw['notes']})
+
+    # Small chunks split tokens, numbers and strings across chunk boundaries.
+    for chunk_size in (1, 7, 1 << 16):
+        reader = epj.StreamingReader(io.StringIO(text), chunk_size=chunk_size)
+        comps = list(reader.components())
+        assert comps == raw['components']
+        assert reader.properties == {'voltage_type': raw['voltage_type'], 'notes': raw['notes']}
+
+    reader = epj.StreamingReader(io.StringIO('{"voltage_type": "ll", "components": []}'))
+    assert list(reader.components()) == []
+    assert reader.properties == {'voltage_type': 'll'}
+
+    with pytest.raises(ValueError):
+        list(epj.StreamingReader(io.StringIO('{"components": [{"id": "x"} {"id": "y"}]}')).components())
+
+
+@pytest.mark.parametrize('name', ['netw.json', 'netw.json.gz', 'netw.json.bz2', 'netw.json.xz'])
+@pytest.mark.parametrize('stream', [True, False])
+def test_read_write(tmp_path, name, stream):
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    epj.write_ejson(netw, tmp_path / name, stream=stream)
+    netw_2 = epj.read_ejson(tmp_path / name, stream=stream)
+    assert netw_2.raw_ejson == netw.raw_ejson
+    assert netw_2.properties == netw.properties
+
+
+@pytest.mark.parametrize('stream', [True, False])
+def test_read_stdin(monkeypatch, stream):
+    text = (test_netws_path / 'netw_generic_a.json').read_text()
+    stdin = io.StringIO(text)
+    monkeypatch.setattr('sys.stdin', stdin)
+    netw = epj.read_ejson('-', stream=stream)
+    assert netw.raw_ejson == epj.EJson(json.loads(text)).raw_ejson
+    assert not stdin.closed
@@ -0,0 +1,46 @@
+import pathlib
+import random
+
+import epyjson as epj
+
+test_netws_path = pathlib.Path(__file__).parent / 'test_data'
+
+
+def _expected(netw: epj.EJson) -> set:
+    netw = netw.clone()
+    epj.remove_unsupplied(netw)
+    return set(x['id'] for x in netw.components())
+
+
+def test_supply_tracker():
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    tracker = epj.SupplyTracker(netw)
+    assert set(tracker.supplied_cids()) == _expected(netw)
+
+    gained, lost = tracker.update('ln6_7', {'in_service': False})
+    assert 'ld9' in lost and 'ln6_7' in lost and gained == []
+    assert not tracker.is_supplied('ld9')
+    assert set(tracker.supplied_cids()) == _expected(netw)
+
+    gained, lost = tracker.update('ln6_7', {'in_service': True})
+    assert 'ld9' in gained and lost == []
+    assert set(tracker.supplied_cids()) == _expected(netw)
+
+    # Random toggles, including changes made directly on the network.
+    rng = random.Random(0)
+    elems = [x['id'] for x in netw.components() if x['type'] != 'Node']
+    for i in range(100):
+        cid = rng.choice(elems)
+        if i % 2 == 0:
+            tracker.update(cid, {'in_service': not netw.component(cid).get('in_service', True)})
+        else:
+            closed = netw.component(cid).get('switch_state', 'closed') != 'open'
+            netw.update_comp(cid, {'switch_state': 'open' if closed else 'closed'})
+        assert set(tracker.supplied_cids()) == _expected(netw)
+
+    # Topology changes cause a rebuild.
+    netw.remove_component('ld9')
+    assert set(tracker.supplied_cids()) == _expected(netw)
+
+    tracker.close()
+    assert tracker._on_change not in netw._listeners
@@ -0,0 +1,38 @@
+import pathlib
+
+import pytest
+
+import epyjson as epj
+
+test_netws_path = pathlib.Path(__file__).parent / 'test_data'
+
+
+def _expected(netw: epj.EJson, changes: dict) -> set:
+    netw = netw.clone()
+    for cid, fields in changes.items():
+        netw.update_comp(cid, fields)
+    epj.remove_unsupplied(netw)
+    return set(x['id'] for x in netw.components())
+
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_switching_model(executor):
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    fp = netw.fingerprint()
+    model = epj.SwitchingModel(netw)
+
+    configs = [
+        None,
+        {'ln6_7': {'in_service': False}},
+        {'ln5_6': {'switch_state': 'open'}},
+        {'ln5_6': {'switch_state': 'open'}, 'ln2_3': {'switch_state': 'closed'}},
+        {'in1': {'in_service': False}},
+    ]
+    results = model.evaluate_many(configs, max_workers=2, executor=executor)
+    for changes, res in zip(configs, results):
+        assert set(res.supplied_cids()) == _expected(netw, changes or {})
+
+    assert results[0].n_unsupplied() == 0
+    assert results[1].unsupplied_cids('Load') == ['ld9', 'ld13']
+    assert results[4].n_unsupplied('Load') == 3
+    assert netw.fingerprint() == fp
@@ -0,0 +1,44 @@
+import pathlib
+
+import pytest
+
+import epyjson as epj
+
+test_netws_path = pathlib.Path(__file__).parent / 'test_data'
+
+
+def test_radial_tree():
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    tree = epj.RadialTree(netw, 'in1')
+
+    assert tree.is_downstream('ld9', 'ln6_7')
+    assert not tree.is_downstream('ld8', 'ln6_7')
+    assert tree.is_downstream('nd6', 'nd6')
+    assert tree.downstream('ln10_11') == ['ln10_11', 'nd11', 'ln11_12', 'nd12']
+    assert tree.upstream('nd3') == ['nd3', 'ln2_3', 'nd2', 'tx1_2', 'nd1', 'in1']
+    assert tree.parent_of('in1') is None
+    assert tree.lca('ld8', 'ld13') == 'nd6'
+    assert tree.lca('nd12', 'ld13') == 'nd10'
+    assert tree.lca('nd12', 'nd11') == 'nd11'
+    assert tree.size[tree.arrays.rows['in1']] == len(list(netw.components()))
+
+    # Compare with EJson.only(...).
+    expected = netw.clone()
+    expected.only('ln6_7', stop_cb=lambda netw, c: c['id'] == 'nd6')
+    tree.only('ln6_7')
+    assert set(x['id'] for x in netw.components()) == set(x['id'] for x in expected.components())
+    with pytest.raises(ValueError):
+        tree.downstream('ln6_7')
+
+
+def test_radial_tree_not_radial():
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    netw.add_comp({'id': 'ln12_13', 'type': 'Line', 'length': 1, 'z': [1, 0], 'z0': [1, 0]})
+    netw.connect('ln12_13', 'nd12', 0, {'phs': ['A', 'B', 'C']})
+    netw.connect('ln12_13', 'nd13', 1, {'phs': ['A', 'B', 'C']})
+    with pytest.raises(ValueError):
+        epj.RadialTree(netw, 'in1')
+
+    netw.update_comp('ln12_13', {'in_service': False})
+    tree = epj.RadialTree(netw, 'in1', live_only=True)
+    assert not tree.is_downstream('nd12', 'ln10_13')
@@ -0,0 +1,138 @@
+import pathlib
+
+import numpy as np
+import pytest
+
+import epyjson as epj
+from epyjson.ybus import _SEQ, _SEQ_INV
+
+test_netws_path = pathlib.Path(__file__).parent / 'test_data'
+
+
+def _netw(vector_group: str = 'yy0') -> epj.EJson:
+    netw = epj.EJson.read_from_file(test_netws_path / 'netw_generic_a.json')
+    netw.component('tx1_2')['vector_group'] = vector_group
+    return netw
+
+
+def _positive_sequence(ybus: epj.Ybus, nd_i: str, nd_j: str) -> complex:
+    y = ybus.matrix.to_dense()
+    rows = [ybus.bus((nd_i, x)) for x in 'ABC']
+    cols = [ybus.bus((nd_j, x)) for x in 'ABC']
+    return (_SEQ_INV @ y[np.ix_(rows, cols)] @ _SEQ)[1, 1]
+
+
+def test_csr_matrix():
+    rows = np.array([0, 2, 1, 0, 2])
+    cols = np.array([1, 0, 1, 1, 2])
+    vals = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+    m = epj.CsrMatrix.from_coo(rows, cols, vals, (3, 3))
+
+    dense = np.zeros((3, 3))
+    np.add.at(dense, (rows, cols), vals)
+
+    assert m.nnz == 4
+    assert np.array_equal(m.to_dense(), dense)
+    assert np.array_equal(m.diagonal(), np.diag(dense))
+
+    x = np.arange(6.0).reshape(3, 2)
+    assert np.allclose(m @ x, dense @ x)
+    assert np.allclose(m @ x[:, 0], dense @ x[:, 0])
+    assert np.array_equal(m.submatrix([2, 0], [0, 1]).to_dense(), dense[np.ix_([2, 0], [0, 1])])
+
+
+def _laplacian(n: int, edges: list) -> epj.CsrMatrix:
+    rows = [a for a, b in edges] + [b for a, b in edges] + list(range(n))
+    cols = [b for a, b in edges] + [a for a, b in edges] + list(range(n))
+    vals = [-1.0 - 2.0j] * (2 * len(edges)) + [0.1] * n
+    m = epj.CsrMatrix.from_coo(rows, cols, vals, (n, n))
+    # Diagonal: the sum of the row's off diagonal admittances, plus a small shunt.
+    d = -np.asarray(m @ np.ones(n)) + 0.2
+    return epj.CsrMatrix.from_coo(rows + list(range(n)), cols + list(range(n)), vals + d.tolist(), (n, n))
+
+
+def test_sparse_lu():
+    rng = np.random.default_rng(0)
+    n = 200
+    tree = [(i, int(rng.integers(0, i))) for i in range(1, n)]
+    mesh = tree + [(int(a), int(b)) for a, b in rng.integers(0, n, (10, 2)) if a != b]
+
+    for edges in (tree, mesh):
+        m = _laplacian(n, edges)
+        lu = m.factor()
+        b = rng.normal(size=(n, 3)) + 1j * rng.normal(size=(n, 3))
+        assert np.allclose(lu.solve(b), np.linalg.solve(m.to_dense(), b))
+        assert np.allclose(lu.solve(b[:, 0]), np.linalg.solve(m.to_dense(), b[:, 0]))
+
+    # A radial network factors with at most one fill in per bus above and below the diagonal, and a string of lines
+    # doesn't give a deep elimination tree.
+    assert _laplacian(n, tree).factor().nnz <= _laplacian(n, tree).nnz + 2 * n
+    string = _laplacian(n, [(i, i + 1) for i in range(n - 1)]).factor()
+    assert len(string._lower) < 20
+
+    with pytest.raises(ValueError):
+        epj.CsrMatrix.from_coo([0, 1], [1, 0], [1.0, 1.0], (2, 2)).factor()
+
+
+def test_ybus_sequence():
+    netw = _netw()
+    ybus = epj.build_ybus(netw)
+    y = ybus.matrix.to_dense()
+
+    # ln10_13 has zero length, so nd10 and nd13 share a bus.
+    assert ybus.bus('nd10') == ybus.bus('nd13')
+    assert len(ybus) == len(list(netw.components('Node'))) - 1
+
+    assert np.allclose(y, y.T)
+    assert np.allclose(y[ybus.bus('nd2'), ybus.bus('nd3')], -1.0)
+    assert np.allclose(y[ybus.bus('nd3'), ybus.bus('nd4')], -0.5)
+    assert np.allclose(y.sum(axis=1)[[ybus.bus(x) for x in ('nd3', 'nd4', 'nd5')]], 0.0)
+
+
+@pytest.mark.parametrize('vector_group', ['yy0', 'dyn11', 'dyn1', 'yd1', 'yd11', 'dd0'])
+def test_ybus_phase_matches_sequence(vector_group):
+    netw = _netw(vector_group)
+    y_seq = epj.build_ybus(netw, mode='sequence')
+    y_ph = epj.build_ybus(netw, mode='phase')
+
+    assert len(y_ph) == 3 * len(y_seq)
+    for nd_i, nd_j in [('nd1', 'nd1'), ('nd1', 'nd2'), ('nd2', 'nd1'), ('nd2', 'nd2'), ('nd2', 'nd3')]:
+        expected = y_seq.matrix.to_dense()[y_seq.bus(nd_i), y_seq.bus(nd_j)]
+        assert np.isclose(_positive_sequence(y_ph, nd_i, nd_j), expected)
+
+
+@pytest.mark.parametrize('mode', ['sequence', 'phase'])
+def test_ybus_tap_side(mode):
+    def y_tx(taps, tap_side, nom_turns_ratio=27.61):
+        netw = _netw()
+        netw.update_comp('tx1_2', {'taps': taps, 'tap_side': tap_side, 'nom_turns_ratio': [nom_turns_ratio, 0]})
+        return epj.build_ybus(netw, mode).matrix.to_dense()
+
+    # Tap 4 raises the turns of the tapped winding by 10%.
+    assert np.allclose(y_tx([4, 4, 4], 'primary'), y_tx([0, 0, 0], 'primary', 27.61 * 1.1))
+    assert np.allclose(y_tx([4, 4, 4], 'secondary'), y_tx([0, 0, 0], 'primary', 27.61 / 1.1))
+    assert not np.allclose(y_tx([4, 4, 4], 'secondary'), y_tx([4, 4, 4], 'primary'))
+
+
+def test_ybus_not_live():
+    netw = _netw()
+    netw.component('ln6_7')['in_service'] = False
+    y = epj.build_ybus(netw)
+
+    assert y.matrix.to_dense()[y.bus('nd6'), y.bus('nd7')] == 0.0
+
+
+@pytest.mark.parametrize('mode', ['sequence', 'phase'])
+def test_ybus_invalid(mode):
+    with pytest.raises(ValueError):
+        epj.build_ybus(_netw('zn11'), mode)
+
+    if mode == 'phase':
+        with pytest.raises(ValueError):
+            epj.build_ybus(_netw('dy5'), mode)
+
+    # Zero series impedance, but non-zero zero sequence impedance: not a short, and can't be inverted.
+    netw = _netw()
+    netw.component('ln2_3')['z'] = [0, 0]
+    with pytest.raises(ValueError, match='ln2_3'):
+        epj.build_ybus(netw, mode)